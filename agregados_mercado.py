@@ -0,0 +1,196 @@
+"""
+AGREGADOS DE MERCADO PRÉ-CALCULADOS
+Medianas/percentis de preço por m² por bairro, tipo e faixa de área,
+gerados no treino (ou ingestão) e servidos da memória com ETag
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_AGREGADOS = 'agregados_mercado.json'
+
+# Mesmas faixas usadas pelos ajustes do PrecificadorIAAprimorado
+FAIXAS_AREA = [
+    (0, 80, 'pequena'),
+    (80, 120, 'media'),
+    (120, 200, 'grande'),
+    (200, 500, 'luxo')
+]
+
+PERCENTIS = (10, 25, 50, 75, 90)
+
+
+def _resumo(grupo):
+    """Estatísticas de um grupo de imóveis (count, preço/m² e preço)"""
+    preco_m2 = grupo['preco_m2'].dropna().to_numpy()
+    resumo = {'count': int(len(grupo))}
+    if len(preco_m2):
+        p10, p25, p50, p75, p90 = np.percentile(preco_m2, PERCENTIS)
+        resumo['preco_m2'] = {
+            'mediana': round(float(p50), 2),
+            'p10': round(float(p10), 2),
+            'p25': round(float(p25), 2),
+            'p75': round(float(p75), 2),
+            'p90': round(float(p90), 2)
+        }
+    resumo['preco_mediano'] = round(float(grupo['preco'].median()), 2)
+    return resumo
+
+
+def _por_faixa(grupo):
+    return {faixa: _resumo(sub) for faixa, sub in grupo.groupby('faixa_area', observed=True)}
+
+
+def calcular_agregados(df):
+    """
+    Calcula os agregados a partir de um DataFrame com bairro, tipo_imovel,
+    area_construida, area_terreno e preco (já limpo). Roda só no treino/ingestão.
+    """
+    df = df[['bairro', 'tipo_imovel', 'area_construida', 'area_terreno', 'preco']].copy()
+    df['bairro'] = df['bairro'].astype(str)
+    df['tipo_imovel'] = df['tipo_imovel'].astype(str)
+
+    # Terreno é avaliado pela área do terreno; os demais pela área construída
+    terreno = df['tipo_imovel'] == 'Terreno'
+    area_referencia = np.where(terreno, df['area_terreno'], df['area_construida'])
+    df['preco_m2'] = np.where(area_referencia > 0, df['preco'] / np.where(area_referencia > 0, area_referencia, 1), np.nan)
+    df['faixa_area'] = pd.Categorical(
+        np.select(
+            [area_referencia < 80, area_referencia < 120, area_referencia < 200],
+            ['pequena', 'media', 'grande'],
+            'luxo'
+        ),
+        categories=[nome for _, _, nome in FAIXAS_AREA]
+    )
+
+    por_tipo = {}
+    for tipo, grupo in df.groupby('tipo_imovel'):
+        por_tipo[tipo] = dict(_resumo(grupo), faixas=_por_faixa(grupo))
+
+    por_bairro = {}
+    for bairro, grupo in df.groupby('bairro'):
+        por_bairro[bairro] = dict(
+            _resumo(grupo),
+            por_tipo={tipo: _resumo(sub) for tipo, sub in grupo.groupby('tipo_imovel')},
+            faixas=_por_faixa(grupo)
+        )
+
+    return {
+        'gerado_em': datetime.now().isoformat(),
+        'total_registros': int(len(df)),
+        'geral': _resumo(df),
+        'por_tipo': por_tipo,
+        'por_bairro': por_bairro,
+        'segmentos_casa': calcular_segmentos_casa(df)
+    }
+
+
+def calcular_segmentos_casa(df):
+    """Estatísticas de casas por bairro e faixa de área construída (usadas nos ajustes inteligentes)"""
+    casas = df[df['tipo_imovel'] == 'Casa']
+    segmentos = []
+    for bairro, bairro_data in casas.groupby('bairro', sort=False):
+        for faixa_min, faixa_max, nome_faixa in FAIXAS_AREA:
+            faixa_data = bairro_data[
+                (bairro_data['area_construida'] >= faixa_min) &
+                (bairro_data['area_construida'] < faixa_max)
+            ]
+            if len(faixa_data) > 0:
+                std = faixa_data['preco'].std()
+                segmentos.append({
+                    'bairro': bairro,
+                    'faixa': nome_faixa,
+                    'faixa_min': faixa_min,
+                    'faixa_max': faixa_max,
+                    'count': int(len(faixa_data)),
+                    'preco_medio': float(faixa_data['preco'].mean()),
+                    'preco_std': None if pd.isna(std) else float(std),
+                    'preco_min': float(faixa_data['preco'].min()),
+                    'preco_max': float(faixa_data['preco'].max())
+                })
+    return segmentos
+
+
+def salvar_agregados(agregados, diretorio_modelos='models'):
+    os.makedirs(diretorio_modelos, exist_ok=True)
+    caminho = os.path.join(diretorio_modelos, ARQUIVO_AGREGADOS)
+    caminho_tmp = caminho + '.tmp'
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        json.dump(agregados, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(caminho_tmp, caminho)
+    return caminho
+
+
+class CacheAgregados:
+    """
+    Mantém os agregados de cada diretório de modelos em memória, com as
+    respostas JSON já serializadas e o ETag derivado do conteúdo do arquivo.
+    Recarrega apenas se o arquivo mudar (mtime).
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def obter(self, diretorio_modelos):
+        """Retorna a entrada em cache ou None se o artefato não existir"""
+        caminho = os.path.join(diretorio_modelos, ARQUIVO_AGREGADOS)
+        try:
+            mtime = os.stat(caminho).st_mtime
+        except OSError:
+            return None
+
+        entrada = self._cache.get(caminho)
+        if entrada is not None and entrada['mtime'] == mtime:
+            return entrada
+
+        with self._lock:
+            entrada = self._cache.get(caminho)
+            if entrada is None or entrada['mtime'] != mtime:
+                entrada = self._carregar(caminho, mtime)
+                self._cache[caminho] = entrada
+        return entrada
+
+    @staticmethod
+    def _carregar(caminho, mtime):
+        with open(caminho, 'rb') as f:
+            conteudo = f.read()
+        dados = json.loads(conteudo)
+        bairros = [
+            {
+                'bairro': bairro,
+                'count': resumo['count'],
+                'preco_m2_mediana': resumo.get('preco_m2', {}).get('mediana'),
+                'preco_mediano': resumo['preco_mediano']
+            }
+            for bairro, resumo in sorted(dados['por_bairro'].items())
+        ]
+        return {
+            'mtime': mtime,
+            'etag': hashlib.sha1(conteudo).hexdigest(),
+            'dados': dados,
+            'json_bairros': json.dumps({'total': len(bairros), 'bairros': bairros}, ensure_ascii=False),
+            'json_mercado': json.dumps({k: v for k, v in dados.items() if k != 'segmentos_casa'}, ensure_ascii=False)
+        }
+
+
+if __name__ == "__main__":
+    # Gera o artefato diretamente do CSV (ingestão sem retreinar o modelo)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera os agregados de mercado")
+    parser.add_argument('--dataset', default='dados/dataset_imoveis_jacarei.csv')
+    parser.add_argument('--modelos', default='models')
+    args = parser.parse_args()
+
+    from treinador_ia import TreinadorIA
+    treinador = TreinadorIA(diretorio_modelos=args.modelos, arquivo_dataset=args.dataset)
+    df = treinador.preprocessar_dados(treinador.carregar_dataset())
+    caminho = salvar_agregados(calcular_agregados(df), args.modelos)
+    print(f"✅ Agregados salvos em {caminho}")
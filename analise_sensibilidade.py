@@ -0,0 +1,200 @@
+"""
+ANÁLISE DE SENSIBILIDADE (WHAT-IF)
+Monta a grade de variações de um imóvel base e precifica tudo com uma única
+chamada ao modelo, indicando onde as regras de ajuste ligam/desligam
+"""
+
+import numpy as np
+import pandas as pd
+
+DIMENSOES_NUMERICAS = ('area_construida', 'area_terreno', 'quartos', 'banheiros')
+DIMENSOES_INTEIRAS = ('quartos', 'banheiros')
+CAMPOS_BASE = ('bairro', 'tipo_imovel', 'area_construida', 'area_terreno', 'quartos', 'banheiros')
+
+MAX_PASSOS = 200
+MAX_PONTOS = 2500
+
+
+def valores_dimensao(dimensao):
+    """
+    Expande a especificação de uma dimensão em (campo, valores).
+    Aceita {'campo': 'area_construida', 'inicio': 60, 'fim': 300, 'passos': 25},
+    {'campo': 'banheiros', 'valores': [1, 2, 3]} ou {'campo': 'bairro', 'valores': [...]}.
+    Especificação malformada levanta ValueError (erro do cliente, não do modelo).
+    """
+    if not isinstance(dimensao, dict):
+        raise ValueError("Cada dimensão deve ser um objeto com 'campo'")
+    campo = dimensao.get('campo')
+    if campo in ('bairro', 'bairros'):
+        valores = dimensao.get('valores') or []
+        if not isinstance(valores, list):
+            raise ValueError("Dimensão 'bairro' exige a lista 'valores'")
+        valores = [str(v) for v in valores]
+        if not valores:
+            raise ValueError("Dimensão 'bairro' exige a lista 'valores'")
+        return 'bairro', list(dict.fromkeys(valores))
+
+    if campo not in DIMENSOES_NUMERICAS:
+        raise ValueError(f"Dimensão inválida: {campo!r}. Use {', '.join(DIMENSOES_NUMERICAS)} ou bairro")
+
+    if dimensao.get('valores') is not None:
+        try:
+            valores = np.asarray(dimensao['valores'], dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError(f"Dimensão '{campo}': 'valores' deve ser uma lista de números")
+        if valores.ndim != 1:
+            raise ValueError(f"Dimensão '{campo}': 'valores' deve ser uma lista de números")
+    else:
+        try:
+            inicio, fim = float(dimensao['inicio']), float(dimensao['fim'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Dimensão '{campo}' exige 'valores' ou 'inicio' e 'fim'")
+        try:
+            passos = int(dimensao.get('passos', 20))
+        except (TypeError, ValueError):
+            raise ValueError(f"'passos' deve ser um inteiro entre 2 e {MAX_PASSOS}")
+        if not 2 <= passos <= MAX_PASSOS:
+            raise ValueError(f"'passos' deve estar entre 2 e {MAX_PASSOS}")
+        valores = np.linspace(inicio, fim, passos)
+    if not np.all(np.isfinite(valores)):
+        raise ValueError(f"Dimensão '{campo}' só aceita valores finitos")
+
+    if campo in DIMENSOES_INTEIRAS:
+        # Quartos/banheiros são discretos: arredonda e remove repetidos
+        valores = np.unique(np.round(valores).astype(int))
+    if len(valores) == 0 or len(valores) > MAX_PASSOS:
+        raise ValueError(f"Dimensão '{campo}' deve ter entre 1 e {MAX_PASSOS} valores")
+    if np.any(np.asarray(valores) < 0):
+        raise ValueError(f"Dimensão '{campo}' não aceita valores negativos")
+    return campo, [v.item() for v in np.asarray(valores)]
+
+
+def _transicoes(regras, valores, campo, fixo=None):
+    """Pares consecutivos da curva onde o conjunto de regras aplicadas muda"""
+    transicoes = []
+    for i in range(1, len(valores)):
+        antes, depois = set(regras[i - 1]), set(regras[i])
+        if antes != depois:
+            transicao = {
+                'campo': campo,
+                'de': valores[i - 1],
+                'para': valores[i],
+                'ativadas': sorted(depois - antes),
+                'desativadas': sorted(antes - depois)
+            }
+            if fixo:
+                transicao['fixo'] = fixo
+            transicoes.append(transicao)
+    return transicoes
+
+
+def _validar_base(base):
+    """Imóvel base com os campos numéricos já convertidos (ValueError se malformado)"""
+    if not isinstance(base, dict):
+        raise ValueError("O imóvel base deve ser um objeto")
+    faltantes = [c for c in CAMPOS_BASE if c not in base]
+    if faltantes:
+        raise ValueError(f"Imóvel base incompleto, faltam: {faltantes}")
+    try:
+        validado = {
+            'bairro': str(base['bairro']),
+            'tipo_imovel': str(base['tipo_imovel']),
+            'area_construida': float(base['area_construida']),
+            'area_terreno': float(base['area_terreno']),
+            'quartos': int(base['quartos']),
+            'banheiros': int(base['banheiros'])
+        }
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("Imóvel base: área, quartos e banheiros devem ser numéricos")
+    if not all(np.isfinite(validado[c]) and validado[c] >= 0 for c in DIMENSOES_NUMERICAS):
+        raise ValueError("Imóvel base: área, quartos e banheiros devem ser finitos e não negativos")
+    return validado
+
+
+def montar_grade(base, dimensoes):
+    """
+    Valida a requisição e monta a grade base x dimensões (1 ou 2).
+    Retorna (eixos, registros); qualquer entrada malformada levanta ValueError.
+    """
+    base = _validar_base(base)
+    if not isinstance(dimensoes, list) or not 1 <= len(dimensoes) <= 2:
+        raise ValueError("Informe uma ou duas dimensões")
+
+    eixos = [valores_dimensao(d) for d in dimensoes]
+    campos = [campo for campo, _ in eixos]
+    if len(set(campos)) != len(campos):
+        raise ValueError("As dimensões devem ser campos diferentes")
+
+    formato = tuple(len(valores) for _, valores in eixos)
+    total = int(np.prod(formato))
+    if total > MAX_PONTOS:
+        raise ValueError(f"Grade com {total} pontos excede o máximo de {MAX_PONTOS}")
+
+    registros = pd.DataFrame({
+        'bairro': [base['bairro']] * total,
+        'tipo_imovel': [base['tipo_imovel']] * total,
+        'area_construida': np.full(total, base['area_construida']),
+        'area_terreno': np.full(total, base['area_terreno']),
+        'quartos': np.full(total, base['quartos']),
+        'banheiros': np.full(total, base['banheiros'])
+    })
+    # Grade em ordem 'ij': o primeiro eixo varia mais devagar
+    indices = np.indices(formato).reshape(len(formato), -1)
+    for (campo, valores), idx in zip(eixos, indices):
+        registros[campo] = np.asarray(valores, dtype=object)[idx]
+    return eixos, registros
+
+
+def precificar_grade(precificador, eixos, registros):
+    """
+    Precifica a grade de `montar_grade` com `precificador.precificar_lote`.
+    Retorna a curva (1D) ou superfície (2D) e as transições de regras de ajuste.
+    """
+    campos = [campo for campo, _ in eixos]
+    formato = tuple(len(valores) for _, valores in eixos)
+    resultado = precificador.precificar_lote(registros)
+
+    if len(eixos) == 1:
+        campo, valores = eixos[0]
+        return {
+            'dimensoes': campos,
+            'eixos': {campo: valores},
+            'curva': [
+                {
+                    campo: valor,
+                    'preco_estimado': float(linha.preco_estimado),
+                    'preco_base_ia': float(linha.preco_base_ia),
+                    'ajustes_aplicados': linha.ajustes_aplicados,
+                    'regras': linha.regras
+                }
+                for valor, linha in zip(valores, resultado.itertuples(index=False))
+            ],
+            'transicoes': _transicoes(resultado['regras'].tolist(), valores, campo)
+        }
+
+    (campo_1, valores_1), (campo_2, valores_2) = eixos
+    lista_regras = resultado['regras'].tolist()
+    n2 = len(valores_2)
+    regras = [lista_regras[i * n2:(i + 1) * n2] for i in range(len(valores_1))]
+    transicoes = []
+    for i, v1 in enumerate(valores_1):
+        transicoes += _transicoes(regras[i], valores_2, campo_2, fixo={campo_1: v1})
+    for j, v2 in enumerate(valores_2):
+        transicoes += _transicoes([linha[j] for linha in regras], valores_1, campo_1, fixo={campo_2: v2})
+
+    return {
+        'dimensoes': campos,
+        'eixos': {campo_1: valores_1, campo_2: valores_2},
+        'superficie': {
+            'preco_estimado': resultado['preco_estimado'].to_numpy().reshape(formato).tolist(),
+            'preco_base_ia': resultado['preco_base_ia'].to_numpy().reshape(formato).tolist(),
+            'regras': regras
+        },
+        'transicoes': transicoes
+    }
+
+
+def calcular_sensibilidade(precificador, base, dimensoes):
+    """Valida, monta e precifica a grade (ver `montar_grade` e `precificar_grade`)"""
+    eixos, registros = montar_grade(base, dimensoes)
+    return precificar_grade(precificador, eixos, registros)
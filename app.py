@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, g
 from flask_bcrypt import Bcrypt
 from functools import wraps
 from flask_sqlalchemy import SQLAlchemy
@@ -7,10 +7,22 @@ import os
 import requests
 import json
 
+from sessoes import carregar_chaves_secretas, criar_interface_sessao, regenerar_sessao, CacheUsuarios
+from controle_admissao import ControleAdmissao, RequisicaoRejeitada
+from perfilador import PerfiladorAmostragem
+
 app = Flask(__name__)
-app.secret_key = os.urandom(24)  # Chave secreta para sessão
-app.config['SECRET_KEY'] = os.urandom(24)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+# Chave secreta compartilhada por todos os workers (rotação: JECET_SECRET_KEYS_ANTIGAS)
+app.config['SECRET_KEY'], app.config['SECRET_KEYS_ANTIGAS'] = carregar_chaves_secretas(app.instance_path)
+# Sessões: 'cookie' (padrão), 'arquivo' ou 'sqlite' (no servidor, compartilhadas entre workers)
+app.config['SESSAO_BACKEND'] = os.environ.get('JECET_SESSAO_BACKEND', 'cookie')
+app.config['SESSAO_DIRETORIO'] = os.environ.get('JECET_SESSAO_DIRETORIO', os.path.join(app.instance_path, 'sessoes'))
+app.config['SESSAO_SQLITE'] = os.environ.get('JECET_SESSAO_SQLITE', os.path.join(app.instance_path, 'sessoes.db'))
+app.config['CACHE_USUARIOS_TTL'] = float(os.environ.get('JECET_CACHE_USUARIOS_TTL', 60))
+app.session_interface = criar_interface_sessao(
+    app.config['SESSAO_BACKEND'], app.config['SESSAO_DIRETORIO'], app.config['SESSAO_SQLITE']
+)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('JECET_DATABASE_URI', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 bcrypt = Bcrypt(app)
@@ -29,43 +41,209 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+def _carregar_usuario(username):
+    """Registro do usuário como dict (seguro para cachear fora da sessão do SQLAlchemy)"""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        return None
+    return {'id': user.id, 'username': user.username, 'email': user.email, 'whatsapp': user.whatsapp}
+
+cache_usuarios = CacheUsuarios(_carregar_usuario, ttl=app.config['CACHE_USUARIOS_TTL'])
+
+# Configuração do registro de modelos por cidade
+app.config['MODELOS_MEMORIA_MAX_MB'] = float(os.environ.get('JECET_MODELOS_MEMORIA_MB', 512))
+app.config['MODELOS_CIDADES_FIXADAS'] = [c.strip() for c in os.environ.get('JECET_CIDADES_FIXADAS', 'Jacareí').split(',') if c.strip()]
+
+# Configuração do circuit breaker da IA
+app.config['CB_LIMITE_FALHAS'] = int(os.environ.get('JECET_CB_LIMITE_FALHAS', 3))
+app.config['CB_INTERVALO_SONDAGEM'] = float(os.environ.get('JECET_CB_INTERVALO_SONDAGEM', 30))
+
+# Configuração dos jobs de treinamento em background
+# Sem JECET_ADMINS as rotas /admin ficam desativadas. Os nomes listados não podem
+# ser registrados nem adotados via /perfil: crie a conta antes de torná-la admin
+app.config['ADMINS'] = [u.strip() for u in os.environ.get('JECET_ADMINS', '').split(',') if u.strip()]
+app.config['TREINO_MAX_CPUS'] = int(os.environ.get('JECET_TREINO_MAX_CPUS', 0)) or None
+
+# Configuração do modo sombra (modelo candidato avaliado em tráfego real)
+app.config['SOMBRA_DIRETORIO'] = os.environ.get('JECET_SOMBRA_DIRETORIO')
+app.config['SOMBRA_FRACAO'] = float(os.environ.get('JECET_SOMBRA_FRACAO', 0.1))
+
+# Configuração do monitoramento de drift (intervalo mínimo entre recálculos do PSI)
+app.config['DRIFT_INTERVALO'] = float(os.environ.get('JECET_DRIFT_INTERVALO', 60))
+
+# Controle de admissão (por worker): taxa por usuário (0 desativa) e inferências simultâneas
+app.config['ADMISSAO_TAXA'] = float(os.environ.get('JECET_ADMISSAO_TAXA', 5))
+app.config['ADMISSAO_RAJADA'] = int(os.environ.get('JECET_ADMISSAO_RAJADA', 20))
+app.config['ADMISSAO_MAX_INFERENCIAS'] = int(os.environ.get('JECET_ADMISSAO_MAX_INFERENCIAS', 4))
+app.config['ADMISSAO_ESPERA_MAX'] = float(os.environ.get('JECET_ADMISSAO_ESPERA_MAX', 0.5))
+# Com o servidor saturado, responde com o fallback em vez de 503
+app.config['ADMISSAO_DEGRADAR'] = os.environ.get('JECET_ADMISSAO_DEGRADAR', '0') == '1'
+
+controle_admissao = ControleAdmissao(
+    taxa=app.config['ADMISSAO_TAXA'],
+    rajada=app.config['ADMISSAO_RAJADA'],
+    max_inferencias=app.config['ADMISSAO_MAX_INFERENCIAS'],
+    espera_max=app.config['ADMISSAO_ESPERA_MAX']
+)
+
+# Perfilador por amostragem (ligado sob demanda em /admin/perfilador)
+app.config['PERFILADOR_DURACAO_MAX'] = float(os.environ.get('JECET_PERFILADOR_DURACAO_MAX', 120))
+perfilador = PerfiladorAmostragem(duracao_max=app.config['PERFILADOR_DURACAO_MAX'])
+
+@app.before_request
+def _perfilar_requisicao():
+    if perfilador.ativo:
+        perfilador.entrar(request.endpoint or request.path)
+
+@app.teardown_request
+def _encerrar_perfil_requisicao(_erro=None):
+    if perfilador.ativo:
+        perfilador.sair()
+
 # Importar o modelo de IA treinada APRIMORADA
 try:
-    from precificador_ia_aprimorado import precificar_com_ia_aprimorada
+    from registro_modelos import RegistroModelos, CidadeNaoSuportada, slug_cidade
+    from circuit_breaker import CircuitBreaker, FECHADO
+    from analise_sensibilidade import montar_grade, precificar_grade
+    from agregados_mercado import CacheAgregados
+    from jobs_treinamento import GerenciadorTreinamento
+    from modo_sombra import AvaliadorSombra
+    from monitor_drift import MonitorDrift, ARQUIVO_REFERENCIA, carregar_referencia
+    registro_modelos = RegistroModelos(
+        memoria_max_mb=app.config['MODELOS_MEMORIA_MAX_MB'],
+        fixadas=app.config['MODELOS_CIDADES_FIXADAS']
+    )
+    cache_agregados = CacheAgregados()
+    gerenciador_treinamento = GerenciadorTreinamento(registro=registro_modelos, max_cpus=app.config['TREINO_MAX_CPUS'])
     IA_DISPONIVEL = True
     print("✅ IA APRIMORADA de precificação carregada com sucesso!")
 except Exception as e:
     print(f"⚠️ IA não disponível: {e}")
     IA_DISPONIVEL = False
 
+avaliador_sombra = None
+if IA_DISPONIVEL and app.config['SOMBRA_DIRETORIO']:
+    avaliador_sombra = AvaliadorSombra(app.config['SOMBRA_DIRETORIO'], fracao=app.config['SOMBRA_FRACAO'])
+
+# Um circuit breaker por cidade: um bundle corrompido não derruba as demais
+circuit_breakers = {}
+
+def obter_circuit_breaker(cidade):
+    """Breaker da cidade; CidadeNaoSuportada se não houver bundle (a cidade vem da requisição)"""
+    slug = slug_cidade(cidade)
+    if slug not in circuit_breakers:
+        if registro_modelos.diretorio_cidade(cidade) is None:
+            raise CidadeNaoSuportada(cidade)
+        def sonda():
+            # Recarrega o bundle do disco e faz uma predição de teste. `precificar_lote`
+            # não tem o fallback interno de `precificar`: um erro no modelo falha a sonda
+            registro_modelos.descartar(cidade)
+            teste = registro_modelos.obter(cidade).precificar_lote({
+                'bairro': ['Centro'], 'tipo_imovel': ['Casa'], 'area_construida': [100.0],
+                'area_terreno': [200.0], 'quartos': [2], 'banheiros': [1]
+            })
+            preco = float(teste['preco_estimado'].iloc[0])
+            if not preco > 0:
+                raise ValueError(f"Predição de teste inválida: {preco}")
+        circuit_breakers.setdefault(slug, CircuitBreaker(
+            nome=slug,
+            sonda=sonda,
+            limite_falhas=app.config['CB_LIMITE_FALHAS'],
+            intervalo_sondagem=app.config['CB_INTERVALO_SONDAGEM']
+        ))
+    return circuit_breakers[slug]
+
+# Um monitor de drift por cidade, recriado quando o bundle publica uma referência nova
+monitores_drift = {}
+
+def obter_monitor_drift(cidade):
+    """Monitor da cidade, ou None se o bundle não tiver referência de drift"""
+    diretorio = registro_modelos.diretorio_cidade(cidade)
+    if diretorio is None:
+        return None
+    try:
+        mtime = os.stat(os.path.join(diretorio, ARQUIVO_REFERENCIA)).st_mtime
+    except OSError:
+        return None
+    slug = slug_cidade(cidade)
+    atual = monitores_drift.get(slug)
+    if atual is None or atual[0] != mtime:
+        atual = (mtime, MonitorDrift(carregar_referencia(diretorio), intervalo=app.config['DRIFT_INTERVALO']))
+        monitores_drift[slug] = atual
+    return atual[1]
+
 # Função para precificar o imóvel usando IA
-def predict_price_ai(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel):
+def predict_price_ai(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel, cidade='Jacareí', sombra=False, explicar=False):
     """
     Faz a predição usando o modelo de Machine Learning treinado
     92.7% de precisão baseado em 6.309 registros
+    Com `explicar`, a contribuição de cada feature fica em `g.explicacao`
     """
+    if not IA_DISPONIVEL:
+        # IA não disponível, usa fallback
+        print("⚠️ IA não disponível, usando método fallback")
+        return predict_price_fallback(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
+
+    try:
+        breaker = obter_circuit_breaker(cidade)
+    except CidadeNaoSuportada:
+        print(f"⚠️ Sem modelo treinado para '{cidade}', usando método fallback")
+        return predict_price_fallback(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
+    if not breaker.permitir():
+        # Circuito aberto: resposta degradada imediata, sem tentar carregar o modelo
+        return predict_price_fallback(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
+
+    # Só requisições marcadas (API) e da cidade do candidato vão para o modo sombra
+    avaliador = avaliador_sombra
+    if not sombra or avaliador is None or slug_cidade(cidade) != slug_cidade(avaliador.cidade):
+        avaliador = None
+
     try:
-        if IA_DISPONIVEL:
-            # Usa IA APRIMORADA com máxima precisão
-            resultado = precificar_com_ia_aprimorada(
-                bairro=bairro,
-                tipo_imovel=tipo_imovel,
-                area_construida=float(area_construida),
-                area_terreno=float(area_terreno),
-                quartos=int(quartos),
-                banheiros=int(banheiros)
+        entrada = {
+            'bairro': bairro,
+            'tipo_imovel': tipo_imovel,
+            'area_construida': float(area_construida),
+            'area_terreno': float(area_terreno),
+            'quartos': int(quartos),
+            'banheiros': int(banheiros)
+        }
+        # Usa IA APRIMORADA da cidade (bundle carregado sob demanda)
+        with controle_admissao.inferencia():
+            resultado = registro_modelos.obter(cidade).precificar(
+                **entrada, medir_tempos=avaliador is not None, explicar=explicar, propagar_erros=True
             )
-            return resultado['preco_estimado']
-        else:
-            # IA não disponível, usa fallback
-            print("⚠️ IA não disponível, usando método fallback")
-            return predict_price_fallback(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
-        
+        breaker.registrar_sucesso()
+
+    except RequisicaoRejeitada:
+        # Saturação não é falha do modelo: não conta no circuit breaker
+        raise
+
+    except CidadeNaoSuportada:
+        print(f"⚠️ Sem modelo treinado para '{cidade}', usando método fallback")
+        return predict_price_fallback(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
+
     except Exception as e:
         print(f"❌ Erro ao usar IA: {e}")
+        breaker.registrar_falha(e)
         # Usar método de fallback
         return predict_price_fallback(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
 
+    # Drift e modo sombra fora do try: nunca afetam a resposta nem o breaker
+    try:
+        monitor = obter_monitor_drift(cidade)
+        if monitor is not None:
+            monitor.observar(entrada)
+    except Exception as e:
+        print(f"⚠️ Monitor de drift: observação ignorada: {e}")
+    if avaliador is not None:
+        try:
+            avaliador.submeter(entrada, resultado)
+        except Exception as e:
+            print(f"❌ Modo sombra: amostra descartada: {e}")
+    if explicar:
+        g.explicacao = resultado.get('explicacao')
+    return resultado['preco_estimado']
+
 # Função de fallback (método original melhorado)
 def predict_price_fallback(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel):
     """
@@ -106,8 +284,28 @@ def predict_price_fallback(bairro, area_construida, area_terreno, quartos, banhe
     return round(preco_estimado, 2)
 
 # Wrapper para manter compatibilidade
-def predict_price(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel):
-    return predict_price_ai(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
+def predict_price(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel, cidade='Jacareí', sombra=False, explicar=False):
+    return predict_price_ai(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel, cidade, sombra, explicar)
+
+def predict_price_admitido(usuario, bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel, cidade='Jacareí', sombra=False, explicar=False):
+    """
+    predict_price com controle de admissão. Retorna (preco, degradado) ou
+    lança RequisicaoRejeitada (429 por taxa, 503 por saturação)
+    """
+    controle_admissao.limitar_taxa(usuario)
+    try:
+        return predict_price(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel, cidade, sombra, explicar), False
+    except RequisicaoRejeitada:
+        if not app.config['ADMISSAO_DEGRADAR']:
+            raise
+        controle_admissao.registrar_degradada()
+        return predict_price_fallback(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel), True
+
+def _resposta_rejeitada(erro):
+    resposta = jsonify({'success': False, 'error': erro.motivo})
+    resposta.status_code = erro.status
+    resposta.headers['Retry-After'] = str(erro.retry_after)
+    return resposta
 
 # Simulação de banco de dados de usuários (em produção, use um banco de dados real)
 users = {
@@ -123,6 +321,14 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not app.config['ADMINS'] or session.get('user') not in app.config['ADMINS']:
+            return jsonify({'success': False, 'error': 'Acesso restrito a administradores'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     user = session.get('user')
@@ -137,7 +343,11 @@ def index():
         quartos = int(request.form["quartos"])
         banheiros = int(request.form["banheiros"])
         tipo_imovel = request.form.get("tipo_imovel", "Casa")
-        preco = predict_price(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
+        try:
+            preco, _ = predict_price_admitido(user, bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel, cidade)
+        except RequisicaoRejeitada as e:
+            flash(e.motivo, 'error')
+            return render_template("index.html", preco=None, user=user, cidade=cidade), e.status, {'Retry-After': str(e.retry_after)}
         return render_template("index.html", preco=f"R$ {preco:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'), bairro=bairro, user=user, tipo_imovel=tipo_imovel, cidade=cidade)
     return render_template("index.html", preco=None, user=user, cidade='Jacareí')
 
@@ -153,7 +363,7 @@ def register():
             flash('As senhas não coincidem', 'error')
             return redirect(url_for('index'))
 
-        if User.query.filter_by(username=username).first():
+        if not username or username in app.config['ADMINS'] or User.query.filter_by(username=username).first():
             flash('Nome de usuário já existe', 'error')
             return redirect(url_for('index'))
 
@@ -165,6 +375,7 @@ def register():
         user.set_password(password)
         db.session.add(user)
         db.session.commit()
+        cache_usuarios.invalidar(username)
 
         flash('Conta criada com sucesso!', 'success')
         return redirect(url_for('index'))
@@ -182,6 +393,7 @@ def login():
 
         user = User.query.filter_by(username=username).first()
         if user and user.check_password(password):
+            regenerar_sessao(session)
             session['user'] = user.username  # Salva o nome do usuário na sessão
             flash('Login realizado com sucesso!', 'success')
             return redirect(url_for('index'))
@@ -227,19 +439,26 @@ def check_auth():
 @app.route('/perfil', methods=['GET', 'POST'])
 @login_required
 def perfil():
-    user = User.query.filter_by(username=session['user']).first()
     if request.method == 'POST':
+        user = User.query.filter_by(username=session['user']).first()
+        nome_anterior = user.username
         novo_nome = request.form.get('novo_nome')
         whatsapp = request.form.get('whatsapp')
-        if novo_nome:
+        if novo_nome and novo_nome != nome_anterior:
+            # Nome de admin ou de outra conta daria acesso à identidade alheia
+            if novo_nome in app.config['ADMINS'] or User.query.filter_by(username=novo_nome).first():
+                flash('Nome de usuário já existe', 'error')
+                return redirect(url_for('perfil'))
             user.username = novo_nome
             session['user'] = novo_nome
         if whatsapp is not None:
             user.whatsapp = whatsapp
         db.session.commit()
+        cache_usuarios.invalidar(nome_anterior, user.username)
         flash('Perfil atualizado com sucesso!', 'success')
         return redirect(url_for('perfil'))
-    return render_template('perfil.html', user=user)
+    # GET servido do cache do worker: sem consulta ao banco a cada página
+    return render_template('perfil.html', user=cache_usuarios.obter(session['user']))
 
 @app.route('/api/precificar', methods=['POST'])
 @login_required
@@ -257,12 +476,17 @@ def api_precificar():
         quartos = int(data.get('quartos', 1))
         banheiros = int(data.get('banheiros', 1))
         tipo_imovel = data.get('tipo_imovel', 'Casa')
+        explicar = str(data.get('explicar', request.args.get('explicar', ''))).lower() in ('true', '1')
 
-        preco = predict_price(bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel)
+        preco, degradado = predict_price_admitido(
+            session['user'], bairro, area_construida, area_terreno, quartos, banheiros, tipo_imovel, cidade,
+            sombra=True, explicar=explicar
+        )
 
-        return jsonify({
+        resposta = {
             'success': True,
             'preco': preco,
+            'degradado': degradado,
             'preco_formatado': f"R$ {preco:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
             'dados': {
                 'cidade': cidade,
@@ -273,7 +497,14 @@ def api_precificar():
                 'quartos': quartos,
                 'banheiros': banheiros
             }
-        })
+        }
+        if explicar:
+            # None quando o preço veio do fallback (sem modelo)
+            resposta['explicacao'] = g.get('explicacao')
+        return jsonify(resposta)
+
+    except RequisicaoRejeitada as e:
+        return _resposta_rejeitada(e)
 
     except Exception as e:
         return jsonify({
@@ -281,28 +512,303 @@ def api_precificar():
             'error': str(e)
         }), 500
 
+@app.route('/api/sensibilidade', methods=['POST'])
+@login_required
+def api_sensibilidade():
+    """
+    Curva/superfície de preço variando 1 ou 2 dimensões de um imóvel base,
+    precificada com uma única chamada ao modelo
+    """
+    data = request.get_json() or {}
+    cidade = data.get('cidade', 'Jacareí')
+
+    if not IA_DISPONIVEL:
+        return jsonify({'success': False, 'error': 'IA não disponível'}), 503
+
+    # Entrada malformada é erro do cliente: validada antes e fora do circuit breaker
+    try:
+        eixos, registros = montar_grade(data.get('base') or {}, data.get('dimensoes') or [])
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    try:
+        breaker = obter_circuit_breaker(cidade)
+    except CidadeNaoSuportada:
+        return jsonify({'success': False, 'error': f"Sem modelo treinado para '{cidade}'"}), 404
+    if not breaker.permitir():
+        return jsonify({'success': False, 'error': 'IA temporariamente indisponível'}), 503
+
+    try:
+        controle_admissao.limitar_taxa(session['user'])
+        with controle_admissao.inferencia():
+            precificador = registro_modelos.obter(cidade)
+            resultado = precificar_grade(precificador, eixos, registros)
+        breaker.registrar_sucesso()
+    except RequisicaoRejeitada as e:
+        return _resposta_rejeitada(e)
+    except CidadeNaoSuportada:
+        return jsonify({'success': False, 'error': f"Sem modelo treinado para '{cidade}'"}), 404
+    except Exception as e:
+        breaker.registrar_falha(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    resultado['success'] = True
+    resultado['cidade'] = cidade
+    return jsonify(resultado)
+
+def _agregados_cidade(cidade):
+    """Entrada do cache de agregados da cidade (ou None se indisponível)"""
+    if not IA_DISPONIVEL:
+        return None
+    diretorio = registro_modelos.diretorio_cidade(cidade)
+    return cache_agregados.obter(diretorio) if diretorio else None
+
+def _resposta_json_com_etag(corpo, etag):
+    """Resposta JSON já serializada com ETag (304 se o cliente já tiver a versão)"""
+    resposta = app.response_class(corpo, mimetype='application/json')
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'public, max-age=300'
+    return resposta.make_conditional(request)
+
+@app.route('/api/bairros', methods=['GET'])
+def api_bairros():
+    """
+    Bairros conhecidos pela IA com contagem e mediana de preço/m²
+    (servido dos agregados pré-calculados, sem tocar no dataset)
+    """
+    cidade = request.args.get('cidade', 'Jacareí')
+    entrada = _agregados_cidade(cidade)
+    if entrada is None:
+        return jsonify({'success': False, 'error': 'Agregados de mercado não gerados. Execute treinador_ia.py'}), 503
+    return _resposta_json_com_etag(entrada['json_bairros'], entrada['etag'])
+
+@app.route('/api/mercado', methods=['GET'])
+def api_mercado():
+    """
+    Panorama de mercado: preço/m² (mediana e percentis), contagens e faixas
+    de área por bairro e por tipo. Filtros opcionais: ?bairro=...&tipo=...
+    """
+    cidade = request.args.get('cidade', 'Jacareí')
+    bairro = request.args.get('bairro')
+    tipo = request.args.get('tipo')
+
+    entrada = _agregados_cidade(cidade)
+    if entrada is None:
+        return jsonify({'success': False, 'error': 'Agregados de mercado não gerados. Execute treinador_ia.py'}), 503
+
+    if not bairro and not tipo:
+        return _resposta_json_com_etag(entrada['json_mercado'], entrada['etag'])
+
+    dados = entrada['dados']
+    resultado = {'gerado_em': dados['gerado_em']}
+    if bairro:
+        if bairro not in dados['por_bairro']:
+            return jsonify({'success': False, 'error': f"Bairro '{bairro}' não encontrado"}), 404
+        resultado['bairro'] = {'nome': bairro, **dados['por_bairro'][bairro]}
+    if tipo:
+        if tipo not in dados['por_tipo']:
+            return jsonify({'success': False, 'error': f"Tipo '{tipo}' não encontrado"}), 404
+        resultado['tipo'] = {'nome': tipo, **dados['por_tipo'][tipo]}
+    etag = f"{entrada['etag']}-{slug_cidade(bairro or '')}-{slug_cidade(tipo or '')}"
+    return _resposta_json_com_etag(json.dumps(resultado, ensure_ascii=False), etag)
+
+@app.route('/admin/treinamentos', methods=['GET', 'POST'])
+@admin_required
+def admin_treinamentos():
+    """
+    GET lista os jobs; POST inicia um treinamento em background
+    (JSON opcional: cidade, cpus, chunksize, arquivo_dataset em dados/)
+    """
+    if not IA_DISPONIVEL:
+        return jsonify({'success': False, 'error': 'IA não disponível'}), 503
+    if request.method == 'GET':
+        return jsonify({'success': True, 'jobs': gerenciador_treinamento.listar()})
+
+    data = request.get_json(silent=True) or {}
+    arquivo_dataset = data.get('arquivo_dataset', 'dados/dataset_imoveis_jacarei.csv')
+    if not isinstance(arquivo_dataset, str) \
+            or os.path.commonpath([os.path.abspath(arquivo_dataset), os.path.abspath('dados')]) != os.path.abspath('dados'):
+        return jsonify({'success': False, 'error': 'O dataset deve estar em dados/'}), 400
+
+    try:
+        cpus = int(data.get('cpus', 1))
+        chunksize = int(data['chunksize']) if data.get('chunksize') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': "'cpus' e 'chunksize' devem ser inteiros"}), 400
+
+    try:
+        job_id = gerenciador_treinamento.iniciar(
+            cidade=data.get('cidade', 'Jacareí'),
+            arquivo_dataset=arquivo_dataset,
+            cpus=cpus,
+            chunksize=chunksize
+        )
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    return jsonify({'success': True, 'job': gerenciador_treinamento.status(job_id)}), 202
+
+@app.route('/admin/treinamentos/<job_id>', methods=['GET'])
+@admin_required
+def admin_treinamento_status(job_id):
+    """Estado do job e eventos de progresso a partir de ?desde=N"""
+    status = gerenciador_treinamento.status(job_id, desde=request.args.get('desde', 0, type=int)) if IA_DISPONIVEL else None
+    if status is None:
+        return jsonify({'success': False, 'error': 'Job não encontrado'}), 404
+    return jsonify({'success': True, 'job': status})
+
+@app.route('/admin/treinamentos/<job_id>/cancelar', methods=['POST'])
+@admin_required
+def admin_treinamento_cancelar(job_id):
+    if not IA_DISPONIVEL or not gerenciador_treinamento.cancelar(job_id):
+        return jsonify({'success': False, 'error': 'Job não encontrado, já finalizado ou em publicação'}), 404
+    return jsonify({'success': True, 'job': gerenciador_treinamento.status(job_id)})
+
+@app.route('/admin/sombra', methods=['GET', 'POST', 'DELETE'])
+@admin_required
+def admin_sombra():
+    """
+    GET: divergência acumulada do candidato; POST {diretorio, fracao, cidade}:
+    inicia (ou troca) o candidato; DELETE: encerra o modo sombra
+    """
+    global avaliador_sombra
+
+    if request.method == 'GET':
+        return jsonify({'success': True, 'ativo': avaliador_sombra is not None,
+                        'sombra': avaliador_sombra.status() if avaliador_sombra else None})
+
+    if request.method == 'DELETE':
+        if avaliador_sombra is not None:
+            avaliador_sombra.encerrar()
+            avaliador_sombra = None
+        return jsonify({'success': True, 'ativo': False})
+
+    if not IA_DISPONIVEL:
+        return jsonify({'success': False, 'error': 'IA não disponível'}), 503
+
+    # Valida tudo antes de mexer no candidato atual: POST inválido não desliga o modo sombra
+    data = request.get_json(silent=True) or {}
+    diretorio = data.get('diretorio', '')
+    if not isinstance(diretorio, str) \
+            or os.path.commonpath([os.path.abspath(diretorio), os.path.abspath('models')]) != os.path.abspath('models') \
+            or not os.path.exists(os.path.join(diretorio, 'modelo_precificacao.pkl')):
+        return jsonify({'success': False, 'error': 'Informe um diretório de modelo válido em models/'}), 400
+    try:
+        fracao = float(data.get('fracao', app.config['SOMBRA_FRACAO']))
+    except (TypeError, ValueError):
+        fracao = None
+    if fracao is None or not 0.0 <= fracao <= 1.0:
+        return jsonify({'success': False, 'error': "'fracao' deve ser um número entre 0 e 1"}), 400
+
+    anterior = avaliador_sombra
+    avaliador_sombra = AvaliadorSombra(diretorio, cidade=data.get('cidade', 'Jacareí'), fracao=fracao)
+    if anterior is not None:
+        anterior.encerrar()
+    return jsonify({'success': True, 'ativo': True, 'sombra': avaliador_sombra.status()})
+
+@app.route('/admin/drift', methods=['GET'])
+@admin_required
+def admin_drift():
+    """PSI das entradas recebidas vs. dataset de treino, por cidade (?cidade=, ?forcar=1)"""
+    if not IA_DISPONIVEL:
+        return jsonify({'success': False, 'error': 'IA não disponível'}), 503
+    forcar = request.args.get('forcar') == '1'
+    cidade = request.args.get('cidade')
+    if cidade:
+        monitor = obter_monitor_drift(cidade)
+        if monitor is None:
+            return jsonify({'success': False, 'error': f"Sem referência de drift para '{cidade}'"}), 404
+        monitores = {slug_cidade(cidade): monitor}
+    else:
+        monitores = {slug: monitor for slug, (_, monitor) in list(monitores_drift.items())}
+    return jsonify({
+        'success': True,
+        'cidades': {slug: monitor.relatorio(forcar) for slug, monitor in monitores.items()}
+    })
+
+@app.route('/admin/drift/reiniciar', methods=['POST'])
+@admin_required
+def admin_drift_reiniciar():
+    """Inicia uma nova janela de observação para a cidade"""
+    if not IA_DISPONIVEL:
+        return jsonify({'success': False, 'error': 'IA não disponível'}), 503
+    cidade = (request.get_json(silent=True) or {}).get('cidade', 'Jacareí')
+    monitor = obter_monitor_drift(cidade)
+    if monitor is None:
+        return jsonify({'success': False, 'error': f"Sem referência de drift para '{cidade}'"}), 404
+    monitor.reiniciar()
+    return jsonify({'success': True})
+
+@app.route('/admin/admissao', methods=['GET'])
+@admin_required
+def admin_admissao():
+    """Limites e contadores do controle de admissão deste worker"""
+    return jsonify({'success': True, 'pid': os.getpid(), 'degradar': app.config['ADMISSAO_DEGRADAR'],
+                    'admissao': controle_admissao.status()})
+
+@app.route('/admin/perfilador', methods=['GET', 'POST', 'DELETE'])
+@admin_required
+def admin_perfilador():
+    """
+    GET: estado e funções mais amostradas; POST {duracao, intervalo_ms, fracao}:
+    inicia a amostragem neste worker; DELETE: interrompe
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            duracao = float(data.get('duracao', 10))
+            intervalo = float(data.get('intervalo_ms', 10)) / 1000
+            fracao = min(max(float(data.get('fracao', 1.0)), 0.0), 1.0)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Parâmetros inválidos'}), 400
+        if not perfilador.iniciar(duracao, intervalo, fracao):
+            return jsonify({'success': False, 'error': 'Perfilador já está ativo'}), 409
+    elif request.method == 'DELETE':
+        perfilador.parar()
+    return jsonify({'success': True, 'pid': os.getpid(), 'perfilador': perfilador.status()})
+
+@app.route('/admin/perfilador/pilhas', methods=['GET'])
+@admin_required
+def admin_perfilador_pilhas():
+    """Pilhas colapsadas (flamegraph.pl, speedscope, inferno)"""
+    resposta = app.response_class(perfilador.pilhas_colapsadas(), mimetype='text/plain')
+    resposta.headers['Content-Disposition'] = f'attachment; filename=perfil_{os.getpid()}.folded'
+    return resposta
+
 @app.route('/api/status-ia', methods=['GET'])
 def status_ia():
     """
     Verifica se a IA aprimorada está funcionando (integrada no Flask)
     """
-    global IA_DISPONIVEL
-    
+    breaker = None
     if IA_DISPONIVEL:
+        try:
+            breaker = obter_circuit_breaker(registro_modelos.cidade_padrao)
+        except CidadeNaoSuportada:
+            pass
+        circuitos = {slug: cb.status() for slug, cb in list(circuit_breakers.items())}
+    else:
+        circuitos = {}
+
+    if breaker is not None and breaker.estado == FECHADO:
         return jsonify({
             'ia_disponivel': True,
             'modelo_treinado': True,
             'versao': 'IA Aprimorada v2.0 - Machine Learning com Ajustes Inteligentes',
             'modo': 'IA Treinada',
             'precisao': '92.7% + Ajustes Inteligentes',
-            'registros_treinamento': '6,309'
+            'registros_treinamento': '6,309',
+            'circuit_breakers': circuitos,
+            'modelos': registro_modelos.status()
         })
     else:
         return jsonify({
             'ia_disponivel': False,
             'modelo_treinado': False,
             'versao': 'Fallback - Regras Matemáticas',
-            'modo': 'Fallback'
+            'modo': 'Fallback',
+            'circuit_breakers': circuitos
         })
 
 if __name__ == "__main__":
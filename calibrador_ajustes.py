@@ -0,0 +1,322 @@
+"""
+CALIBRAÇÃO DAS CONSTANTES DE AJUSTE
+Calcula uma única vez as predições base da floresta para todo o dataset
+(fora da amostra, por validação cruzada), aplica o pipeline de ajustes de
+forma vetorizada e busca em paralelo as constantes que minimizam o erro.
+O resultado vai para `constantes_ajustes.json` no diretório do bundle, que o
+PrecificadorIAAprimorado carrega no lugar dos valores fixos.
+
+Uso:
+    python calibrador_ajustes.py --candidatos 4000 --objetivo mape
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import KFold, cross_val_predict
+
+from agregados_mercado import calcular_segmentos_casa
+from precificador_ia_aprimorado import (
+    ARQUIVO_CONSTANTES, CONSTANTES_AJUSTES_PADRAO, PrecificadorIAAprimorado,
+    aplicar_ajustes_vetorizado, estatisticas_segmentos, montar_stats_lookup
+)
+from treinador_ia import TreinadorIA
+
+OBJETIVOS = ('mae', 'mape')
+
+# Intervalo de busca de cada constante escalar; listas/dicts são achatados
+# em `nome[indice]` / `nome[chave]` (ver `achatar`)
+ESPACO_BUSCA = {
+    'correcao_geral': (0.60, 1.10),
+    'fatores_tipo': (0.85, 1.15),
+    'fatores_area': (0.90, 1.10),
+    'fator_compacto_premium': (1.0, 2.5),
+    'peso_qualidade': (0.0, 0.8),
+    'fator_banheiros_casa_grande': (1.0, 1.4),
+    'fator_compacto_equipado': (1.0, 1.3),
+    'fator_densidade_comodos': (1.0, 1.3),
+    'limite_maximo': (1.5, 4.0),
+    'limite_minimo': (0.4, 0.95)
+}
+
+
+def achatar(constantes):
+    """Constantes -> (nomes, vetor, limites) na ordem de ESPACO_BUSCA"""
+    nomes, valores, limites = [], [], []
+    for nome, intervalo in ESPACO_BUSCA.items():
+        valor = constantes[nome]
+        if isinstance(valor, dict):
+            itens = [(f"{nome}[{chave}]", v) for chave, v in sorted(valor.items())]
+        elif isinstance(valor, (list, tuple)):
+            itens = [(f"{nome}[{i}]", v) for i, v in enumerate(valor)]
+        else:
+            itens = [(nome, valor)]
+        for rotulo, v in itens:
+            nomes.append(rotulo)
+            valores.append(float(v))
+            limites.append(intervalo)
+    return nomes, np.array(valores), np.array(limites)
+
+
+def montar(vetor, modelo=CONSTANTES_AJUSTES_PADRAO):
+    """Inverso de `achatar`: vetor -> dict no formato de CONSTANTES_AJUSTES_PADRAO"""
+    constantes = {}
+    posicao = 0
+    for nome in ESPACO_BUSCA:
+        valor = modelo[nome]
+        if isinstance(valor, dict):
+            chaves = sorted(valor)
+            constantes[nome] = {chave: round(float(vetor[posicao + i]), 4) for i, chave in enumerate(chaves)}
+            posicao += len(chaves)
+        elif isinstance(valor, (list, tuple)):
+            constantes[nome] = [round(float(v), 4) for v in vetor[posicao:posicao + len(valor)]]
+            posicao += len(valor)
+        else:
+            constantes[nome] = round(float(vetor[posicao]), 4)
+            posicao += 1
+    return constantes
+
+
+def calcular_erros(real, estimado):
+    erro_abs = np.abs(estimado - real)
+    return {
+        'mae': float(erro_abs.mean()),
+        'mape': float((erro_abs / real).mean() * 100),
+        'registros': int(len(real))
+    }
+
+
+class CalibradorAjustes:
+    def __init__(self, diretorio_modelos='models', arquivo_dataset=None, objetivo='mape',
+                 folds=5, validacao=0.2, n_jobs=-1, semente=42):
+        if objetivo not in OBJETIVOS:
+            raise ValueError(f"Objetivo inválido: {objetivo} (use {', '.join(OBJETIVOS)})")
+        self.diretorio_modelos = diretorio_modelos
+        self.objetivo = objetivo
+        self.folds = folds
+        self.validacao = validacao
+        self.n_jobs = n_jobs
+        self.rng = np.random.default_rng(semente)
+        self.semente = semente
+        self.precificador = PrecificadorIAAprimorado(diretorio_modelos=diretorio_modelos)
+        self.arquivo_dataset = arquivo_dataset or self.precificador.arquivo_dataset
+        self.dados = None
+
+    def preparar(self):
+        """Dataset limpo + predição base fora da amostra (única passada pela floresta)"""
+        treinador = TreinadorIA(diretorio_modelos=self.diretorio_modelos, arquivo_dataset=self.arquivo_dataset)
+        df = treinador.preprocessar_dados(treinador.carregar_dataset())
+
+        # Codificação do bundle (a do treinador é refeita sobre este dataset)
+        p = self.precificador
+        df = df[df['bairro'].isin(p.encoder_bairro.classes_) & df['tipo_imovel'].isin(p.encoder_tipo.classes_)]
+        df = df[df['area_construida'] != 0].reset_index(drop=True)
+        df['bairro_encoded'] = p.encoder_bairro.transform(df['bairro'])
+        df['tipo_encoded'] = p.encoder_tipo.transform(df['tipo_imovel'])
+
+        print(f"🌲 Predições base fora da amostra ({self.folds} folds, {len(df):,} registros)...")
+        inicio = time.perf_counter()
+        X = df[p.info_modelo['features']]
+        kfold = KFold(n_splits=self.folds, shuffle=True, random_state=self.semente)
+        preco_base = cross_val_predict(clone(p.modelo), X, df['preco'], cv=kfold)
+        print(f"   ✅ {time.perf_counter() - inicio:.1f}s")
+
+        # Separação calibração/validação: a busca só vê a parte de calibração
+        embaralhado = self.rng.permutation(len(df))
+        n_validacao = int(len(df) * self.validacao)
+        self.indices_validacao = np.sort(embaralhado[:n_validacao])
+        self.indices_calibracao = np.sort(embaralhado[n_validacao:])
+
+        self.dados = {
+            'preco_base': np.maximum(50000, preco_base),
+            'tipos': df['tipo_imovel'].to_numpy(dtype=object),
+            'bairros': df['bairro'].to_numpy(dtype=object),
+            'area_construida': df['area_construida'].to_numpy(dtype=float),
+            'quartos': df['quartos'].to_numpy(dtype=float),
+            'banheiros': df['banheiros'].to_numpy(dtype=float),
+            'stats': self._estatisticas_sem_vazamento(df),
+            'preco': df['preco'].to_numpy(dtype=float)
+        }
+        return self.dados
+
+    def _estatisticas_sem_vazamento(self, df):
+        """
+        Estatísticas de segmento de cada linha sem o próprio preço: a validação
+        usa só as linhas de calibração e cada fold da calibração usa só os
+        demais folds (as do bundle incluem todo o dataset e vazariam o alvo)
+        """
+        bairros = df['bairro'].to_numpy(dtype=object)
+        area_construida = df['area_construida'].to_numpy(dtype=float)
+
+        def estatisticas(linhas, origem):
+            lookup = montar_stats_lookup(calcular_segmentos_casa(df.iloc[origem]))
+            return estatisticas_segmentos(bairros[linhas], area_construida[linhas], lookup)
+
+        stats = np.empty((len(df), 4))
+        stats[self.indices_validacao] = estatisticas(self.indices_validacao, self.indices_calibracao)
+        kfold = KFold(n_splits=self.folds, shuffle=True, random_state=self.semente)
+        for treino, teste in kfold.split(self.indices_calibracao):
+            stats[self.indices_calibracao[teste]] = estatisticas(
+                self.indices_calibracao[teste], self.indices_calibracao[treino]
+            )
+        return stats
+
+    def _subconjunto(self, indices):
+        return {chave: valor[indices] for chave, valor in self.dados.items()}
+
+    def estimar(self, constantes, dados=None):
+        d = dados or self.dados
+        return aplicar_ajustes_vetorizado(
+            d['preco_base'], d['tipos'], d['bairros'], d['area_construida'], d['quartos'], d['banheiros'],
+            None, com_mensagens=False, constantes=constantes, stats=d['stats']
+        )['preco']
+
+    def buscar(self, candidatos=2000, rodadas_refino=4, tamanho_bloco=100):
+        """Busca aleatória no ESPACO_BUSCA + refino local em torno do melhor"""
+        nomes, padrao, limites = achatar(CONSTANTES_AJUSTES_PADRAO)
+        dados = self._subconjunto(self.indices_calibracao)
+
+        def avaliar_todos(vetores):
+            blocos = [vetores[i:i + tamanho_bloco] for i in range(0, len(vetores), tamanho_bloco)]
+            resultados = Parallel(n_jobs=self.n_jobs)(
+                delayed(_avaliar_bloco)(bloco, dados, self.objetivo) for bloco in blocos
+            )
+            return np.concatenate(resultados)
+
+        # Rodada 0: valores padrão + amostras uniformes no espaço de busca
+        amostras = self.rng.uniform(limites[:, 0], limites[:, 1], size=(candidatos, len(padrao)))
+        vetores = np.vstack([padrao, amostras])
+        inicio = time.perf_counter()
+        erros = avaliar_todos(vetores)
+        melhor = int(np.argmin(erros))
+        melhor_vetor, melhor_erro = vetores[melhor], erros[melhor]
+        avaliados = len(vetores)
+        print(f"🔎 Busca aleatória: {avaliados:,} candidatos, {self.objetivo} {erros[0]:,.2f} -> {melhor_erro:,.2f}")
+
+        # Refino: perturbações gaussianas com escala decrescente
+        escala = (limites[:, 1] - limites[:, 0]) * 0.1
+        for rodada in range(1, rodadas_refino + 1):
+            ruido = self.rng.normal(0, 1, size=(candidatos // 2, len(padrao))) * escala
+            vetores = np.clip(melhor_vetor + ruido, limites[:, 0], limites[:, 1])
+            erros = avaliar_todos(vetores)
+            avaliados += len(vetores)
+            if erros.min() < melhor_erro:
+                melhor = int(np.argmin(erros))
+                melhor_vetor, melhor_erro = vetores[melhor], erros[melhor]
+            print(f"   🎯 Refino {rodada}: {self.objetivo} {melhor_erro:,.2f}")
+            escala = escala / 2
+
+        duracao = time.perf_counter() - inicio
+        print(f"   ⚡ {avaliados:,} avaliações em {duracao:.1f}s ({avaliados / duracao:,.0f}/s)")
+        return montar(melhor_vetor)
+
+    def relatorio(self, constantes):
+        """MAE/MAPE (geral, por bairro e por tipo) na validação: padrão x calibrado"""
+        dados = self._subconjunto(self.indices_validacao)
+        real = dados['preco']
+        estimativas = {
+            'padrao': self.estimar(CONSTANTES_AJUSTES_PADRAO, dados),
+            'calibrado': self.estimar(constantes, dados)
+        }
+        relatorio = {nome: calcular_erros(real, estimado) for nome, estimado in estimativas.items()}
+
+        for grupo, valores in (('por_bairro', dados['bairros']), ('por_tipo', dados['tipos'])):
+            relatorio[grupo] = {}
+            for valor in sorted(set(valores)):
+                mascara = valores == valor
+                relatorio[grupo][valor] = {
+                    nome: calcular_erros(real[mascara], estimado[mascara])
+                    for nome, estimado in estimativas.items()
+                }
+        return relatorio
+
+    def salvar(self, constantes, relatorio):
+        calibracao = {
+            'gerado_em': datetime.now().isoformat(),
+            'versao_modelo': self.precificador.versao_modelo,
+            'arquivo_dataset': self.arquivo_dataset,
+            'objetivo': self.objetivo,
+            'metricas_validacao': {'padrao': relatorio['padrao'], 'calibrado': relatorio['calibrado']},
+            'constantes': constantes
+        }
+        caminho = os.path.join(self.diretorio_modelos, ARQUIVO_CONSTANTES)
+        # Troca atômica: um worker recarregando o bundle nunca lê o arquivo pela metade
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(calibracao, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, caminho)
+        print(f"💾 Constantes salvas em {caminho}")
+        return caminho
+
+
+def _avaliar_bloco(vetores, dados, objetivo):
+    """Erro de cada vetor de constantes (executado nos workers do joblib)"""
+    erros = np.empty(len(vetores))
+    real = dados['preco']
+    for i, vetor in enumerate(vetores):
+        estimado = aplicar_ajustes_vetorizado(
+            dados['preco_base'], dados['tipos'], dados['bairros'], dados['area_construida'],
+            dados['quartos'], dados['banheiros'], None, com_mensagens=False,
+            constantes=montar(vetor), stats=dados['stats']
+        )['preco']
+        erro_abs = np.abs(estimado - real)
+        erros[i] = erro_abs.mean() if objetivo == 'mae' else (erro_abs / real).mean() * 100
+    return erros
+
+
+def imprimir_relatorio(relatorio, top=10):
+    for nome in ('padrao', 'calibrado'):
+        m = relatorio[nome]
+        print(f"📊 {nome:<10} MAE R$ {m['mae']:>12,.0f}   MAPE {m['mape']:6.2f}%   ({m['registros']:,} registros)")
+
+    for grupo, titulo in (('por_tipo', 'tipo'), ('por_bairro', 'bairro')):
+        itens = sorted(relatorio[grupo].items(), key=lambda item: -item[1]['padrao']['registros'])
+        print(f"\n📍 MAPE por {titulo} (padrão -> calibrado)")
+        for valor, metricas in itens[:top]:
+            print(f"   {valor:<35} {metricas['padrao']['mape']:6.2f}% -> {metricas['calibrado']['mape']:6.2f}%"
+                  f"   ({metricas['padrao']['registros']:,})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra as constantes do pipeline de ajustes")
+    parser.add_argument('--modelos', default='models', help="Diretório do bundle")
+    parser.add_argument('--dataset', default=None, help="CSV (padrão: o registrado no bundle)")
+    parser.add_argument('--objetivo', choices=OBJETIVOS, default='mape')
+    parser.add_argument('--candidatos', type=int, default=2000, help="Candidatos por rodada")
+    parser.add_argument('--refino', type=int, default=4, help="Rodadas de refino local")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--validacao', type=float, default=0.2, help="Fração reservada para o relatório")
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--forcar', action='store_true', help="Salva mesmo sem melhora na validação")
+    parser.add_argument('--nao-salvar', action='store_true', help="Só exibe o relatório")
+    args = parser.parse_args()
+
+    calibrador = CalibradorAjustes(
+        diretorio_modelos=args.modelos, arquivo_dataset=args.dataset, objetivo=args.objetivo,
+        folds=args.folds, validacao=args.validacao, n_jobs=args.n_jobs, semente=args.semente
+    )
+    calibrador.preparar()
+    constantes = calibrador.buscar(candidatos=args.candidatos, rodadas_refino=args.refino)
+    relatorio = calibrador.relatorio(constantes)
+    print()
+    imprimir_relatorio(relatorio)
+    print(f"\n🔧 Constantes: {json.dumps(constantes, ensure_ascii=False)}")
+
+    if args.nao_salvar:
+        return
+    if relatorio['calibrado'][args.objetivo] >= relatorio['padrao'][args.objetivo] and not args.forcar:
+        print("⚠️ Sem melhora na validação; constantes não salvas (use --forcar para salvar)")
+        return
+    calibrador.salvar(constantes, relatorio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+CIRCUIT BREAKER PARA A IA
+Após falhas consecutivas abre o circuito e serve o fallback imediatamente;
+uma thread em background sonda a recuperação periodicamente
+"""
+
+import threading
+import time
+from datetime import datetime
+
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio_aberto'
+
+
+class CircuitBreaker:
+    """
+    Estados:
+    - fechado: chamadas passam normalmente
+    - aberto: chamadas são recusadas (o chamador usa o fallback)
+    - meio_aberto: a sonda de recuperação está em execução
+
+    `sonda` é uma função sem argumentos que lança exceção se o recurso
+    continua indisponível. Ela roda apenas na thread de background, nunca
+    no caminho da requisição.
+    """
+
+    def __init__(self, nome, sonda, limite_falhas=3, intervalo_sondagem=30.0):
+        self.nome = nome
+        self.sonda = sonda
+        self.limite_falhas = limite_falhas
+        self.intervalo_sondagem = intervalo_sondagem
+        self.estado = FECHADO
+        self.falhas_consecutivas = 0
+        self.ultimo_erro = None
+        self.aberto_desde = None
+        self.chamadas_recusadas = 0
+        self._lock = threading.Lock()
+        self._thread_sonda = None
+
+    def permitir(self):
+        """True se a chamada pode seguir para o recurso protegido"""
+        if self.estado == FECHADO:
+            return True
+        with self._lock:
+            self.chamadas_recusadas += 1
+        return False
+
+    def registrar_sucesso(self):
+        if self.falhas_consecutivas:
+            with self._lock:
+                self.falhas_consecutivas = 0
+
+    def registrar_falha(self, erro):
+        with self._lock:
+            self.falhas_consecutivas += 1
+            self.ultimo_erro = str(erro)
+            if self.estado == FECHADO and self.falhas_consecutivas >= self.limite_falhas:
+                self._abrir()
+
+    def _abrir(self):
+        """Abre o circuito e inicia a sonda (chamar com lock)"""
+        self.estado = ABERTO
+        self.aberto_desde = time.time()
+        print(f"🔌 Circuit breaker '{self.nome}' aberto após {self.falhas_consecutivas} falhas: {self.ultimo_erro}")
+        if self._thread_sonda is None or not self._thread_sonda.is_alive():
+            self._thread_sonda = threading.Thread(target=self._sondar, name=f"sonda-{self.nome}", daemon=True)
+            self._thread_sonda.start()
+
+    def _sondar(self):
+        """Tenta recuperar o recurso até conseguir"""
+        while True:
+            time.sleep(self.intervalo_sondagem)
+            with self._lock:
+                self.estado = MEIO_ABERTO
+            try:
+                self.sonda()
+            except Exception as e:
+                with self._lock:
+                    self.estado = ABERTO
+                    self.ultimo_erro = str(e)
+                continue
+
+            with self._lock:
+                self.estado = FECHADO
+                self.falhas_consecutivas = 0
+                self.aberto_desde = None
+            print(f"✅ Circuit breaker '{self.nome}' fechado - recurso recuperado")
+            return
+
+    def status(self):
+        with self._lock:
+            return {
+                'estado': self.estado,
+                'falhas_consecutivas': self.falhas_consecutivas,
+                'limite_falhas': self.limite_falhas,
+                'chamadas_recusadas': self.chamadas_recusadas,
+                'ultimo_erro': self.ultimo_erro,
+                'aberto_desde': datetime.fromtimestamp(self.aberto_desde).isoformat() if self.aberto_desde else None
+            }
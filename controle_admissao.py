@@ -0,0 +1,110 @@
+"""
+CONTROLE DE ADMISSÃO DOS ENDPOINTS DE PRECIFICAÇÃO
+Token bucket por usuário e limite global de inferências simultâneas, com
+rejeição rápida (429/503 + Retry-After) em vez de fila sem limite.
+Os limites valem por processo (cada worker tem os seus).
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RequisicaoRejeitada(Exception):
+    """Requisição recusada pelo controle de admissão"""
+
+    def __init__(self, status, retry_after, motivo):
+        super().__init__(motivo)
+        self.status = status
+        self.retry_after = retry_after
+        self.motivo = motivo
+
+
+class ControleAdmissao:
+    """
+    - `limitar_taxa(usuario)`: `taxa` requisições/s por usuário, com rajadas
+      de até `rajada`; acima disso lança RequisicaoRejeitada(429).
+      `taxa=0` desativa o limite por usuário
+    - `inferencia()`: no máximo `max_inferencias` predições ao mesmo tempo;
+      espera até `espera_max` segundos por uma vaga e depois lança
+      RequisicaoRejeitada(503)
+    """
+
+    def __init__(self, taxa=5.0, rajada=20, max_inferencias=4, espera_max=0.5,
+                 retry_after_saturado=1, max_usuarios=10000):
+        if taxa < 0:
+            raise ValueError(f"Taxa por usuário inválida: {taxa} (use 0 para desativar)")
+        self.taxa = taxa
+        self.rajada = rajada
+        self.max_inferencias = max_inferencias
+        self.espera_max = espera_max
+        self.retry_after_saturado = retry_after_saturado
+        self.max_usuarios = max_usuarios
+        self._baldes = {}  # usuario -> [tokens, ultimo_acesso]
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(max_inferencias)
+        self._em_execucao = 0
+        self.contadores = {'aceitas': 0, 'rejeitadas_taxa': 0, 'rejeitadas_saturacao': 0, 'degradadas': 0}
+
+    def limitar_taxa(self, usuario):
+        if not self.taxa:
+            return
+        agora = time.monotonic()
+        with self._lock:
+            balde = self._baldes.get(usuario)
+            if balde is None:
+                if len(self._baldes) >= self.max_usuarios:
+                    self._remover_ociosos(agora)
+                balde = self._baldes[usuario] = [float(self.rajada), agora]
+            else:
+                balde[0] = min(self.rajada, balde[0] + (agora - balde[1]) * self.taxa)
+                balde[1] = agora
+
+            if balde[0] >= 1:
+                balde[0] -= 1
+                return
+            self.contadores['rejeitadas_taxa'] += 1
+            retry_after = math.ceil((1 - balde[0]) / self.taxa)
+        raise RequisicaoRejeitada(429, retry_after, 'Muitas requisições. Tente novamente em instantes.')
+
+    def _remover_ociosos(self, agora):
+        """Baldes que já se recarregaram por completo equivalem a um usuário novo (chamar com lock)"""
+        tempo_recarga = self.rajada / self.taxa
+        for usuario in [u for u, (_, ultimo) in self._baldes.items() if agora - ultimo >= tempo_recarga]:
+            del self._baldes[usuario]
+        if len(self._baldes) >= self.max_usuarios:
+            # Todos ativos: descarta o acesso mais antigo
+            del self._baldes[min(self._baldes, key=lambda u: self._baldes[u][1])]
+
+    @contextmanager
+    def inferencia(self):
+        if not self._vagas.acquire(timeout=self.espera_max):
+            with self._lock:
+                self.contadores['rejeitadas_saturacao'] += 1
+            raise RequisicaoRejeitada(503, self.retry_after_saturado, 'Servidor sobrecarregado. Tente novamente em instantes.')
+        with self._lock:
+            self._em_execucao += 1
+            self.contadores['aceitas'] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._em_execucao -= 1
+            self._vagas.release()
+
+    def registrar_degradada(self):
+        with self._lock:
+            self.contadores['degradadas'] += 1
+
+    def status(self):
+        with self._lock:
+            return {
+                'taxa_por_usuario': self.taxa,
+                'rajada': self.rajada,
+                'max_inferencias': self.max_inferencias,
+                'espera_max_s': self.espera_max,
+                'inferencias_em_execucao': self._em_execucao,
+                'usuarios_rastreados': len(self._baldes),
+                'contadores': dict(self.contadores)
+            }
@@ -0,0 +1,97 @@
+"""
+EXPLICAÇÃO DO PREÇO BASE DA IA
+Atribuição por caminho de decisão (Saabas) sobre a floresta: cada split
+percorrido credita à feature do nó a variação da média entre pai e filho.
+Valor base (média do treino) + contribuições = predição do modelo.
+"""
+
+import numpy as np
+
+# Nomes expostos na API para as features codificadas
+NOMES_FEATURES = {'bairro_encoded': 'bairro', 'tipo_encoded': 'tipo_imovel'}
+
+
+class ExplicadorFloresta:
+    """
+    Na carga do modelo, acumula para cada folha de cada árvore a contribuição
+    por feature do caminho raiz -> folha (já dividida pelo número de árvores).
+    Explicar N linhas é então um `apply` (mesmo custo de percorrer as árvores
+    de uma predição) + a soma das linhas da tabela das folhas alcançadas.
+    """
+
+    def __init__(self, modelo, features):
+        self.modelo = modelo
+        self.features = list(features)
+        self.nomes = [NOMES_FEATURES.get(f, f) for f in self.features]
+
+        arvores = [estimador.tree_ for estimador in modelo.estimators_]
+        n_arvores = len(arvores)
+        n_features = len(self.features)
+        tabelas, mapas = [], []
+        # Posição de cada árvore no mapa global nó -> linha da tabela
+        self.deslocamentos = np.zeros(n_arvores, dtype=np.int64)
+        total_nos = 0
+        total_folhas = 0
+        self.valor_base = 0.0
+
+        for t, arvore in enumerate(arvores):
+            media = arvore.value[:, 0, 0] / n_arvores
+            esquerda, direita, feature = arvore.children_left, arvore.children_right, arvore.feature
+            contribuicao = np.zeros((arvore.node_count, n_features))
+
+            # Desce nível a nível: filho = pai + variação da média na feature do split
+            nivel = np.array([0])
+            while len(nivel):
+                internos = nivel[esquerda[nivel] >= 0]
+                for filhos in (esquerda[internos], direita[internos]):
+                    contribuicao[filhos] = contribuicao[internos]
+                    contribuicao[filhos, feature[internos]] += media[filhos] - media[internos]
+                nivel = np.concatenate([esquerda[internos], direita[internos]])
+
+            folhas = np.flatnonzero(esquerda < 0)
+            mapa = np.full(arvore.node_count, -1, dtype=np.int64)
+            mapa[folhas] = np.arange(len(folhas)) + total_folhas
+            tabelas.append(contribuicao[folhas])
+            mapas.append(mapa)
+            self.deslocamentos[t] = total_nos
+            total_nos += arvore.node_count
+            total_folhas += len(folhas)
+            self.valor_base += media[0]
+
+        self.mapa_folhas = np.concatenate(mapas)
+        self.tabela = np.concatenate(tabelas)
+
+    @property
+    def nbytes(self):
+        return self.tabela.nbytes + self.mapa_folhas.nbytes
+
+    def contribuicoes(self, X):
+        """Matriz (linhas x features) de contribuições; X nas colunas de `features`"""
+        linhas = self.mapa_folhas[self.modelo.apply(X) + self.deslocamentos]
+        contribuicoes = np.zeros((linhas.shape[0], self.tabela.shape[1]))
+        for t in range(linhas.shape[1]):
+            contribuicoes += self.tabela[linhas[:, t]]
+        return contribuicoes
+
+    def explicar(self, X):
+        """Uma explicação (dict) por linha de X"""
+        contribuicoes = self.contribuicoes(X)
+        return [self._formatar(linha) for linha in contribuicoes]
+
+    def _formatar(self, contribuicoes):
+        return {
+            'valor_base': round(float(self.valor_base), 2),
+            'contribuicoes': {nome: round(float(c), 2) for nome, c in zip(self.nomes, contribuicoes)},
+            'predicao_modelo': round(float(self.valor_base + contribuicoes.sum()), 2)
+        }
+
+
+def criar_explicador(modelo, features):
+    """Explicador para florestas/árvores do sklearn; None para outros modelos"""
+    if not hasattr(modelo, 'estimators_') or not hasattr(modelo, 'decision_path'):
+        return None
+    try:
+        return ExplicadorFloresta(modelo, features)
+    except (AttributeError, IndexError, TypeError) as e:
+        print(f"⚠️ Explicação de preço indisponível para este modelo: {e}")
+        return None
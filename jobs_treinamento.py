@@ -0,0 +1,277 @@
+"""
+JOBS DE TREINAMENTO EM BACKGROUND
+Executa TreinadorIA.executar_treinamento_completo em um processo separado,
+com limite de CPUs e prioridade baixa, repassando o progresso como eventos
+estruturados e publicando o modelo novo ao final
+"""
+
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+
+EXECUTANDO = 'executando'
+# Treino terminou e o bundle está sendo copiado: não pode mais ser cancelado
+PUBLICANDO = 'publicando'
+CONCLUIDO = 'concluido'
+FALHOU = 'falhou'
+CANCELADO = 'cancelado'
+EM_ANDAMENTO = (EXECUTANDO, PUBLICANDO)
+
+MAX_EVENTOS = 500
+# Jobs finalizados mantidos em memória para consulta (os mais antigos saem primeiro)
+MAX_JOBS_HISTORICO = 50
+
+
+def cpus_disponiveis():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _limitar_recursos(cpus):
+    """Restringe o processo atual a `cpus` núcleos com prioridade baixa"""
+    for variavel in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[variavel] = str(cpus)
+    if hasattr(os, 'sched_setaffinity'):
+        # Usa os últimos núcleos: os primeiros ficam livres para o servidor
+        nucleos = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, nucleos[-cpus:])
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+
+def _executar_job(fila, diretorio_saida, arquivo_dataset, cidade, cpus, chunksize):
+    """Corpo do processo filho (precisa ser importável para o contexto 'spawn')"""
+    _limitar_recursos(cpus)
+
+    # Importa só depois de limitar as threads nativas
+    from treinador_ia import TreinadorIA
+
+    treinador = TreinadorIA(
+        diretorio_modelos=diretorio_saida,
+        arquivo_dataset=arquivo_dataset,
+        cidade=cidade,
+        n_jobs=cpus,
+        callback_progresso=lambda evento: fila.put(('progresso', evento))
+    )
+    sucesso = treinador.executar_treinamento_completo(chunksize=chunksize)
+    fila.put(('fim', {'sucesso': sucesso, 'metricas': treinador.metricas}))
+
+
+class GerenciadorTreinamento:
+    """
+    Gerencia jobs de treinamento (um por vez). Cada job treina em
+    `diretorio_jobs/<id>/` e, se concluir com sucesso, é publicado pelo
+    `registro` (RegistroModelos) ou copiado para `diretorio_publicacao`.
+    Terminado o job (publicado, falho ou cancelado) o diretório de trabalho é
+    apagado, salvo com `manter_diretorios` (útil para inspecionar falhas).
+    """
+
+    def __init__(self, diretorio_jobs='models/jobs', registro=None, max_cpus=None, manter_diretorios=False):
+        self.diretorio_jobs = diretorio_jobs
+        self.registro = registro
+        self.manter_diretorios = manter_diretorios
+        self.max_cpus = max_cpus or max(1, cpus_disponiveis() // 2)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # spawn: não herda threads/locks do servidor Flask
+        self._contexto = multiprocessing.get_context('spawn')
+
+    def iniciar(self, cidade='Jacareí', arquivo_dataset='dados/dataset_imoveis_jacarei.csv',
+                cpus=1, chunksize=None, diretorio_publicacao=None):
+        """Inicia um job e retorna seu id. Lança RuntimeError se já houver um em execução."""
+        cpus = max(1, min(int(cpus), self.max_cpus))
+        if not os.path.exists(arquivo_dataset):
+            raise FileNotFoundError(f"Dataset não encontrado: {arquivo_dataset}")
+
+        with self._lock:
+            if any(job['estado'] in EM_ANDAMENTO for job in self._jobs.values()):
+                raise RuntimeError("Já existe um treinamento em execução")
+
+            self._podar_historico()
+            job_id = uuid.uuid4().hex[:12]
+            diretorio_saida = os.path.join(self.diretorio_jobs, job_id)
+            fila = self._contexto.Queue()
+            processo = self._contexto.Process(
+                target=_executar_job,
+                args=(fila, diretorio_saida, arquivo_dataset, cidade, cpus, chunksize),
+                name=f"treino-{job_id}",
+                daemon=True
+            )
+            job = {
+                'id': job_id,
+                'cidade': cidade,
+                'arquivo_dataset': arquivo_dataset,
+                'cpus': cpus,
+                'chunksize': chunksize,
+                'estado': EXECUTANDO,
+                'etapa': None,
+                'iniciado_em': datetime.now().isoformat(),
+                'finalizado_em': None,
+                'metricas': None,
+                'publicado': False,
+                'erro': None,
+                'eventos': deque(maxlen=MAX_EVENTOS),
+                'total_eventos': 0,
+                '_processo': processo,
+                '_diretorio_saida': diretorio_saida,
+                '_diretorio_publicacao': diretorio_publicacao,
+                '_acompanhamento': None
+            }
+            self._jobs[job_id] = job
+            processo.start()
+
+        job['_acompanhamento'] = threading.Thread(
+            target=self._acompanhar, args=(job, fila), name=f"acompanha-{job_id}", daemon=True
+        )
+        job['_acompanhamento'].start()
+        return job_id
+
+    def _acompanhar(self, job, fila):
+        """Consome eventos do processo filho até o fim do job"""
+        processo = job['_processo']
+        resultado = None
+        while True:
+            try:
+                tipo, dados = fila.get(timeout=1.0)
+            except Exception:
+                if not processo.is_alive():
+                    break
+                continue
+            if tipo == 'progresso':
+                with self._lock:
+                    job['eventos'].append(dados)
+                    job['total_eventos'] += 1
+                    job['etapa'] = dados.get('etapa')
+            else:
+                resultado = dados
+                break
+        processo.join()
+        try:
+            self._finalizar(job, processo, resultado)
+        finally:
+            self._limpar_diretorio(job)
+
+    def _finalizar(self, job, processo, resultado):
+        with self._lock:
+            if job['estado'] == CANCELADO:
+                return
+            job['finalizado_em'] = datetime.now().isoformat()
+            if not resultado or not resultado['sucesso']:
+                job['estado'] = FALHOU
+                job['erro'] = 'Treinamento falhou' if resultado else f"Processo encerrado (código {processo.exitcode})"
+                return
+            job['metricas'] = resultado['metricas']
+            # Ainda sob o lock: a partir daqui `cancelar` recusa o job
+            job['estado'] = PUBLICANDO
+
+        try:
+            self._publicar(job)
+            publicado, erro, estado = True, None, CONCLUIDO
+        except Exception as e:
+            publicado, erro, estado = False, f"Falha ao publicar modelo: {e}", FALHOU
+        with self._lock:
+            job['publicado'] = publicado
+            job['erro'] = erro
+            job['estado'] = estado
+
+    def _limpar_diretorio(self, job):
+        """Apaga o bundle de trabalho do job (já copiado se foi publicado)"""
+        if not self.manter_diretorios:
+            shutil.rmtree(job['_diretorio_saida'], ignore_errors=True)
+
+    def _podar_historico(self):
+        """Descarta os registros finalizados mais antigos além de MAX_JOBS_HISTORICO (chamar com lock)"""
+        finalizados = [job_id for job_id, job in self._jobs.items() if job['estado'] not in EM_ANDAMENTO]
+        for job_id in finalizados[:max(0, len(finalizados) - MAX_JOBS_HISTORICO + 1)]:
+            del self._jobs[job_id]
+
+    def _publicar(self, job):
+        if job['_diretorio_publicacao']:
+            from registro_modelos import promover_bundle
+            promover_bundle(job['_diretorio_saida'], job['_diretorio_publicacao'])
+        elif self.registro is not None:
+            self.registro.promover(job['cidade'], job['_diretorio_saida'])
+
+    def cancelar(self, job_id):
+        """Interrompe o job. Retorna False se ele não estiver em execução (ou já estiver publicando)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['estado'] != EXECUTANDO:
+                return False
+            job['estado'] = CANCELADO
+            job['finalizado_em'] = datetime.now().isoformat()
+        job['_processo'].terminate()
+        return True
+
+    def aguardar(self, job_id, timeout=None):
+        """Espera o fim do acompanhamento do job (publicação e limpeza inclusas)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job['_acompanhamento'] is not None:
+            job['_acompanhamento'].join(timeout)
+
+    def status(self, job_id, desde=0):
+        """Estado do job e eventos a partir do índice `desde`"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            resumo = {k: v for k, v in job.items() if not k.startswith('_') and k != 'eventos'}
+            # Índice global do primeiro evento ainda guardado no buffer
+            primeiro = job['total_eventos'] - len(job['eventos'])
+            resumo['eventos'] = list(job['eventos'])[max(0, desde - primeiro):]
+            return resumo
+
+    def listar(self):
+        with self._lock:
+            return [
+                {k: v for k, v in job.items() if not k.startswith('_') and k != 'eventos'}
+                for job in self._jobs.values()
+            ]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Treina um modelo em background com limite de CPUs")
+    parser.add_argument('--cidade', default='Jacareí')
+    parser.add_argument('--dataset', default='dados/dataset_imoveis_jacarei.csv')
+    parser.add_argument('--cpus', type=int, default=1)
+    parser.add_argument('--chunksize', type=int, default=None)
+    parser.add_argument('--publicar-em', default=None,
+                        help="Diretório servido que recebe o modelo novo (padrão: o bundle da cidade)")
+    parser.add_argument('--manter-diretorio', action='store_true',
+                        help="Não apaga o diretório de trabalho do job ao final")
+    args = parser.parse_args()
+
+    if args.publicar_em is None:
+        # Sem registro carregado: só o layout de diretórios (models/ ou models/cidades/<slug>/)
+        from registro_modelos import RegistroModelos
+        args.publicar_em = RegistroModelos().diretorio_destino(args.cidade)
+        print(f"📁 Publicando em {args.publicar_em}")
+
+    gerenciador = GerenciadorTreinamento(max_cpus=cpus_disponiveis(), manter_diretorios=args.manter_diretorio)
+    job_id = gerenciador.iniciar(args.cidade, args.dataset, args.cpus, args.chunksize,
+                                 diretorio_publicacao=args.publicar_em)
+    print(f"🚀 Job {job_id} iniciado ({args.cpus} CPU(s))")
+    visto = 0
+    try:
+        while True:
+            status = gerenciador.status(job_id, desde=visto)
+            visto += len(status['eventos'])
+            if status['estado'] not in EM_ANDAMENTO:
+                break
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        gerenciador.cancelar(job_id)
+        status = gerenciador.status(job_id)
+    gerenciador.aguardar(job_id, timeout=30)
+    status = gerenciador.status(job_id)
+    print(f"🏁 Job {job_id}: {status['estado']}" + (f" - {status['erro']}" if status['erro'] else ""))
@@ -0,0 +1,176 @@
+"""
+MODO SOMBRA (SHADOW) PARA MODELOS CANDIDATOS
+Reprecifica uma fração do tráfego real com um bundle candidato, fora do
+caminho da requisição, e acumula a divergência em relação ao modelo ativo
+"""
+
+import json
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ETAPAS = ('codificacao', 'modelo', 'ajustes', 'total')
+TAMANHO_AMOSTRA = 1000
+
+
+class AvaliadorSombra:
+    """
+    - `submeter` só sorteia e enfileira: custo desprezível na requisição
+    - Se a fila passar de `fila_max`, a amostra é descartada (nunca bloqueia)
+    - O bundle candidato é carregado no próprio worker, na primeira amostra
+    - Cada comparação vai para um log JSONL; agregados ficam em memória
+    """
+
+    def __init__(self, diretorio_candidato, cidade='Jacareí', fracao=0.1, fila_max=100,
+                 arquivo_log='logs/sombra.jsonl', fabrica=None):
+        self.diretorio_candidato = diretorio_candidato
+        self.cidade = cidade
+        self.fracao = fracao
+        self.fila_max = fila_max
+        self.arquivo_log = arquivo_log
+        self.fabrica = fabrica
+        self.candidato = None
+        self.erro_carga = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sombra')
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._rng = random.Random()
+        self.iniciado_em = datetime.now().isoformat()
+        self._zerar_estatisticas()
+
+    def _zerar_estatisticas(self):
+        self.comparacoes = 0
+        self.descartadas = 0
+        self.erros = 0
+        self.soma_delta = 0.0
+        self.soma_delta_abs = 0.0
+        self.soma_delta_pct_abs = 0.0
+        self.max_delta_pct_abs = 0.0
+        self.ajustes_divergentes = 0
+        self.soma_tempos = {'ativo': dict.fromkeys(ETAPAS, 0.0), 'candidato': dict.fromkeys(ETAPAS, 0.0)}
+        # Amostra de reservatório dos |delta %| para percentis
+        self.amostra_delta_pct = []
+
+    def submeter(self, entrada, resultado_ativo):
+        """Chamado na requisição após a resposta ativa estar pronta"""
+        if resultado_ativo.get('fallback'):
+            # Preço de fallback não é saída do modelo ativo: nada a comparar
+            return
+        if self._rng.random() >= self.fracao:
+            return
+        with self._lock:
+            if self._pendentes >= self.fila_max:
+                self.descartadas += 1
+                return
+            self._pendentes += 1
+        try:
+            self._executor.submit(self._comparar, entrada, resultado_ativo)
+        except RuntimeError:
+            # Executor encerrado por uma troca/remoção concorrente em /admin/sombra
+            with self._lock:
+                self._pendentes -= 1
+                self.descartadas += 1
+
+    def _carregar_candidato(self):
+        if self.candidato is None and self.erro_carga is None:
+            try:
+                if self.fabrica is None:
+                    from precificador_ia_aprimorado import PrecificadorIAAprimorado
+                    self.fabrica = PrecificadorIAAprimorado
+                self.candidato = self.fabrica(diretorio_modelos=self.diretorio_candidato)
+            except Exception as e:
+                self.erro_carga = str(e)
+                print(f"❌ Modo sombra: erro ao carregar candidato: {e}")
+        return self.candidato
+
+    def _comparar(self, entrada, resultado_ativo):
+        try:
+            candidato = self._carregar_candidato()
+            if candidato is None:
+                return
+            resultado = candidato.precificar(**entrada, medir_tempos=True, propagar_erros=True)
+            self._registrar(entrada, resultado_ativo, resultado)
+        except Exception as e:
+            with self._lock:
+                self.erros += 1
+            print(f"❌ Modo sombra: erro na comparação: {e}")
+        finally:
+            with self._lock:
+                self._pendentes -= 1
+
+    def _registrar(self, entrada, ativo, candidato):
+        delta = candidato['preco_estimado'] - ativo['preco_estimado']
+        delta_pct = delta / ativo['preco_estimado'] * 100 if ativo['preco_estimado'] else 0.0
+        ajustes_diferentes = candidato['ajustes_aplicados'] != ativo['ajustes_aplicados']
+        tempos_ativo = ativo.get('tempos_ms', {})
+        tempos_candidato = candidato.get('tempos_ms', {})
+
+        with self._lock:
+            self.comparacoes += 1
+            self.soma_delta += delta
+            self.soma_delta_abs += abs(delta)
+            self.soma_delta_pct_abs += abs(delta_pct)
+            self.max_delta_pct_abs = max(self.max_delta_pct_abs, abs(delta_pct))
+            self.ajustes_divergentes += ajustes_diferentes
+            for etapa in ETAPAS:
+                self.soma_tempos['ativo'][etapa] += tempos_ativo.get(etapa, 0.0)
+                self.soma_tempos['candidato'][etapa] += tempos_candidato.get(etapa, 0.0)
+            if len(self.amostra_delta_pct) < TAMANHO_AMOSTRA:
+                self.amostra_delta_pct.append(abs(delta_pct))
+            else:
+                j = self._rng.randrange(self.comparacoes)
+                if j < TAMANHO_AMOSTRA:
+                    self.amostra_delta_pct[j] = abs(delta_pct)
+
+        if self.arquivo_log:
+            registro = {
+                'ts': datetime.now().isoformat(),
+                'entrada': entrada,
+                'preco_ativo': ativo['preco_estimado'],
+                'preco_candidato': candidato['preco_estimado'],
+                'delta': round(delta, 2),
+                'delta_pct': round(delta_pct, 3),
+                'ajustes_divergentes': ajustes_diferentes,
+                'tempos_ms_ativo': tempos_ativo,
+                'tempos_ms_candidato': tempos_candidato
+            }
+            os.makedirs(os.path.dirname(self.arquivo_log) or '.', exist_ok=True)
+            with open(self.arquivo_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    def status(self):
+        with self._lock:
+            n = self.comparacoes
+            amostra = sorted(self.amostra_delta_pct)
+            percentil = lambda p: round(amostra[min(int(len(amostra) * p / 100), len(amostra) - 1)], 3) if amostra else None
+            media = lambda soma: round(soma / n, 3) if n else None
+            return {
+                'cidade': self.cidade,
+                'diretorio_candidato': self.diretorio_candidato,
+                'versao_candidato': self.candidato.versao_modelo if self.candidato else None,
+                'erro_carga': self.erro_carga,
+                'fracao': self.fracao,
+                'iniciado_em': self.iniciado_em,
+                'comparacoes': n,
+                'pendentes': self._pendentes,
+                'descartadas': self.descartadas,
+                'erros': self.erros,
+                'delta_medio': media(self.soma_delta),
+                'delta_abs_medio': media(self.soma_delta_abs),
+                'delta_pct_abs_medio': media(self.soma_delta_pct_abs),
+                'delta_pct_abs_p50': percentil(50),
+                'delta_pct_abs_p95': percentil(95),
+                'delta_pct_abs_max': round(self.max_delta_pct_abs, 3),
+                'taxa_ajustes_divergentes': round(self.ajustes_divergentes / n, 4) if n else None,
+                'latencia_media_ms': {
+                    modelo: {etapa: media(soma) for etapa, soma in tempos.items()}
+                    for modelo, tempos in self.soma_tempos.items()
+                }
+            }
+
+    def encerrar(self):
+        """Para de aceitar amostras (as pendentes são descartadas)"""
+        self.fracao = 0.0
+        self._executor.shutdown(wait=False, cancel_futures=True)
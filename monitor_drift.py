@@ -0,0 +1,262 @@
+"""
+MONITORAMENTO DE DRIFT DAS ENTRADAS
+Resume as features de cada requisição em sketches de memória constante
+(histogramas sobre as faixas de referência, count-min e heavy hitters)
+e compara com a distribuição do dataset de treino via PSI
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+ARQUIVO_REFERENCIA = 'referencia_drift.json'
+
+FEATURES_NUMERICAS = ['area_construida', 'area_terreno', 'quartos', 'banheiros']
+FEATURES_CATEGORICAS = ['bairro', 'tipo_imovel']
+
+N_FAIXAS = 10
+EPSILON = 1e-4
+
+# PSI < 0.1: estável; 0.1-0.25: atenção; > 0.25: drift
+LIMITE_ATENCAO = 0.1
+LIMITE_DRIFT = 0.25
+
+
+def _bordas_quantis(valores, n_faixas=N_FAIXAS):
+    """Bordas internas dos decis do treino (sem repetições: features discretas)"""
+    bordas = np.quantile(valores, np.linspace(0, 1, n_faixas + 1)[1:-1])
+    return np.unique(bordas)
+
+
+def _indices_faixas(valores, bordas):
+    # Faixa i = (bordas[i-1], bordas[i]]; valores acima da última borda caem na última faixa
+    return np.searchsorted(bordas, valores, side='left')
+
+
+def gerar_referencia(df):
+    """Distribuições de referência a partir do DataFrame de treino (já limpo)"""
+    referencia = {'gerado_em': datetime.now().isoformat(), 'total_registros': int(len(df)),
+                  'numericas': {}, 'categoricas': {}}
+
+    for feature in FEATURES_NUMERICAS:
+        valores = df[feature].to_numpy(dtype=float)
+        bordas = _bordas_quantis(valores)
+        contagens = np.bincount(_indices_faixas(valores, bordas), minlength=len(bordas) + 1)
+        referencia['numericas'][feature] = {
+            'bordas': bordas.tolist(),
+            'proporcoes': (contagens / len(valores)).tolist(),
+            'min': float(valores.min()),
+            'max': float(valores.max())
+        }
+
+    for feature in FEATURES_CATEGORICAS:
+        frequencias = df[feature].astype(str).value_counts(normalize=True)
+        referencia['categoricas'][feature] = {str(k): float(v) for k, v in frequencias.items()}
+
+    return referencia
+
+
+def salvar_referencia(referencia, diretorio_modelos='models'):
+    os.makedirs(diretorio_modelos, exist_ok=True)
+    caminho = os.path.join(diretorio_modelos, ARQUIVO_REFERENCIA)
+    caminho_tmp = caminho + '.tmp'
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        json.dump(referencia, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(caminho_tmp, caminho)
+    return caminho
+
+
+def carregar_referencia(diretorio_modelos):
+    """Referência do bundle, ou None se o modelo foi treinado antes do monitoramento"""
+    caminho = os.path.join(diretorio_modelos, ARQUIVO_REFERENCIA)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def psi(esperado, observado):
+    """Population Stability Index entre duas distribuições (mesmas faixas)"""
+    esperado = np.clip(np.asarray(esperado, dtype=float), EPSILON, None)
+    observado = np.clip(np.asarray(observado, dtype=float), EPSILON, None)
+    return float(np.sum((observado - esperado) * np.log(observado / esperado)))
+
+
+def classificar_psi(valor):
+    if valor is None:
+        return None
+    if valor < LIMITE_ATENCAO:
+        return 'estavel'
+    return 'atencao' if valor < LIMITE_DRIFT else 'drift'
+
+
+class CountMinSketch:
+    """Frequência aproximada por chave em `profundidade x largura` contadores (superestima, nunca subestima)"""
+
+    def __init__(self, largura=1024, profundidade=4):
+        self.largura = largura
+        self.profundidade = profundidade
+        self.contadores = np.zeros((profundidade, largura), dtype=np.int64)
+
+    def _posicoes(self, chave):
+        dados = chave.encode('utf-8')
+        return [zlib.crc32(dados, semente * 0x9E3779B1 & 0xFFFFFFFF) % self.largura
+                for semente in range(1, self.profundidade + 1)]
+
+    def adicionar(self, chave):
+        self.contadores[np.arange(self.profundidade), self._posicoes(chave)] += 1
+
+    def estimar(self, chave):
+        return int(self.contadores[np.arange(self.profundidade), self._posicoes(chave)].min())
+
+
+class HeavyHitters:
+    """Misra-Gries: guarda no máximo `k` chaves candidatas às mais frequentes"""
+
+    def __init__(self, k=50):
+        self.k = k
+        self.contadores = {}
+
+    def adicionar(self, chave):
+        if chave in self.contadores:
+            self.contadores[chave] += 1
+        elif len(self.contadores) < self.k:
+            self.contadores[chave] = 1
+        else:
+            for outra in list(self.contadores):
+                self.contadores[outra] -= 1
+                if self.contadores[outra] == 0:
+                    del self.contadores[outra]
+
+    def chaves(self):
+        return sorted(self.contadores, key=self.contadores.get, reverse=True)
+
+
+class MonitorDrift:
+    """
+    Sketches das entradas servidas por um bundle. Memória constante:
+    - numéricas: contagem por faixa da referência + fora do intervalo do treino
+    - categóricas: count-min para frequências e Misra-Gries para chaves novas
+    O relatório (PSI por feature) é recalculado no máximo a cada `intervalo` segundos.
+    """
+
+    def __init__(self, referencia, intervalo=60.0, largura_sketch=1024, k_heavy_hitters=50):
+        self.referencia = referencia
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._bordas = {f: np.asarray(r['bordas']) for f, r in referencia['numericas'].items()}
+        self._vocabulario = {f: set(r) for f, r in referencia['categoricas'].items()}
+        self._largura_sketch = largura_sketch
+        self._k = k_heavy_hitters
+        self._relatorio = None
+        self._relatorio_em = 0.0
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Começa uma nova janela de observação"""
+        with self._lock:
+            self.total = 0
+            self.iniciado_em = datetime.now().isoformat()
+            self.faixas = {f: np.zeros(len(b) + 1, dtype=np.int64) for f, b in self._bordas.items()}
+            self.abaixo = dict.fromkeys(self._bordas, 0)
+            self.acima = dict.fromkeys(self._bordas, 0)
+            self.sketches = {f: CountMinSketch(self._largura_sketch) for f in self._vocabulario}
+            self.novos = {f: HeavyHitters(self._k) for f in self._vocabulario}
+            self.total_novos = dict.fromkeys(self._vocabulario, 0)
+            self._relatorio = None
+
+    def observar(self, entrada):
+        """Registra as features de uma requisição (dict com as chaves de precificar)"""
+        with self._lock:
+            self.total += 1
+            for feature, bordas in self._bordas.items():
+                valor = float(entrada[feature])
+                self.faixas[feature][np.searchsorted(bordas, valor, side='left')] += 1
+                referencia = self.referencia['numericas'][feature]
+                if valor < referencia['min']:
+                    self.abaixo[feature] += 1
+                elif valor > referencia['max']:
+                    self.acima[feature] += 1
+            for feature, vocabulario in self._vocabulario.items():
+                chave = str(entrada[feature])
+                self.sketches[feature].adicionar(chave)
+                if chave not in vocabulario:
+                    self.total_novos[feature] += 1
+                    self.novos[feature].adicionar(chave)
+
+    def relatorio(self, forcar=False):
+        agora = time.monotonic()
+        with self._lock:
+            if self._relatorio is not None and not forcar and agora - self._relatorio_em < self.intervalo:
+                return self._relatorio
+            self._relatorio = self._calcular()
+            self._relatorio_em = agora
+            return self._relatorio
+
+    def _calcular(self):
+        """Compara os sketches com a referência (chamar com lock)"""
+        n = self.total
+        features = {}
+
+        for feature, contagens in self.faixas.items():
+            esperado = self.referencia['numericas'][feature]['proporcoes']
+            valor = psi(esperado, contagens / n) if n else None
+            features[feature] = {
+                'psi': round(valor, 4) if valor is not None else None,
+                'status': classificar_psi(valor),
+                'proporcoes_referencia': [round(p, 4) for p in esperado],
+                'proporcoes_atuais': [round(c / n, 4) for c in contagens] if n else None,
+                'fora_intervalo_treino': {'abaixo': self.abaixo[feature], 'acima': self.acima[feature]}
+            }
+
+        for feature, frequencias in self.referencia['categoricas'].items():
+            chaves = list(frequencias)
+            esperado = list(frequencias.values()) + [0.0]
+            valor = None
+            if n:
+                # Categorias conhecidas via count-min; o resto vai para o balde "novas"
+                estimados = np.array([self.sketches[feature].estimar(c) for c in chaves], dtype=float)
+                observado = np.append(estimados, self.total_novos[feature]) / n
+                valor = psi(esperado, observado / observado.sum())
+            features[feature] = {
+                'psi': round(valor, 4) if valor is not None else None,
+                'status': classificar_psi(valor),
+                'novas': self.total_novos[feature],
+                'taxa_novas': round(self.total_novos[feature] / n, 4) if n else None,
+                'novas_mais_frequentes': [
+                    {'valor': c, 'estimativa': self.sketches[feature].estimar(c)}
+                    for c in self.novos[feature].chaves()[:10]
+                ]
+            }
+
+        psis = [f['psi'] for f in features.values() if f['psi'] is not None]
+        return {
+            'calculado_em': datetime.now().isoformat(),
+            'janela_iniciada_em': self.iniciado_em,
+            'requisicoes': n,
+            'referencia_registros': self.referencia['total_registros'],
+            'psi_maximo': max(psis) if psis else None,
+            'status': classificar_psi(max(psis)) if psis else None,
+            'features': features
+        }
+
+
+if __name__ == "__main__":
+    # Gera a referência diretamente do CSV (bundles treinados antes do monitoramento)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera a referência de drift do dataset de treino")
+    parser.add_argument('--dataset', default='dados/dataset_imoveis_jacarei.csv')
+    parser.add_argument('--modelos', default='models')
+    args = parser.parse_args()
+
+    from treinador_ia import TreinadorIA
+    treinador = TreinadorIA(diretorio_modelos=args.modelos, arquivo_dataset=args.dataset)
+    df = treinador.preprocessar_dados(treinador.carregar_dataset())
+    caminho = salvar_referencia(gerar_referencia(df), args.modelos)
+    print(f"✅ Referência de drift salva em {caminho}")
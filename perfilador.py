@@ -0,0 +1,151 @@
+"""
+PERFILADOR POR AMOSTRAGEM (SOB DEMANDA)
+Uma thread lê periodicamente as pilhas das threads que estão atendendo
+requisições (sys._current_frames) e agrega as pilhas colapsadas em memória,
+no formato aceito por flamegraph.pl / speedscope. Desligado, o custo por
+requisição é a leitura de um booleano.
+"""
+
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+PROFUNDIDADE_MAX = 200
+OUTRAS = '[outras pilhas]'
+
+
+def _nome_quadro(quadro):
+    codigo = quadro.f_code
+    modulo = quadro.f_globals.get('__name__', '?')
+    return f"{modulo}:{getattr(codigo, 'co_qualname', codigo.co_name)}"
+
+
+class PerfiladorAmostragem:
+    """
+    - `iniciar(duracao, intervalo, fracao)`: amostra por até `duracao` segundos,
+      a cada `intervalo` segundos, as threads de uma fração `fracao` das requisições
+    - Requisições se registram com `entrar(rotulo)`/`sair()`; o rótulo
+      (endpoint) vira a raiz da pilha
+    - No máximo `max_pilhas` pilhas distintas; o excedente é somado em OUTRAS
+    """
+
+    def __init__(self, duracao_max=120.0, max_pilhas=20000):
+        self.duracao_max = duracao_max
+        self.max_pilhas = max_pilhas
+        self.ativo = False
+        self._threads = {}  # ident -> rótulo da requisição
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._amostrador = None
+        self._pilhas = Counter()
+        self.amostras = 0
+        self.config = None
+        self.iniciado_em = None
+        self.finalizado_em = None
+        self._rng = random.Random()
+
+    def iniciar(self, duracao=10.0, intervalo=0.01, fracao=1.0):
+        """Descarta o perfil anterior e começa a amostrar. False se já estiver ativo."""
+        with self._lock:
+            if self.ativo:
+                return False
+            duracao = min(max(float(duracao), 0.1), self.duracao_max)
+            intervalo = max(float(intervalo), 0.001)
+            self.config = {'duracao_s': duracao, 'intervalo_ms': intervalo * 1000, 'fracao': fracao}
+            self._pilhas = Counter()
+            self._threads = {}
+            self.amostras = 0
+            self.iniciado_em = datetime.now().isoformat()
+            self.finalizado_em = None
+            self._parar.clear()
+            self.ativo = True
+            self._amostrador = threading.Thread(
+                target=self._amostrar, args=(duracao, intervalo), name='perfilador', daemon=True
+            )
+            self._amostrador.start()
+        return True
+
+    def parar(self):
+        self._parar.set()
+        amostrador = self._amostrador
+        if amostrador is not None and amostrador is not threading.current_thread():
+            amostrador.join(timeout=5)
+
+    def entrar(self, rotulo):
+        """Chamado no início da requisição (só quando `ativo`)"""
+        if self._rng.random() < self.config['fracao']:
+            self._threads[threading.get_ident()] = rotulo
+
+    def sair(self):
+        self._threads.pop(threading.get_ident(), None)
+
+    def _amostrar(self, duracao, intervalo):
+        proprio = threading.get_ident()
+        fim = time.monotonic() + duracao
+        proxima = time.monotonic()
+        while not self._parar.is_set() and time.monotonic() < fim:
+            alvos = dict(self._threads)
+            if alvos:
+                quadros = sys._current_frames()
+                for ident, rotulo in alvos.items():
+                    quadro = quadros.get(ident)
+                    if quadro is None or ident == proprio:
+                        continue
+                    self._registrar(rotulo, quadro)
+                del quadros
+            proxima += intervalo
+            self._parar.wait(max(0.0, proxima - time.monotonic()))
+
+        with self._lock:
+            self.ativo = False
+            self._threads = {}
+            self.finalizado_em = datetime.now().isoformat()
+
+    def _registrar(self, rotulo, quadro):
+        nomes = []
+        while quadro is not None and len(nomes) < PROFUNDIDADE_MAX:
+            nomes.append(_nome_quadro(quadro))
+            quadro = quadro.f_back
+        nomes.append(f"[{rotulo}]")
+        pilha = ';'.join(reversed(nomes))
+        with self._lock:
+            if pilha not in self._pilhas and len(self._pilhas) >= self.max_pilhas:
+                pilha = OUTRAS
+            self._pilhas[pilha] += 1
+            self.amostras += 1
+
+    def pilhas_colapsadas(self):
+        """Texto 'quadro;quadro;... contagem' por linha (entrada do flamegraph.pl)"""
+        with self._lock:
+            itens = sorted(self._pilhas.items())
+        return ''.join(f"{pilha} {contagem}\n" for pilha, contagem in itens)
+
+    def status(self, top=20):
+        with self._lock:
+            pilhas = list(self._pilhas.items())
+            resumo = {
+                'ativo': self.ativo,
+                'config': self.config,
+                'iniciado_em': self.iniciado_em,
+                'finalizado_em': self.finalizado_em,
+                'amostras': self.amostras,
+                'pilhas_distintas': len(pilhas),
+                'requisicoes_em_amostragem': len(self._threads)
+            }
+
+        # Tempo próprio (quadro no topo) e inclusivo (quadro em qualquer nível) por função
+        proprio, inclusivo = Counter(), Counter()
+        for pilha, contagem in pilhas:
+            quadros = pilha.split(';')
+            proprio[quadros[-1]] += contagem
+            for quadro in set(quadros):
+                inclusivo[quadro] += contagem
+        total = resumo['amostras'] or 1
+        resumo['top_proprio'] = [{'funcao': f, 'amostras': n, 'pct': round(n / total * 100, 1)}
+                                 for f, n in proprio.most_common(top)]
+        resumo['top_inclusivo'] = [{'funcao': f, 'amostras': n, 'pct': round(n / total * 100, 1)}
+                                   for f, n in inclusivo.most_common(top)]
+        return resumo
@@ -7,31 +7,255 @@ import pandas as pd
 import joblib
 import json
 import os
+import time
+import threading
 import numpy as np
 from datetime import datetime
 
+from agregados_mercado import ARQUIVO_AGREGADOS, calcular_segmentos_casa
+from explicacao_modelo import criar_explicador
+
+# Regras de ajuste na ordem em que são aplicadas (ids usados em `regras`)
+REGRAS_AJUSTE = [
+    'correcao_estatistica',
+    'compacto_premium',
+    'qualidade',
+    'percentil_premium_jsm',
+    'percentil_alto_bairro',
+    'banheiros_casa_grande',
+    'compacto_equipado',
+    'densidade_comodos',
+    'limitador_seguranca',
+    'protecao_subavaliacao'
+]
+
+# Constantes do pipeline de ajustes. Um `constantes_ajustes.json` no diretório
+# do bundle (gerado por calibrador_ajustes.py) substitui estes valores
+ARQUIVO_CONSTANTES = 'constantes_ajustes.json'
+
+CONSTANTES_AJUSTES_PADRAO = {
+    'correcao_geral': 0.82,
+    'fatores_tipo': {'Casa': 1.000, 'Apartamento': 0.997, 'Terreno': 0.995},
+    # Área construída < 60, < 90, < 120, < 150 e acima
+    'fatores_area': [0.995, 0.997, 0.998, 1.003, 1.000],
+    'fator_compacto_premium': 2.1,
+    'peso_qualidade': 0.4,
+    'fator_banheiros_casa_grande': 1.20,
+    'fator_compacto_equipado': 1.10,
+    'fator_densidade_comodos': 1.15,
+    'limite_maximo': 3.0,
+    'limite_minimo': 0.7
+}
+
+FATORES_TIPO = CONSTANTES_AJUSTES_PADRAO['fatores_tipo']
+
+STATS_AUSENTE = (np.nan, np.nan, np.nan, np.nan)
+
+def faixa_area_vetorizada(area_construida):
+    """Versão vetorizada de PrecificadorIAAprimorado.get_faixa_area"""
+    return np.select(
+        [area_construida < 80, area_construida < 120, area_construida < 200],
+        ['pequena', 'media', 'grande'],
+        'luxo'
+    )
+
+def score_qualidade_vetorizado(area_construida, quartos, banheiros):
+    """Versão vetorizada de PrecificadorIAAprimorado.calcular_score_qualidade"""
+    quartos_validos = np.maximum(quartos, 1)
+    score_area = np.minimum(area_construida / quartos_validos / 25, 2.0)
+    score_banheiro = np.minimum(banheiros / quartos_validos / 0.8, 2.0)
+    return np.minimum((score_area + score_banheiro) / 2, 2.5)
+
+def montar_stats_lookup(segmentos):
+    """(bairro, faixa) -> (count, preco_medio, preco_std, preco_max) a partir de calcular_segmentos_casa"""
+    return {
+        (s['bairro'], s['faixa']): (s['count'], s['preco_medio'],
+                                    np.nan if s['preco_std'] is None else s['preco_std'], s['preco_max'])
+        for s in segmentos
+    }
+
+def validar_constantes(constantes):
+    """
+    Confere chaves, tipos e tamanhos contra CONSTANTES_AJUSTES_PADRAO e retorna
+    as constantes completas (faltantes vêm do padrão). ValueError se malformadas.
+    """
+    if not isinstance(constantes, dict):
+        raise ValueError("'constantes' deve ser um objeto")
+    desconhecidas = set(constantes) - set(CONSTANTES_AJUSTES_PADRAO)
+    if desconhecidas:
+        raise ValueError(f"Constantes desconhecidas: {sorted(desconhecidas)}")
+
+    def numero(nome, valor):
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not np.isfinite(valor):
+            raise ValueError(f"Constante '{nome}' deve ser um número finito")
+        return float(valor)
+
+    validadas = dict(CONSTANTES_AJUSTES_PADRAO)
+    for nome, valor in constantes.items():
+        padrao = CONSTANTES_AJUSTES_PADRAO[nome]
+        if isinstance(padrao, dict):
+            if not isinstance(valor, dict) or set(valor) != set(padrao):
+                raise ValueError(f"Constante '{nome}' deve ter as chaves {sorted(padrao)}")
+            validadas[nome] = {chave: numero(f"{nome}[{chave}]", v) for chave, v in valor.items()}
+        elif isinstance(padrao, list):
+            if not isinstance(valor, list) or len(valor) != len(padrao):
+                raise ValueError(f"Constante '{nome}' deve ser uma lista com {len(padrao)} números")
+            validadas[nome] = [numero(f"{nome}[{i}]", v) for i, v in enumerate(valor)]
+        else:
+            validadas[nome] = numero(nome, valor)
+    return validadas
+
+def estatisticas_segmentos(bairros, area_construida, stats_lookup):
+    """Matriz (linhas x 4) com count/média/std/máximo do segmento (bairro, faixa) de cada imóvel"""
+    faixas = faixa_area_vetorizada(np.asarray(area_construida, dtype=float))
+    return np.array([stats_lookup.get((bairro, faixa), STATS_AUSENTE)
+                     for bairro, faixa in zip(bairros, faixas)], dtype=float).reshape(-1, 4)
+
+def aplicar_ajustes_vetorizado(preco_base, tipos, bairros, area_construida, quartos, banheiros,
+                               stats_lookup, com_mensagens=True, constantes=None, stats=None):
+    """
+    Pipeline de ajustes inteligentes sobre arrays (uma linha por imóvel).
+
+    `tipos` pode conter None (sem correção estatística por tipo).
+    `stats_lookup` mapeia (bairro, faixa) -> (count, preco_medio, preco_std, preco_max).
+    `constantes`: fatores do pipeline (padrão: CONSTANTES_AJUSTES_PADRAO).
+    `stats`: saída pré-calculada de `estatisticas_segmentos` (usada na calibração).
+
+    Retorna dict com:
+    - preco: array de preços ajustados
+    - validos: False onde a área construída é zero (densidade indefinida)
+    - regras: {id_regra: máscara booleana}
+    - ajustes: lista de mensagens por linha (se com_mensagens)
+    """
+    preco_base = np.asarray(preco_base, dtype=float)
+    area_construida = np.asarray(area_construida, dtype=float)
+    quartos = np.asarray(quartos, dtype=float)
+    banheiros = np.asarray(banheiros, dtype=float)
+    bairros = np.asarray(bairros, dtype=object)
+    c = constantes or CONSTANTES_AJUSTES_PADRAO
+    regras = {}
+
+    # 1. QUALIDADE/PADRÃO
+    score_qualidade = score_qualidade_vetorizado(area_construida, quartos, banheiros)
+
+    # Correção inteligente geral: fator calibrado x tipo x faixa de área
+    com_tipo = np.array([t is not None for t in tipos], dtype=bool)
+    fator_tipo = np.array([c['fatores_tipo'].get(t, 1.0) for t in tipos], dtype=float)
+    fator_area = np.select(
+        [area_construida < 60, area_construida < 90, area_construida < 120, area_construida < 150],
+        c['fatores_area'][:4],
+        c['fatores_area'][4]
+    )
+    preco_antes_correcao = preco_base
+    preco = np.where(com_tipo, preco_base * c['correcao_geral'] * fator_tipo * fator_area, preco_base)
+    regras['correcao_estatistica'] = com_tipo & (np.abs(preco - preco_antes_correcao) > 1000)
+    reducao_perc = (1 - preco / preco_antes_correcao) * 100
+
+    # Casa pequena com 3+ banheiros indica ALTO PADRÃO/CONDOMÍNIO
+    regras['compacto_premium'] = (area_construida <= 100) & (banheiros >= 3)
+    regras['qualidade'] = ~regras['compacto_premium'] & (score_qualidade > 1.3)
+    fator_qualidade = 1 + (score_qualidade - 1) * c['peso_qualidade']  # Até +60% para luxo (peso 0.4)
+    preco = np.where(regras['compacto_premium'], preco * c['fator_compacto_premium'],
+                     np.where(regras['qualidade'], preco * fator_qualidade, preco))
+
+    # 2. POSIÇÃO NO BAIRRO
+    if stats is None:
+        stats = estatisticas_segmentos(bairros, area_construida, stats_lookup)
+    tem_stats = ~np.isnan(stats[:, 0])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        premium_jsm = tem_stats & (bairros == 'Jardim Santa Maria') & (banheiros >= 3)
+        preco_percentil_premium = stats[:, 3] * 0.95
+        fator_percentil_premium = preco_percentil_premium / preco
+        regras['percentil_premium_jsm'] = (
+            premium_jsm & (preco < preco_percentil_premium) &
+            (fator_percentil_premium > 1.1) & (fator_percentil_premium <= 2.0)
+        )
+
+        preco_percentil_alto = stats[:, 1] + (stats[:, 2] * 1.5)
+        fator_percentil_alto = preco_percentil_alto / preco
+        regras['percentil_alto_bairro'] = (
+            tem_stats & ~premium_jsm & (score_qualidade > 1.5) & (stats[:, 0] > 10) &
+            (preco < preco_percentil_alto) & (fator_percentil_alto > 1.1)
+        )
+    preco = np.where(regras['percentil_premium_jsm'], preco_percentil_premium,
+                     np.where(regras['percentil_alto_bairro'], preco_percentil_alto, preco))
+
+    # 3. CARACTERÍSTICAS ESPECIAIS
+    regras['banheiros_casa_grande'] = (banheiros >= 3) & (area_construida >= 150)
+    regras['compacto_equipado'] = ~regras['banheiros_casa_grande'] & (banheiros >= 2) & (area_construida < 100)
+    preco = np.where(regras['banheiros_casa_grande'], preco * c['fator_banheiros_casa_grande'],
+                     np.where(regras['compacto_equipado'], preco * c['fator_compacto_equipado'], preco))
+
+    # Densidade de cômodos (área zero não tem densidade definida)
+    validos = area_construida != 0
+    densidade_comodos = (quartos + banheiros) / np.where(validos, area_construida, 1.0)
+    regras['densidade_comodos'] = validos & (densidade_comodos > 0.05)
+    preco = np.where(regras['densidade_comodos'], preco * c['fator_densidade_comodos'], preco)
+
+    # 4. LIMITADOR DE SEGURANÇA
+    fator_total = preco / preco_base
+    regras['limitador_seguranca'] = fator_total > c['limite_maximo']
+    regras['protecao_subavaliacao'] = ~regras['limitador_seguranca'] & (fator_total < c['limite_minimo'])
+    preco = np.where(regras['limitador_seguranca'], preco_base * c['limite_maximo'],
+                     np.where(regras['protecao_subavaliacao'], preco_base * c['limite_minimo'], preco))
+
+    resultado = {'preco': preco, 'validos': validos, 'regras': regras}
+    if com_mensagens:
+        mensagens = {
+            'correcao_estatistica': lambda i: f"Correção estatística: {reducao_perc[i]:+.1f}%",
+            'compacto_premium': lambda i: f"Casa compacta premium (3+ banheiros): +{(c['fator_compacto_premium']-1)*100:.0f}%",
+            'qualidade': lambda i: f"Qualidade: +{(fator_qualidade[i]-1)*100:.1f}%",
+            'percentil_premium_jsm': lambda i: f"Percentil premium JSM: +{(fator_percentil_premium[i]-1)*100:.1f}%",
+            'percentil_alto_bairro': lambda i: f"Percentil alto do bairro: +{(fator_percentil_alto[i]-1)*100:.1f}%",
+            'banheiros_casa_grande': lambda i: f"Casa grande com múltiplos banheiros: +{(c['fator_banheiros_casa_grande']-1)*100:.0f}%",
+            'compacto_equipado': lambda i: f"Casa compacta bem equipada: +{(c['fator_compacto_equipado']-1)*100:.0f}%",
+            'densidade_comodos': lambda i: f"Alta densidade de cômodos: +{(c['fator_densidade_comodos']-1)*100:.0f}%",
+            'limitador_seguranca': lambda i: "Limitador de segurança aplicado",
+            'protecao_subavaliacao': lambda i: "Proteção contra subavaliação aplicada"
+        }
+        ajustes = [[] for _ in range(len(preco))]
+        for regra in REGRAS_AJUSTE:
+            for i in np.flatnonzero(regras[regra]):
+                ajustes[i].append(mensagens[regra](i))
+        resultado['ajustes'] = ajustes
+    return resultado
+
 class PrecificadorIAAprimorado:
-    def __init__(self):
+    def __init__(self, diretorio_modelos='models', arquivo_dataset='dados/dataset_imoveis_jacarei.csv'):
+        self.diretorio_modelos = diretorio_modelos
+        self.arquivo_dataset = arquivo_dataset
         self.modelo = None
         self.encoder_bairro = None
         self.encoder_tipo = None
         self.info_modelo = None
+        self.explicador = None
         self.stats_bairros = None
+        self.stats_lookup = {}
+        self.constantes_ajustes = CONSTANTES_AJUSTES_PADRAO
         self.carregar_modelo()
         self.carregar_estatisticas_bairros()
+        self.carregar_constantes_ajustes()
         
     def carregar_modelo(self):
         """Carrega modelo treinado"""
         try:
-            if not os.path.exists('models/modelo_precificacao.pkl'):
+            caminho_modelo = os.path.join(self.diretorio_modelos, 'modelo_precificacao.pkl')
+            if not os.path.exists(caminho_modelo):
                 raise FileNotFoundError("Modelo não encontrado. Execute treinador_ia.py primeiro.")
                 
-            self.modelo = joblib.load('models/modelo_precificacao.pkl')
-            self.encoder_bairro = joblib.load('models/encoder_bairro.pkl')
-            self.encoder_tipo = joblib.load('models/encoder_tipo.pkl')
+            self.modelo = joblib.load(caminho_modelo)
+            self.encoder_bairro = joblib.load(os.path.join(self.diretorio_modelos, 'encoder_bairro.pkl'))
+            self.encoder_tipo = joblib.load(os.path.join(self.diretorio_modelos, 'encoder_tipo.pkl'))
             
-            with open('models/info_modelo.json', 'r', encoding='utf-8') as f:
+            with open(os.path.join(self.diretorio_modelos, 'info_modelo.json'), 'r', encoding='utf-8') as f:
                 self.info_modelo = json.load(f)
+            
+            # Bundles por cidade registram o próprio dataset de origem
+            self.arquivo_dataset = self.info_modelo.get('arquivo_dataset', self.arquivo_dataset)
+            
+            # Contribuições por nó pré-calculadas para explicar o preço base
+            self.explicador = criar_explicador(self.modelo, self.info_modelo['features'])
                 
             print(f"✅ IA Aprimorada carregada - Treinada em {self.info_modelo['data_treinamento'][:10]}")
             
@@ -42,45 +266,46 @@ class PrecificadorIAAprimorado:
     def carregar_estatisticas_bairros(self):
         """Carrega estatísticas reais dos bairros para ajustes inteligentes"""
         try:
-            df = pd.read_csv('dados/dataset_imoveis_jacarei.csv')
-            
-            # Estatísticas por bairro e faixa de área
-            stats = []
-            for bairro in df['bairro'].unique():
-                bairro_data = df[df['bairro'] == bairro]
-                
-                # Diferentes faixas de área construída
-                for faixa_min, faixa_max, nome_faixa in [
-                    (0, 80, 'pequena'),
-                    (80, 120, 'media'),
-                    (120, 200, 'grande'),
-                    (200, 500, 'luxo')
-                ]:
-                    faixa_data = bairro_data[
-                        (bairro_data['area_construida'] >= faixa_min) & 
-                        (bairro_data['area_construida'] < faixa_max) &
-                        (bairro_data['tipo_imovel'] == 'Casa')
-                    ]
-                    
-                    if len(faixa_data) > 0:
-                        stats.append({
-                            'bairro': bairro,
-                            'faixa': nome_faixa,
-                            'faixa_min': faixa_min,
-                            'faixa_max': faixa_max,
-                            'count': len(faixa_data),
-                            'preco_medio': faixa_data['preco'].mean(),
-                            'preco_std': faixa_data['preco'].std(),
-                            'preco_min': faixa_data['preco'].min(),
-                            'preco_max': faixa_data['preco'].max()
-                        })
+            # Preferência: segmentos pré-calculados no treino (evita ler o CSV a cada carga)
+            caminho_agregados = os.path.join(self.diretorio_modelos, ARQUIVO_AGREGADOS)
+            if os.path.exists(caminho_agregados):
+                with open(caminho_agregados, 'r', encoding='utf-8') as f:
+                    stats = json.load(f)['segmentos_casa']
+                for segmento in stats:
+                    if segmento['preco_std'] is None:
+                        segmento['preco_std'] = np.nan
+            else:
+                # Estatísticas por bairro e faixa de área
+                stats = calcular_segmentos_casa(pd.read_csv(self.arquivo_dataset))
             
             self.stats_bairros = pd.DataFrame(stats)
+            self.stats_lookup = montar_stats_lookup(stats)
             print(f"✅ Estatísticas de {len(self.stats_bairros)} segmentos carregadas")
             
         except Exception as e:
             print(f"⚠️ Erro ao carregar estatísticas: {e}")
             self.stats_bairros = None
+            self.stats_lookup = {}
+    
+    def carregar_constantes_ajustes(self):
+        """Constantes calibradas do bundle (se houver) no lugar das padrão"""
+        caminho = os.path.join(self.diretorio_modelos, ARQUIVO_CONSTANTES)
+        if not os.path.exists(caminho):
+            return
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                calibracao = json.load(f)
+            if calibracao.get('versao_modelo') not in (None, self.versao_modelo):
+                # Constantes de outro modelo pioram o preço: usa as padrão
+                print(f"⚠️ Constantes calibradas para o modelo {calibracao['versao_modelo']}, "
+                      f"mas o modelo carregado é {self.versao_modelo}: usando as padrão")
+                return
+            # Arquivo malformado cai no except: melhor as padrão que toda predição em fallback
+            self.constantes_ajustes = validar_constantes(calibracao['constantes'])
+            print(f"✅ Constantes de ajuste calibradas carregadas ({calibracao.get('gerado_em', '?')[:10]})")
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar constantes calibradas, usando padrão: {e}")
+            self.constantes_ajustes = CONSTANTES_AJUSTES_PADRAO
     
     def get_faixa_area(self, area_construida):
         """Determina faixa da área construída"""
@@ -107,120 +332,123 @@ class PrecificadorIAAprimorado:
         score_qualidade = (score_area + score_banheiro) / 2
         return min(score_qualidade, 2.5)
     
-    def aplicar_ajustes_inteligentes(self, preco_base, bairro, area_construida, quartos, banheiros):
+    def aplicar_ajustes_inteligentes(self, preco_base, bairro, area_construida, quartos, banheiros, tipo_imovel=None):
         """Aplica ajustes inteligentes baseados em análise de mercado"""
-        preco_ajustado = preco_base
-        ajustes_aplicados = []
+        resultado = aplicar_ajustes_vetorizado(
+            [preco_base], [tipo_imovel], [bairro],
+            [area_construida], [quartos], [banheiros], self.stats_lookup,
+            constantes=self.constantes_ajustes
+        )
+        if not resultado['validos'][0]:
+            raise ZeroDivisionError("Área construída igual a zero")
+        return float(resultado['preco'][0]), resultado['ajustes'][0]
+    
+    def precificar_lote(self, registros, explicar=False):
+        """
+        Precifica vários imóveis com UMA chamada ao modelo + ajustes vetorizados.
+        `registros`: DataFrame (ou dict de listas) com bairro, tipo_imovel,
+        area_construida, area_terreno, quartos, banheiros.
+        Retorna DataFrame com os mesmos campos de `precificar` + `regras`
+        (e, com `explicar`, `valor_base_modelo` e uma coluna `contrib_<feature>` por feature).
+        """
+        registros = pd.DataFrame(registros).reset_index(drop=True)
         
-        # 1. AJUSTE POR QUALIDADE/PADRÃO APRIMORADO
-        score_qualidade = self.calcular_score_qualidade(area_construida, quartos, banheiros)
+        # Normaliza bairros/tipos desconhecidos (uma busca por valor distinto)
+        bairros_disponiveis = list(self.encoder_bairro.classes_)
+        conhecidos = set(bairros_disponiveis)
+        mapa_bairros = {
+            b: b if b in conhecidos else self.encontrar_bairro_similar(str(b), bairros_disponiveis)
+            for b in registros['bairro'].unique()
+        }
+        bairros = registros['bairro'].map(mapa_bairros).to_numpy(dtype=object)
+        tipos = registros['tipo_imovel'].where(registros['tipo_imovel'].isin(self.encoder_tipo.classes_), 'Casa').to_numpy(dtype=object)
         
-        # CORREÇÃO INTELIGENTE GERAL baseada em análise estatística
-        def aplicar_correcao_inteligente(preco_base, tipo_imovel, area_construida):
-            # FATOR GERAL DE CORREÇÃO (ajustado para casos reais)
-            preco_corrigido = preco_base * 0.82  # Correção calibrada
-            
-            # CORREÇÃO POR TIPO DE IMÓVEL
-            fatores_tipo = {'Casa': 1.000, 'Apartamento': 0.997, 'Terreno': 0.995}
-            if tipo_imovel in fatores_tipo:
-                preco_corrigido *= fatores_tipo[tipo_imovel]
-            
-            # CORREÇÃO POR FAIXA DE ÁREA
-            if area_construida < 60:
-                preco_corrigido *= 0.995
-            elif area_construida < 90:
-                preco_corrigido *= 0.997
-            elif area_construida < 120:
-                preco_corrigido *= 0.998
-            elif area_construida < 150:
-                preco_corrigido *= 1.003
-            else:
-                preco_corrigido *= 1.000
-            
-            return preco_corrigido
+        area_construida = registros['area_construida'].to_numpy(dtype=float)
+        area_terreno = registros['area_terreno'].to_numpy(dtype=float)
+        quartos = registros['quartos'].to_numpy(dtype=float).astype(int)
+        banheiros = registros['banheiros'].to_numpy(dtype=float).astype(int)
         
-        # Aplicar correção inteligente
-        preco_antes_correcao = preco_ajustado
-        if hasattr(self, '_tipo_imovel_temp'):
-            preco_ajustado = aplicar_correcao_inteligente(preco_ajustado, self._tipo_imovel_temp, area_construida)
-            if abs(preco_ajustado - preco_antes_correcao) > 1000:
-                reducao_perc = (1 - preco_ajustado/preco_antes_correcao) * 100
-                ajustes_aplicados.append(f"Correção estatística: {reducao_perc:+.1f}%")
+        features = pd.DataFrame({
+            'bairro_encoded': self.encoder_bairro.transform(bairros),
+            'tipo_encoded': self.encoder_tipo.transform(tipos),
+            'area_construida': area_construida,
+            'area_terreno': area_terreno,
+            'quartos': quartos,
+            'banheiros': banheiros
+        })[self.info_modelo['features']]
         
-        if area_construida <= 100 and banheiros >= 3:
-            # Casa pequena com 3+ banheiros indica ALTO PADRÃO/CONDOMÍNIO
-            fator_compacto_luxo = 2.1  # +110% para indicar acabamento premium
-            preco_ajustado *= fator_compacto_luxo
-            ajustes_aplicados.append(f"Casa compacta premium (3+ banheiros): +{(fator_compacto_luxo-1)*100:.0f}%")
-            
-        elif score_qualidade > 1.3:  # Alto padrão normal
-            fator_qualidade = 1 + (score_qualidade - 1) * 0.4  # Até +60% para luxo
-            preco_ajustado *= fator_qualidade
-            ajustes_aplicados.append(f"Qualidade: +{(fator_qualidade-1)*100:.1f}%")
+        # Predição base do modelo ML (uma única chamada)
+        preco_base = np.maximum(50000, self.modelo.predict(features))
         
-        # 2. AJUSTE POR POSIÇÃO NO BAIRRO APRIMORADO
-        if self.stats_bairros is not None:
-            faixa = self.get_faixa_area(area_construida)
-            bairro_stats = self.stats_bairros[
-                (self.stats_bairros['bairro'] == bairro) & 
-                (self.stats_bairros['faixa'] == faixa)
-            ]
-            
-            if len(bairro_stats) > 0:
-                stats = bairro_stats.iloc[0]
-                
-                # NOVO: Para Jardim Santa Maria especificamente
-                if bairro == 'Jardim Santa Maria' and banheiros >= 3:
-                    # Percentil 95 do bairro para imóveis premium
-                    preco_percentil_premium = stats['preco_max'] * 0.95
-                    if preco_ajustado < preco_percentil_premium:
-                        fator_percentil = preco_percentil_premium / preco_ajustado
-                        if fator_percentil > 1.1 and fator_percentil <= 2.0:
-                            preco_ajustado = preco_percentil_premium
-                            ajustes_aplicados.append(f"Percentil premium JSM: +{(fator_percentil-1)*100:.1f}%")
-                
-                # Ajuste geral para características superiores
-                elif score_qualidade > 1.5 and stats['count'] > 10:
-                    preco_percentil_alto = stats['preco_medio'] + (stats['preco_std'] * 1.5)
-                    if preco_ajustado < preco_percentil_alto:
-                        fator_percentil = preco_percentil_alto / preco_ajustado
-                        if fator_percentil > 1.1:
-                            preco_ajustado = preco_percentil_alto
-                            ajustes_aplicados.append(f"Percentil alto do bairro: +{(fator_percentil-1)*100:.1f}%")
+        ajustes = aplicar_ajustes_vetorizado(
+            preco_base, tipos, bairros, area_construida, quartos, banheiros, self.stats_lookup,
+            constantes=self.constantes_ajustes
+        )
+        score_qualidade = score_qualidade_vetorizado(area_construida, quartos, banheiros)
+        
+        # Reduz confiança se muitos ajustes foram aplicados
+        n_ajustes = np.array([len(a) for a in ajustes['ajustes']])
+        confianca = np.where(n_ajustes > 2, 92.7 - n_ajustes * 3, 92.7)
         
-        # 3. AJUSTES POR CARACTERÍSTICAS ESPECIAIS APRIMORADOS
+        # round() do Python (e não np.round) para bater exatamente com `precificar`
+        preco_estimado = [round(float(v), 2) for v in ajustes['preco']]
+        preco_base_ia = [round(float(v), 2) for v in preco_base]
+        score_qualidade = [round(float(v), 2) for v in score_qualidade]
+        confianca = [f'{c:.1f}%' for c in confianca]
+        bairros_usados = list(bairros)
+        ajustes_aplicados = ajustes['ajustes']
+        regras = [[r for r in REGRAS_AJUSTE if ajustes['regras'][r][i]] for i in range(len(registros))]
         
-        # 3a. Múltiplos banheiros (já coberto acima se for casa pequena)
-        if banheiros >= 3 and area_construida >= 150:
-            fator_banheiros = 1.20  # +20% para casas grandes com múltiplos banheiros
-            preco_ajustado *= fator_banheiros
-            ajustes_aplicados.append("Casa grande com múltiplos banheiros: +20%")
-        elif banheiros >= 2 and area_construida < 100:
-            fator_banheiros = 1.10  # +10% para casa pequena bem equipada
-            preco_ajustado *= fator_banheiros
-            ajustes_aplicados.append("Casa compacta bem equipada: +10%")
+        # Linhas sem área construída seguem o mesmo fallback de `precificar`
+        for i in np.flatnonzero(~ajustes['validos']):
+            fallback = self.fallback_precificacao(area_construida[i], area_terreno[i], tipos[i])
+            preco_estimado[i] = fallback['preco_estimado']
+            preco_base_ia[i] = fallback['preco_base_ia']
+            score_qualidade[i] = fallback['score_qualidade']
+            confianca[i] = fallback['confianca']
+            bairros_usados[i] = fallback['bairro_usado']
+            ajustes_aplicados[i] = fallback['ajustes_aplicados']
+            regras[i] = []
         
-        # 3b. NOVO: Ajuste por densidade de cômodos
-        densidade_comodos = (quartos + banheiros) / area_construida
-        if densidade_comodos > 0.05:  # Mais de 1 cômodo por 20m²
-            fator_densidade = 1.15
-            preco_ajustado *= fator_densidade
-            ajustes_aplicados.append("Alta densidade de cômodos: +15%")
+        resultado = pd.DataFrame({
+            'preco_estimado': preco_estimado,
+            'preco_base_ia': preco_base_ia,
+            'confianca': confianca,
+            'bairro_usado': bairros_usados,
+            'score_qualidade': score_qualidade,
+            'ajustes_aplicados': ajustes_aplicados,
+            'regras': regras
+        })
         
-        # 4. LIMITADOR DE SEGURANÇA APRIMORADO
-        fator_total = preco_ajustado / preco_base
-        if fator_total > 3.0:  # Máximo +200% (era 150%)
-            preco_ajustado = preco_base * 3.0
-            ajustes_aplicados.append("Limitador de segurança aplicado")
-        elif fator_total < 0.7:  # Mínimo -30%
-            preco_ajustado = preco_base * 0.7
-            ajustes_aplicados.append("Proteção contra subavaliação aplicada")
+        if explicar and self.explicador is not None:
+            contribuicoes = self.explicador.contribuicoes(features).round(2)
+            invalidos = ~ajustes['validos']
+            resultado['valor_base_modelo'] = np.where(invalidos, np.nan, round(float(self.explicador.valor_base), 2))
+            for j, nome in enumerate(self.explicador.nomes):
+                resultado[f'contrib_{nome}'] = np.where(invalidos, np.nan, contribuicoes[:, j])
         
-        return preco_ajustado, ajustes_aplicados
+        return resultado
     
-    def precificar(self, bairro, tipo_imovel, area_construida, area_terreno, quartos, banheiros):
-        """Prediz preço usando IA aprimorada com múltiplos ajustes"""
+    @property
+    def versao_modelo(self):
+        """Versão do bundle (modelos antigos não têm 'versao': usa a data de treino)"""
+        return self.info_modelo.get('versao', self.info_modelo['data_treinamento'])
+
+    def precificar(self, bairro, tipo_imovel, area_construida, area_terreno, quartos, banheiros,
+                   medir_tempos=False, explicar=False, propagar_erros=False):
+        """
+        Prediz preço usando IA aprimorada com múltiplos ajustes.
+        `explicar`: inclui a contribuição de cada feature no preço base da IA.
+        `propagar_erros`: erros do modelo são relançados em vez de virar fallback
+        (o app conta esses erros no circuit breaker). Resultados de fallback
+        vêm marcados com 'fallback': True.
+        """
+        inicio = time.perf_counter()
         try:
+            if not isinstance(bairro, str) or not isinstance(tipo_imovel, str) or float(area_construida) == 0:
+                # Sem bairro/tipo ou sem área os ajustes não se aplicam: é entrada, não falha do modelo
+                return self.fallback_precificacao(area_construida, area_terreno, tipo_imovel)
+
             # Valida bairro
             if bairro not in self.encoder_bairro.classes_:
                 bairros_disponiveis = list(self.encoder_bairro.classes_)
@@ -236,9 +464,6 @@ class PrecificadorIAAprimorado:
             bairro_encoded = self.encoder_bairro.transform([bairro])[0]
             tipo_encoded = self.encoder_tipo.transform([tipo_imovel])[0]
             
-            # Salvar tipo para correção inteligente
-            self._tipo_imovel_temp = tipo_imovel
-            
             # Features para o modelo
             features = [[
                 bairro_encoded,
@@ -250,14 +475,17 @@ class PrecificadorIAAprimorado:
             ]]
             
             # Predição base do modelo ML
-            preco_base = self.modelo.predict(features)[0]
-            preco_base = max(50000, preco_base)  # Mínimo
-            
+            t_codificacao = time.perf_counter()
+            predicao = self.modelo.predict(features)[0]
+            preco_base = max(50000, predicao)  # Mínimo
+            t_modelo = time.perf_counter()
+
             # Aplica ajustes inteligentes
             preco_final, ajustes = self.aplicar_ajustes_inteligentes(
-                preco_base, bairro, area_construida, quartos, banheiros
+                preco_base, bairro, area_construida, quartos, banheiros, tipo_imovel
             )
-            
+            t_ajustes = time.perf_counter()
+
             # Calcula confiança
             score_qualidade = self.calcular_score_qualidade(area_construida, quartos, banheiros)
             confianca_base = 92.7
@@ -268,7 +496,7 @@ class PrecificadorIAAprimorado:
             else:
                 confianca_final = confianca_base
             
-            return {
+            resultado = {
                 'preco_estimado': round(preco_final, 2),
                 'preco_base_ia': round(preco_base, 2),
                 'confianca': f'{confianca_final:.1f}%',
@@ -281,9 +509,23 @@ class PrecificadorIAAprimorado:
                     'data_treino': self.info_modelo['data_treinamento'][:10]
                 }
             }
-            
+            if explicar and self.explicador is not None:
+                explicacao = self.explicador.explicar(features)[0]
+                explicacao['preco_minimo_aplicado'] = bool(preco_base != predicao)
+                resultado['explicacao'] = explicacao
+            if medir_tempos:
+                resultado['tempos_ms'] = {
+                    'codificacao': (t_codificacao - inicio) * 1000,
+                    'modelo': (t_modelo - t_codificacao) * 1000,
+                    'ajustes': (t_ajustes - t_modelo) * 1000,
+                    'total': (time.perf_counter() - inicio) * 1000
+                }
+            return resultado
+
         except Exception as e:
             print(f"❌ Erro na predição aprimorada: {e}")
+            if propagar_erros:
+                raise
             return self.fallback_precificacao(area_construida, area_terreno, tipo_imovel)
     
     def encontrar_bairro_similar(self, bairro_input, bairros_disponiveis):
@@ -310,16 +552,31 @@ class PrecificadorIAAprimorado:
             'bairro_usado': 'Fallback',
             'score_qualidade': 1.0,
             'ajustes_aplicados': ['Fallback - Modelo indisponível'],
+            'fallback': True,
             'modelo_info': {
                 'algoritmo': 'Fallback',
                 'status': 'Modelo principal indisponível'
             }
         }
 
+# Instância compartilhada: `precificar` não guarda estado por requisição,
+# então uma única instância carregada atende várias threads
+_precificador_compartilhado = None
+_lock_compartilhado = threading.Lock()
+
+def obter_precificador_compartilhado():
+    """Carrega o modelo padrão uma única vez por processo"""
+    global _precificador_compartilhado
+    if _precificador_compartilhado is None:
+        with _lock_compartilhado:
+            if _precificador_compartilhado is None:
+                _precificador_compartilhado = PrecificadorIAAprimorado()
+    return _precificador_compartilhado
+
 # Função de compatibilidade
 def precificar_com_ia_aprimorada(bairro, tipo_imovel, area_construida, area_terreno, quartos, banheiros):
     """Função para compatibilidade com sistema existente"""
-    precificador = PrecificadorIAAprimorado()
+    precificador = obter_precificador_compartilhado()
     return precificador.precificar(bairro, tipo_imovel, area_construida, area_terreno, quartos, banheiros)
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+"""
+PREPROCESSAMENTO EM CHUNKS (OUT-OF-CORE)
+Lê o feed de anúncios em blocos, valida, converte, remove duplicatas e
+grava um dataset binário pronto para treino com memória limitada ao chunk
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+COLUNAS_OBRIGATORIAS = ['bairro', 'tipo_imovel', 'area_construida', 'area_terreno', 'quartos', 'banheiros', 'preco']
+COLUNAS_NUMERICAS = ['area_construida', 'area_terreno', 'quartos', 'banheiros', 'preco']
+
+# Ordem das colunas no arquivo binário (mesma ordem de TreinadorIA.features + alvo)
+COLUNAS_BINARIO = ['bairro_encoded', 'tipo_encoded', 'area_construida', 'area_terreno', 'quartos', 'banheiros', 'preco']
+
+PRECO_MINIMO = 30000
+PRECO_MAXIMO = 10000000
+
+# Limite de hashes guardados para a deduplicação entre chunks. Cada hash num
+# set do Python custa ~70 bytes: 2 milhões de linhas distintas ≈ 140 MB
+MAX_HASHES_DEDUP = 2000000
+
+
+class PreprocessadorStreaming:
+    """
+    Pipeline de preprocessamento que nunca carrega o CSV inteiro.
+
+    Cada chunk é validado, convertido para numérico, deduplicado (dentro do
+    chunk e contra os chunks anteriores, via hash de 8 bytes por linha),
+    filtrado pela faixa de preço e anexado a um arquivo binário float64.
+    A deduplicação entre chunks guarda no máximo `max_hashes` hashes; além
+    disso, linhas novas ainda são comparadas com as já vistas, mas deixam de
+    ser memorizadas (duplicatas delas podem passar).
+    Os vocabulários de bairro/tipo crescem a cada chunk; no final os códigos
+    provisórios são remapeados para a ordem alfabética do LabelEncoder.
+    """
+
+    def __init__(self, chunksize=50000, deduplicar=True, log=print, max_hashes=MAX_HASHES_DEDUP):
+        self.chunksize = chunksize
+        self.deduplicar = deduplicar
+        self.log = log
+        self.max_hashes = max_hashes
+        self.vocab_bairro = {}
+        self.vocab_tipo = {}
+        self._hashes = set()
+        self.estatisticas = {
+            'linhas_lidas': 0,
+            'linhas_invalidas': 0,
+            'linhas_duplicadas': 0,
+            'linhas_fora_faixa_preco': 0,
+            'linhas_gravadas': 0,
+            'deduplicacao_completa': True
+        }
+
+    def _codificar(self, valores, vocab):
+        """Atribui códigos provisórios (ordem de aparição) e estende o vocabulário"""
+        for valor in pd.unique(valores):
+            if valor not in vocab:
+                vocab[valor] = len(vocab)
+        return valores.map(vocab).to_numpy(dtype=np.float64)
+
+    def _validar_chunk(self, chunk):
+        """Valida, converte tipos e limpa um chunk"""
+        faltantes = [c for c in COLUNAS_OBRIGATORIAS if c not in chunk.columns]
+        if faltantes:
+            raise ValueError(f"Colunas obrigatórias ausentes no dataset: {faltantes}")
+
+        chunk = chunk[COLUNAS_OBRIGATORIAS].copy()
+        chunk['bairro'] = chunk['bairro'].astype('string').str.strip()
+        chunk['tipo_imovel'] = chunk['tipo_imovel'].astype('string').str.strip()
+        for col in COLUNAS_NUMERICAS:
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+
+        validos = chunk.notna().all(axis=1)
+        validos &= (chunk['bairro'] != '') & (chunk['tipo_imovel'] != '')
+        validos &= (chunk[['area_construida', 'area_terreno', 'quartos', 'banheiros']] >= 0).all(axis=1)
+        self.estatisticas['linhas_invalidas'] += int((~validos).sum())
+        return chunk[validos]
+
+    def _remover_duplicatas(self, chunk):
+        """Remove duplicatas dentro do chunk e contra os chunks já gravados"""
+        antes = len(chunk)
+        chunk = chunk.drop_duplicates()
+        if len(chunk):
+            hashes = pd.util.hash_pandas_object(chunk, index=False).tolist()
+            vistos = self._hashes
+            novos = np.fromiter((h not in vistos for h in hashes), dtype=bool, count=len(hashes))
+            chunk = chunk[novos]
+
+            hashes_novos = [h for h, novo in zip(hashes, novos) if novo]
+            espaco = self.max_hashes - len(vistos)
+            if len(hashes_novos) > espaco:
+                if self.estatisticas['deduplicacao_completa']:
+                    self.log(f"   ⚠️ Limite de {self.max_hashes:,} hashes atingido: "
+                             f"deduplicação entre chunks passa a ser parcial")
+                self.estatisticas['deduplicacao_completa'] = False
+                hashes_novos = hashes_novos[:max(espaco, 0)]
+            vistos.update(hashes_novos)
+        self.estatisticas['linhas_duplicadas'] += antes - len(chunk)
+        return chunk
+
+    def processar(self, arquivo, destino):
+        """
+        Processa `arquivo` (CSV) e grava `destino` (.bin) + metadados (.json).
+        Retorna o dicionário de metadados.
+        """
+        if not os.path.exists(arquivo):
+            raise FileNotFoundError(f"Dataset não encontrado: {arquivo}")
+
+        os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+        destino_tmp = destino + '.tmp'
+
+        with open(destino_tmp, 'wb') as saida:
+            for i, chunk in enumerate(pd.read_csv(arquivo, chunksize=self.chunksize)):
+                self.estatisticas['linhas_lidas'] += len(chunk)
+                chunk = self._validar_chunk(chunk)
+                if self.deduplicar:
+                    chunk = self._remover_duplicatas(chunk)
+
+                na_faixa = (chunk['preco'] >= PRECO_MINIMO) & (chunk['preco'] <= PRECO_MAXIMO)
+                self.estatisticas['linhas_fora_faixa_preco'] += int((~na_faixa).sum())
+                chunk = chunk[na_faixa]
+                if chunk.empty:
+                    continue
+
+                bloco = np.empty((len(chunk), len(COLUNAS_BINARIO)), dtype='<f8')
+                bloco[:, 0] = self._codificar(chunk['bairro'], self.vocab_bairro)
+                bloco[:, 1] = self._codificar(chunk['tipo_imovel'], self.vocab_tipo)
+                bloco[:, 2:] = chunk[COLUNAS_NUMERICAS].to_numpy(dtype=np.float64)
+                saida.write(bloco.tobytes())
+
+                self.estatisticas['linhas_gravadas'] += len(bloco)
+                self.log(f"   📦 Chunk {i + 1}: {self.estatisticas['linhas_gravadas']:,} registros gravados")
+
+        linhas = self.estatisticas['linhas_gravadas']
+        bairros, tipos = self._remapear_codigos(destino_tmp, linhas)
+        os.replace(destino_tmp, destino)
+
+        metadados = {
+            'arquivo_origem': arquivo,
+            'dtype': '<f8',
+            'colunas': COLUNAS_BINARIO,
+            'linhas': linhas,
+            'bairros': bairros,
+            'tipos': tipos,
+            'estatisticas': self.estatisticas
+        }
+        with open(caminho_metadados(destino), 'w', encoding='utf-8') as f:
+            json.dump(metadados, f, indent=2, ensure_ascii=False)
+
+        return metadados
+
+    def _remapear_codigos(self, caminho, linhas):
+        """Converte códigos provisórios para a ordem alfabética (compatível com LabelEncoder)"""
+        bairros = sorted(self.vocab_bairro)
+        tipos = sorted(self.vocab_tipo)
+        if linhas == 0:
+            return bairros, tipos
+
+        mapa_bairro = np.empty(len(bairros), dtype=np.float64)
+        for novo, nome in enumerate(bairros):
+            mapa_bairro[self.vocab_bairro[nome]] = novo
+        mapa_tipo = np.empty(len(tipos), dtype=np.float64)
+        for novo, nome in enumerate(tipos):
+            mapa_tipo[self.vocab_tipo[nome]] = novo
+
+        dados = np.memmap(caminho, dtype='<f8', mode='r+', shape=(linhas, len(COLUNAS_BINARIO)))
+        for inicio in range(0, linhas, self.chunksize):
+            fim = min(inicio + self.chunksize, linhas)
+            dados[inicio:fim, 0] = mapa_bairro[dados[inicio:fim, 0].astype(np.intp)]
+            dados[inicio:fim, 1] = mapa_tipo[dados[inicio:fim, 1].astype(np.intp)]
+        dados.flush()
+        del dados
+        return bairros, tipos
+
+
+def caminho_metadados(destino):
+    """Arquivo JSON de metadados que acompanha o dataset binário"""
+    return os.path.splitext(destino)[0] + '.json'
+
+
+def carregar_dataset_binario(destino):
+    """Abre o dataset binário como memmap somente leitura. Retorna (dados, metadados)"""
+    with open(caminho_metadados(destino), 'r', encoding='utf-8') as f:
+        metadados = json.load(f)
+    dados = np.memmap(destino, dtype=metadados['dtype'], mode='r',
+                      shape=(metadados['linhas'], len(metadados['colunas'])))
+    return dados, metadados
+
+
+def criar_encoder(classes):
+    """Reconstrói um LabelEncoder a partir de um vocabulário já ordenado"""
+    encoder = LabelEncoder()
+    encoder.classes_ = np.array(classes, dtype=object)
+    return encoder
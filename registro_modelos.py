@@ -0,0 +1,203 @@
+"""
+REGISTRO DE MODELOS POR CIDADE
+Carrega bundles (modelo + encoders + estatísticas) sob demanda, com
+política LRU sob orçamento de memória e cidades fixadas
+"""
+
+import os
+import shutil
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from precificador_ia_aprimorado import PrecificadorIAAprimorado
+
+
+# info_modelo.json por último: só aparece atualizado quando o resto já foi trocado
+ARQUIVOS_BUNDLE = ['modelo_precificacao.pkl', 'encoder_bairro.pkl', 'encoder_tipo.pkl',
+                   'agregados_mercado.json', 'referencia_drift.json', 'constantes_ajustes.json',
+                   'info_modelo.json']
+
+
+class CidadeNaoSuportada(KeyError):
+    """Não existe bundle treinado para a cidade solicitada"""
+
+
+def slug_cidade(cidade):
+    """'São José dos Campos' -> 'sao_jose_dos_campos'"""
+    sem_acento = unicodedata.normalize('NFKD', str(cidade)).encode('ascii', 'ignore').decode('ascii')
+    return '_'.join(sem_acento.lower().split())
+
+
+def promover_bundle(origem, destino):
+    """
+    Copia os arquivos de um bundle recém-treinado para o diretório servido.
+    Arquivos do bundle ausentes na origem são apagados do destino: um
+    `constantes_ajustes.json` calibrado para o modelo anterior não sobrevive
+    a um retreino
+    """
+    os.makedirs(destino, exist_ok=True)
+    for nome in ARQUIVOS_BUNDLE:
+        caminho = os.path.join(origem, nome)
+        if os.path.exists(caminho):
+            temporario = os.path.join(destino, nome + '.tmp')
+            shutil.copy2(caminho, temporario)
+            os.replace(temporario, os.path.join(destino, nome))
+        elif os.path.exists(os.path.join(destino, nome)):
+            os.remove(os.path.join(destino, nome))
+
+
+def estimar_memoria(precificador):
+    """Estimativa (bytes) do bundle carregado: nós das árvores + estatísticas"""
+    total = 0
+    estimadores = getattr(precificador.modelo, 'estimators_', None)
+    if estimadores is not None:
+        for arvore in estimadores:
+            tree = arvore.tree_
+            # Cada nó: struct de 64 bytes + array de valores (float64)
+            total += tree.node_count * (64 + 8 * tree.value.shape[1] * tree.value.shape[2])
+    else:
+        caminho = os.path.join(precificador.diretorio_modelos, 'modelo_precificacao.pkl')
+        total += os.path.getsize(caminho) if os.path.exists(caminho) else 0
+
+    if getattr(precificador, 'explicador', None) is not None:
+        total += precificador.explicador.nbytes
+    if precificador.stats_bairros is not None:
+        total += int(precificador.stats_bairros.memory_usage(deep=True).sum())
+    return total
+
+
+class RegistroModelos:
+    """
+    Registro de bundles por cidade.
+
+    - Bundles são carregados na primeira requisição da cidade
+    - Quando a memória estimada passa de `memoria_max_mb`, os bundles menos
+      usados recentemente são descartados (exceto os fixados)
+    - A cidade padrão usa o bundle legado em `models/`; as demais ficam em
+      `models/cidades/<slug>/`
+    """
+
+    def __init__(self, diretorio_base='models', cidade_padrao='Jacareí', memoria_max_mb=512,
+                 fixadas=(), fabrica=PrecificadorIAAprimorado):
+        self.diretorio_base = diretorio_base
+        self.cidade_padrao = cidade_padrao
+        self.memoria_max = int(memoria_max_mb * 1024 * 1024)
+        self.fabrica = fabrica
+        self.fixadas = {slug_cidade(c) for c in fixadas}
+        self._bundles = OrderedDict()  # slug -> (precificador, bytes)
+        self._lock = threading.Lock()
+        self._locks_carga = {}
+
+    def diretorio_cidade(self, cidade):
+        """Diretório do bundle da cidade, ou None se não houver modelo treinado"""
+        slug = slug_cidade(cidade)
+        diretorio = os.path.join(self.diretorio_base, 'cidades', slug)
+        if os.path.exists(os.path.join(diretorio, 'modelo_precificacao.pkl')):
+            return diretorio
+        if slug == slug_cidade(self.cidade_padrao):
+            return self.diretorio_base
+        return None
+
+    def diretorio_destino(self, cidade):
+        """Diretório onde um novo bundle da cidade deve ser publicado"""
+        slug = slug_cidade(cidade)
+        diretorio = os.path.join(self.diretorio_base, 'cidades', slug)
+        if slug == slug_cidade(self.cidade_padrao) and not os.path.isdir(diretorio):
+            return self.diretorio_base
+        return diretorio
+
+    def promover(self, cidade, diretorio_origem):
+        """Publica um bundle treinado para a cidade e força recarga na próxima requisição"""
+        slug = slug_cidade(cidade)
+        with self._lock:
+            lock_carga = self._locks_carga.setdefault(slug, threading.Lock())
+        # Segura o lock de carga: nenhuma requisição lê o bundle no meio da troca
+        with lock_carga:
+            promover_bundle(diretorio_origem, self.diretorio_destino(cidade))
+            self.descartar(cidade)
+        if slug in self.fixadas:
+            self.obter(cidade)
+        print(f"🚀 Novo bundle publicado para '{slug}'")
+
+    def cidades_disponiveis(self):
+        """Cidades com bundle treinado em disco"""
+        cidades = {slug_cidade(self.cidade_padrao)}
+        diretorio_cidades = os.path.join(self.diretorio_base, 'cidades')
+        if os.path.isdir(diretorio_cidades):
+            cidades.update(nome for nome in os.listdir(diretorio_cidades)
+                           if os.path.exists(os.path.join(diretorio_cidades, nome, 'modelo_precificacao.pkl')))
+        return sorted(cidades)
+
+    def obter(self, cidade=None):
+        """Retorna o precificador da cidade, carregando-o se necessário"""
+        slug = slug_cidade(cidade or self.cidade_padrao)
+
+        with self._lock:
+            if slug in self._bundles:
+                self._bundles.move_to_end(slug)
+                return self._bundles[slug][0]
+
+        # Cidade sem bundle não deixa lock para trás (o slug vem da requisição)
+        if self.diretorio_cidade(cidade or self.cidade_padrao) is None:
+            raise CidadeNaoSuportada(cidade)
+        with self._lock:
+            lock_carga = self._locks_carga.setdefault(slug, threading.Lock())
+
+        # Carga fora do lock global: outras cidades continuam sendo servidas
+        with lock_carga:
+            with self._lock:
+                if slug in self._bundles:
+                    self._bundles.move_to_end(slug)
+                    return self._bundles[slug][0]
+
+            diretorio = self.diretorio_cidade(cidade or self.cidade_padrao)
+            if diretorio is None:
+                raise CidadeNaoSuportada(cidade)
+
+            precificador = self.fabrica(diretorio_modelos=diretorio)
+            tamanho = estimar_memoria(precificador)
+
+            with self._lock:
+                self._bundles[slug] = (precificador, tamanho)
+                self._aplicar_orcamento(preservar=slug)
+            print(f"📦 Bundle '{slug}' carregado (~{tamanho / 1024 / 1024:.1f} MB)")
+            return precificador
+
+    def _aplicar_orcamento(self, preservar):
+        """Descarta bundles LRU não fixados até caber no orçamento (chamar com lock)"""
+        for slug in list(self._bundles):
+            if self.memoria_usada() <= self.memoria_max:
+                break
+            if slug == preservar or slug in self.fixadas:
+                continue
+            del self._bundles[slug]
+            print(f"♻️ Bundle '{slug}' descartado (orçamento de memória)")
+
+    def memoria_usada(self):
+        return sum(tamanho for _, tamanho in self._bundles.values())
+
+    def fixar(self, cidade):
+        """Mantém a cidade sempre carregada (e já carrega)"""
+        with self._lock:
+            self.fixadas.add(slug_cidade(cidade))
+        return self.obter(cidade)
+
+    def desafixar(self, cidade):
+        with self._lock:
+            self.fixadas.discard(slug_cidade(cidade))
+
+    def descartar(self, cidade):
+        """Remove o bundle da memória (próxima requisição recarrega do disco)"""
+        with self._lock:
+            self._bundles.pop(slug_cidade(cidade), None)
+
+    def status(self):
+        with self._lock:
+            return {
+                'memoria_usada_mb': round(self.memoria_usada() / 1024 / 1024, 1),
+                'memoria_max_mb': round(self.memoria_max / 1024 / 1024, 1),
+                'carregadas': list(self._bundles),
+                'fixadas': sorted(self.fixadas),
+                'disponiveis': self.cidades_disponiveis()
+            }
@@ -0,0 +1,280 @@
+"""
+REPRECIFICAÇÃO EM LOTE (OFFLINE)
+Divide a carteira em shards, precifica cada shard em um pool de processos
+(um modelo carregado por worker) e grava checkpoint a cada shard concluído,
+permitindo retomar uma execução interrompida
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import pandas as pd
+
+COLUNAS_ENTRADA = ['bairro', 'tipo_imovel', 'area_construida', 'area_terreno', 'quartos', 'banheiros']
+COLUNAS_NUMERICAS = ['area_construida', 'area_terreno', 'quartos', 'banheiros']
+FORMATOS = ('csv', 'parquet')
+
+# Modelo do worker (carregado uma vez no initializer)
+_precificador = None
+
+
+def _iniciar_worker(diretorio_modelos):
+    global _precificador
+    from precificador_ia_aprimorado import PrecificadorIAAprimorado
+    _precificador = PrecificadorIAAprimorado(diretorio_modelos=diretorio_modelos)
+    # Paralelismo vem do pool: cada worker prediz com um núcleo
+    if hasattr(_precificador.modelo, 'n_jobs'):
+        _precificador.modelo.n_jobs = 1
+
+
+def _versao_modelo(diretorio_modelos):
+    with open(os.path.join(diretorio_modelos, 'info_modelo.json'), 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    return info.get('versao', info['data_treinamento'])
+
+
+def _ler_shards(arquivo, tamanho_shard):
+    """Gera DataFrames de `tamanho_shard` linhas sem carregar o arquivo inteiro"""
+    if arquivo.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(arquivo).iter_batches(batch_size=tamanho_shard):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(arquivo, chunksize=tamanho_shard)
+
+
+def _gravar(df, caminho, formato):
+    temporario = caminho + '.tmp'
+    if formato == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        # Colunas só com None (ex.: 'erro') viram string: o schema é o mesmo em todos os shards
+        tabela = tabela.cast(pa.schema([
+            pa.field(campo.name, pa.string()) if pa.types.is_null(campo.type) else campo
+            for campo in tabela.schema
+        ]))
+        pq.write_table(tabela, temporario)
+    else:
+        df.to_csv(temporario, index=False)
+    os.replace(temporario, caminho)
+
+
+def _precificar_shard(indice, df, caminho_parte, formato, explicar=False):
+    """Corpo do worker: precifica um shard e grava sua parte do resultado"""
+    inicio = time.perf_counter()
+    df = df.reset_index(drop=True)
+    for coluna in COLUNAS_NUMERICAS:
+        df[coluna] = pd.to_numeric(df[coluna], errors='coerce')
+        if formato == 'parquet':
+            # int64 num shard e float64 (com NaN) em outro quebrariam a concatenação
+            df[coluna] = df[coluna].astype(float)
+    validos = df[COLUNAS_ENTRADA].notna().all(axis=1).to_numpy()
+
+    saida = df.copy()
+    saida['preco_estimado'] = None
+    saida['preco_base_ia'] = None
+    saida['confianca'] = None
+    saida['bairro_usado'] = None
+    saida['score_qualidade'] = None
+    saida['ajustes_aplicados'] = None
+    saida['regras'] = None
+    saida['erro'] = None
+
+    if validos.any():
+        resultado = _precificador.precificar_lote(df.loc[validos, COLUNAS_ENTRADA], explicar=explicar)
+        # Listas viram JSON: o mesmo conteúdo em CSV e parquet
+        resultado['ajustes_aplicados'] = [json.dumps(a, ensure_ascii=False) for a in resultado['ajustes_aplicados']]
+        resultado['regras'] = [json.dumps(r) for r in resultado['regras']]
+        for coluna in resultado.columns.difference(saida.columns):
+            saida[coluna] = None
+        saida.loc[validos, list(resultado.columns)] = resultado.to_numpy(dtype=object)
+    colunas_float = ['preco_estimado', 'preco_base_ia', 'score_qualidade']
+    colunas_float += [c for c in saida.columns if c == 'valor_base_modelo' or c.startswith('contrib_')]
+    for coluna in colunas_float:
+        saida[coluna] = saida[coluna].astype(float)
+    saida.loc[~validos, 'erro'] = 'dados incompletos ou inválidos'
+    saida['versao_modelo'] = _precificador.versao_modelo
+
+    _gravar(saida, caminho_parte, formato)
+    return indice, len(saida), int(validos.sum()), time.perf_counter() - inicio
+
+
+class ReprecificadorLote:
+    """
+    Reprecificação de um arquivo (CSV ou parquet) de imóveis.
+
+    - Shards de `tamanho_shard` linhas vão para `max_workers` processos
+    - Cada shard concluído é gravado em `<saida>.partes/` e registrado em
+      `checkpoint.json`; rodar de novo com os mesmos parâmetros pula os shards prontos
+    - Ao final as partes são concatenadas em `saida` (CSV ou parquet)
+    """
+
+    def __init__(self, arquivo_entrada, arquivo_saida, diretorio_modelos='models',
+                 tamanho_shard=5000, max_workers=None, formato=None, explicar=False):
+        self.arquivo_entrada = arquivo_entrada
+        self.arquivo_saida = arquivo_saida
+        self.diretorio_modelos = diretorio_modelos
+        self.tamanho_shard = tamanho_shard
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 1) - 1)
+        self.explicar = explicar
+        self.formato = formato or ('parquet' if arquivo_saida.endswith('.parquet') else 'csv')
+        if self.formato not in FORMATOS:
+            raise ValueError(f"Formato desconhecido: {self.formato}")
+        if 'parquet' in (self.formato, os.path.splitext(arquivo_entrada)[1].lstrip('.')):
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet requer o pacote opcional pyarrow (pip install pyarrow)")
+        self.diretorio_partes = arquivo_saida + '.partes'
+        self.arquivo_checkpoint = os.path.join(self.diretorio_partes, 'checkpoint.json')
+
+    def _assinatura(self):
+        """Identifica a execução: outra entrada, shard ou modelo invalida o checkpoint"""
+        estado = os.stat(self.arquivo_entrada)
+        return {
+            'arquivo_entrada': os.path.abspath(self.arquivo_entrada),
+            'tamanho_bytes': estado.st_size,
+            'mtime': estado.st_mtime,
+            'tamanho_shard': self.tamanho_shard,
+            'formato': self.formato,
+            'explicar': self.explicar,
+            'versao_modelo': _versao_modelo(self.diretorio_modelos)
+        }
+
+    def _carregar_checkpoint(self, assinatura):
+        if os.path.exists(self.arquivo_checkpoint):
+            with open(self.arquivo_checkpoint, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint['assinatura'] == assinatura:
+                return checkpoint
+            print("⚠️ Checkpoint de outra execução (entrada, shard ou modelo mudou): recomeçando")
+            shutil.rmtree(self.diretorio_partes)
+        os.makedirs(self.diretorio_partes, exist_ok=True)
+        return {'assinatura': assinatura, 'concluidos': {}, 'iniciado_em': datetime.now().isoformat()}
+
+    def _salvar_checkpoint(self, checkpoint):
+        temporario = self.arquivo_checkpoint + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.arquivo_checkpoint)
+
+    def _caminho_parte(self, indice):
+        return os.path.join(self.diretorio_partes, f"parte_{indice:06d}.{self.formato}")
+
+    def executar(self, manter_partes=False):
+        assinatura = self._assinatura()
+        checkpoint = self._carregar_checkpoint(assinatura)
+        concluidos = checkpoint['concluidos']
+        if concluidos:
+            print(f"♻️ Retomando: {len(concluidos)} shard(s) já concluído(s)")
+
+        print(f"🚀 Reprecificando {self.arquivo_entrada} (modelo {assinatura['versao_modelo']}, "
+              f"{self.max_workers} worker(s), shards de {self.tamanho_shard} linhas)")
+        inicio = time.perf_counter()
+        linhas_processadas = 0
+        segundos_workers = 0.0
+        total_shards = 0
+
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=contexto,
+                                 initializer=_iniciar_worker, initargs=(self.diretorio_modelos,)) as executor:
+            pendentes = set()
+
+            def coletar(bloquear):
+                nonlocal pendentes, linhas_processadas, segundos_workers
+                if not pendentes:
+                    return
+                prontos, pendentes = wait(pendentes, timeout=None if bloquear else 0, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    indice, linhas, validas, segundos = futuro.result()
+                    concluidos[str(indice)] = {'linhas': linhas, 'validas': validas, 'segundos': round(segundos, 3)}
+                    self._salvar_checkpoint(checkpoint)
+                    linhas_processadas += linhas
+                    segundos_workers += segundos
+                    decorrido = time.perf_counter() - inicio
+                    print(f"   ✅ Shard {indice}: {linhas} linhas em {segundos:.2f}s "
+                          f"({linhas_processadas / decorrido:,.0f} linhas/s no total)")
+
+            for indice, df in enumerate(_ler_shards(self.arquivo_entrada, self.tamanho_shard)):
+                total_shards += 1
+                if indice == 0:
+                    faltando = [c for c in COLUNAS_ENTRADA if c not in df.columns]
+                    if faltando:
+                        raise ValueError(f"Colunas ausentes na entrada: {faltando}")
+                if str(indice) in concluidos and os.path.exists(self._caminho_parte(indice)):
+                    continue
+                # Limita shards em memória aguardando worker
+                while len(pendentes) >= self.max_workers * 2:
+                    coletar(bloquear=True)
+                pendentes.add(executor.submit(_precificar_shard, indice, df, self._caminho_parte(indice),
+                                              self.formato, self.explicar))
+                coletar(bloquear=False)
+
+            while pendentes:
+                coletar(bloquear=True)
+
+        self._concatenar(total_shards)
+        decorrido = time.perf_counter() - inicio
+        total_linhas = sum(c['linhas'] for c in concluidos.values())
+        invalidas = total_linhas - sum(c['validas'] for c in concluidos.values())
+
+        print(f"🏁 {total_linhas:,} linhas em {self.arquivo_saida} "
+              f"({linhas_processadas:,} nesta execução, {decorrido:.1f}s, "
+              f"{linhas_processadas / decorrido if decorrido else 0:,.0f} linhas/s)")
+        if segundos_workers:
+            # Sem a carga inicial do modelo nos workers
+            print(f"   ⚡ Precificação: {linhas_processadas / segundos_workers:,.0f} linhas/s por worker")
+        if invalidas:
+            print(f"⚠️ {invalidas} linha(s) sem preço por dados incompletos (coluna 'erro')")
+
+        if not manter_partes:
+            shutil.rmtree(self.diretorio_partes)
+        return {'linhas': total_linhas, 'linhas_execucao': linhas_processadas,
+                'segundos': decorrido, 'versao_modelo': assinatura['versao_modelo']}
+
+    def _concatenar(self, total_shards):
+        """Junta as partes na ordem dos shards sem carregar tudo em memória"""
+        temporario = self.arquivo_saida + '.tmp'
+        if self.formato == 'parquet':
+            import pyarrow.parquet as pq
+            escritor = None
+            for indice in range(total_shards):
+                tabela = pq.read_table(self._caminho_parte(indice))
+                if escritor is None:
+                    escritor = pq.ParquetWriter(temporario, tabela.schema)
+                escritor.write_table(tabela.cast(escritor.schema))
+            if escritor is not None:
+                escritor.close()
+        else:
+            with open(temporario, 'wb') as saida:
+                for indice in range(total_shards):
+                    with open(self._caminho_parte(indice), 'rb') as parte:
+                        if indice > 0:
+                            parte.readline()  # cabeçalho só uma vez
+                        shutil.copyfileobj(parte, saida)
+        os.replace(temporario, self.arquivo_saida)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reprecifica uma carteira de imóveis em lote")
+    parser.add_argument('entrada', help="CSV ou parquet com bairro, tipo_imovel, area_construida, area_terreno, quartos, banheiros")
+    parser.add_argument('saida', help="Arquivo de saída (.csv ou .parquet)")
+    parser.add_argument('--modelos', default='models', help="Diretório do bundle")
+    parser.add_argument('--shard', type=int, default=5000, help="Linhas por shard")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--formato', choices=FORMATOS, default=None)
+    parser.add_argument('--explicar', action='store_true',
+                        help="Inclui valor_base_modelo e a contribuição de cada feature (contrib_*) no preço base")
+    parser.add_argument('--manter-partes', action='store_true', help="Não apaga as partes/checkpoint ao final")
+    args = parser.parse_args()
+
+    ReprecificadorLote(args.entrada, args.saida, args.modelos, args.shard, args.workers, args.formato,
+                       args.explicar).executar(args.manter_partes)
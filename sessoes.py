@@ -0,0 +1,333 @@
+"""
+SESSÕES COMPARTILHADAS ENTRE WORKERS
+Chave secreta configurável/rotacionável, sessões no servidor (arquivos ou
+SQLite) e cache em memória dos registros de usuário
+"""
+
+import hashlib
+import json
+import os
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface, session_json_serializer
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+# Fração das gravações que também removem sessões expiradas
+PROBABILIDADE_LIMPEZA = 0.01
+
+# Chave em arquivo mais curta que isso é tratada como ausente (token_hex(32) tem 64)
+TAMANHO_MINIMO_CHAVE = 32
+
+
+def carregar_chaves_secretas(diretorio_instancia):
+    """
+    Retorna (chave_atual, chaves_antigas).
+
+    - JECET_SECRET_KEY define a chave atual; JECET_SECRET_KEYS_ANTIGAS (separadas
+      por vírgula) continuam válidas para verificar cookies durante a rotação
+    - Sem variável de ambiente, a chave é gerada uma vez em
+      `<instance>/secret_key` e compartilhada por todos os workers do host;
+      um arquivo vazio ou com chave curta demais é substituído por uma nova
+    """
+    antigas = [c.strip() for c in os.environ.get('JECET_SECRET_KEYS_ANTIGAS', '').split(',') if c.strip()]
+    chave = os.environ.get('JECET_SECRET_KEY')
+    if chave:
+        return chave, antigas
+
+    caminho = os.path.join(diretorio_instancia, 'secret_key')
+    os.makedirs(diretorio_instancia, exist_ok=True)
+    try:
+        # O_EXCL: se vários workers sobem juntos, só o primeiro grava
+        fd = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        print(f"🔑 Chave secreta gerada em {caminho} (defina JECET_SECRET_KEY em produção)")
+    except FileExistsError:
+        pass
+
+    # Outro worker pode estar no meio da gravação
+    for _ in range(50):
+        with open(caminho, 'r') as f:
+            chave = f.read().strip()
+        if len(chave) >= TAMANHO_MINIMO_CHAVE:
+            return chave, antigas
+        time.sleep(0.05)
+
+    # Arquivo vazio/truncado: nunca assinar com ele
+    chave = secrets.token_hex(32)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    fd = os.open(temporario, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(chave)
+    os.replace(temporario, caminho)
+    print(f"🔑 Chave secreta inválida em {caminho}: nova chave gerada")
+    return chave, antigas
+
+
+def chaves_assinatura(app):
+    """Chaves para o itsdangerous: verifica com todas, assina com a última (atual)"""
+    return [*app.config.get('SECRET_KEYS_ANTIGAS', []), app.secret_key]
+
+
+class InterfaceSessaoAssinada(SecureCookieSessionInterface):
+    """Sessão em cookie (padrão do Flask) aceitando as chaves antigas durante a rotação"""
+
+    def get_signing_serializer(self, app):
+        if not app.secret_key:
+            return None
+        return URLSafeTimedSerializer(
+            chaves_assinatura(app),
+            salt=self.salt,
+            serializer=self.serializer,
+            signer_kwargs={'key_derivation': self.key_derivation, 'digest_method': self.digest_method}
+        )
+
+
+class ArmazenamentoArquivos:
+    """Uma sessão por arquivo; serve para vários workers no mesmo host"""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, sid):
+        return os.path.join(self.diretorio, hashlib.sha256(sid.encode('utf-8')).hexdigest())
+
+    def carregar(self, sid):
+        caminho = self._caminho(sid)
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                registro = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if registro['expira'] < time.time():
+            self.remover(sid)
+            return None
+        return registro['dados']
+
+    def salvar(self, sid, dados, ttl):
+        caminho = self._caminho(sid)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'expira': time.time() + ttl, 'dados': dados}, f)
+        os.replace(temporario, caminho)
+        if random.random() < PROBABILIDADE_LIMPEZA:
+            self.limpar_expiradas()
+
+    def remover(self, sid):
+        try:
+            os.remove(self._caminho(sid))
+        except OSError:
+            pass
+
+    def limpar_expiradas(self):
+        agora = time.time()
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                with open(caminho, 'r', encoding='utf-8') as f:
+                    expirada = json.load(f)['expira'] < agora
+                if expirada:
+                    os.remove(caminho)
+            except (OSError, ValueError, KeyError):
+                continue
+
+
+class ArmazenamentoSQLite:
+    """Tabela de sessões em SQLite (WAL), uma conexão por thread"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        conexao = self._conexao()
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute('CREATE TABLE IF NOT EXISTS sessoes (sid TEXT PRIMARY KEY, dados TEXT NOT NULL, expira REAL NOT NULL)')
+        conexao.execute('CREATE INDEX IF NOT EXISTS idx_sessoes_expira ON sessoes (expira)')
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+            self._local.conexao = conexao
+        return conexao
+
+    def carregar(self, sid):
+        linha = self._conexao().execute(
+            'SELECT dados FROM sessoes WHERE sid = ? AND expira >= ?', (sid, time.time())
+        ).fetchone()
+        return linha[0] if linha else None
+
+    def salvar(self, sid, dados, ttl):
+        self._conexao().execute(
+            'INSERT OR REPLACE INTO sessoes (sid, dados, expira) VALUES (?, ?, ?)',
+            (sid, dados, time.time() + ttl)
+        )
+        if random.random() < PROBABILIDADE_LIMPEZA:
+            self.limpar_expiradas()
+
+    def remover(self, sid):
+        self._conexao().execute('DELETE FROM sessoes WHERE sid = ?', (sid,))
+
+    def limpar_expiradas(self):
+        self._conexao().execute('DELETE FROM sessoes WHERE expira < ?', (time.time(),))
+
+
+class SessaoServidor(SecureCookieSession):
+    """Mesma semântica da sessão em cookie; o cookie guarda só o id assinado"""
+
+    def __init__(self, inicial=None, sid=None):
+        super().__init__(inicial)
+        self.sid = sid
+        self.sid_anterior = None
+
+    def regenerar(self):
+        """Troca o id (o registro do id antigo é apagado ao salvar)"""
+        if self.sid_anterior is None:
+            self.sid_anterior = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+def regenerar_sessao(sessao):
+    """
+    Contra fixação de sessão: chamar ao autenticar. Descarta o conteúdo anterior
+    e, nas sessões no servidor, emite um id novo e apaga o antigo
+    """
+    sessao.clear()
+    if isinstance(sessao, SessaoServidor):
+        sessao.regenerar()
+
+
+class InterfaceSessaoServidor(SessionInterface):
+    """
+    Sessões guardadas em `armazenamento` (ArmazenamentoArquivos ou
+    ArmazenamentoSQLite). Visitantes anônimos não geram gravações.
+    """
+
+    salt = 'jecet-sessao-servidor'
+    serializer = session_json_serializer
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+
+    def _assinador(self, app):
+        if not app.secret_key:
+            return None
+        return URLSafeTimedSerializer(chaves_assinatura(app), salt=self.salt)
+
+    def open_session(self, app, request):
+        assinador = self._assinador(app)
+        if assinador is None:
+            return None
+
+        valor = request.cookies.get(self.get_cookie_name(app))
+        if valor:
+            try:
+                sid = assinador.loads(valor, max_age=int(app.permanent_session_lifetime.total_seconds()))
+            except BadSignature:
+                sid = None
+            dados = self.armazenamento.carregar(sid) if sid else None
+            if dados is not None:
+                return SessaoServidor(self.serializer.loads(dados), sid=sid)
+        return SessaoServidor(sid=secrets.token_urlsafe(32))
+
+    def save_session(self, app, session, response):
+        nome = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        caminho = self.get_cookie_path(app)
+        seguro = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.sid_anterior is not None:
+            self.armazenamento.remover(session.sid_anterior)
+            session.sid_anterior = None
+
+        if not session:
+            if session.modified:
+                self.armazenamento.remover(session.sid)
+                response.delete_cookie(nome, domain=dominio, path=caminho, secure=seguro,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        self.armazenamento.salvar(session.sid, self.serializer.dumps(dict(session)),
+                                  app.permanent_session_lifetime.total_seconds())
+        response.set_cookie(
+            nome,
+            self._assinador(app).dumps(session.sid),
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=dominio,
+            path=caminho,
+            secure=seguro,
+            samesite=samesite
+        )
+        response.vary.add('Cookie')
+
+
+def criar_interface_sessao(backend, diretorio='instance/sessoes', caminho_sqlite='instance/sessoes.db'):
+    """backend: 'cookie' (padrão), 'arquivo' ou 'sqlite'"""
+    if backend == 'arquivo':
+        return InterfaceSessaoServidor(ArmazenamentoArquivos(diretorio))
+    if backend == 'sqlite':
+        return InterfaceSessaoServidor(ArmazenamentoSQLite(caminho_sqlite))
+    if backend not in ('', 'cookie'):
+        raise ValueError(f"Backend de sessão desconhecido: {backend}")
+    return InterfaceSessaoAssinada()
+
+
+class CacheUsuarios:
+    """
+    Cache por processo dos registros de usuário (dicts), com TTL e limite de
+    itens (LRU). Alterações feitas neste worker invalidam na hora; nos demais
+    o registro antigo vale até o TTL expirar.
+    """
+
+    def __init__(self, carregar, ttl=60.0, max_itens=10000):
+        self.carregar = carregar
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # username -> (expira, registro)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, username):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._itens.get(username)
+            if entrada is not None and entrada[0] > agora:
+                self._itens.move_to_end(username)
+                self.acertos += 1
+                return entrada[1]
+            self.faltas += 1
+
+        registro = self.carregar(username)
+        with self._lock:
+            self._itens[username] = (agora + self.ttl, registro)
+            self._itens.move_to_end(username)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return registro
+
+    def invalidar(self, *usernames):
+        with self._lock:
+            for username in usernames:
+                self._itens.pop(username, None)
+
+    def status(self):
+        with self._lock:
+            return {'itens': len(self._itens), 'acertos': self.acertos, 'faltas': self.faltas, 'ttl': self.ttl}
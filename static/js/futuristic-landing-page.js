@@ -4,7 +4,7 @@ const descriptionElement = document.querySelector(".juice-info");
 const juiceWheel = document.querySelector(".juice-wheel");
 const fruitsWheel = document.querySelector(".fruits-wheel");
 const juiceTextContainer = document.querySelector(".juice-text");
-const photos = document.querySelectorAll('.juice-wrapper');
+const landingContainer = document.querySelector(".main-landing-page-container");
 
 let currentJuice = juiceArray[0];
 let deg = -45;
@@ -125,14 +125,37 @@ document.addEventListener('DOMContentLoaded', () => {
 
 });
 
+/*=============== CARREGAMENTO SOB DEMANDA DAS IMAGENS ===============*/
+// As imagens grandes de cada imóvel vêm com data-src no template e só são
+// baixadas quando o imóvel fica ativo (ou logo antes, na rotação automática)
+function loadPropertyImages(index) {
+    document.querySelectorAll(`.dynamic-juice-${index + 1}, .dynamic-fruits-${index + 1}`).forEach(img => {
+        if (img.dataset.src) {
+            img.src = img.dataset.src;
+            img.removeAttribute('data-src');
+        }
+    });
+}
+
+function preloadWhenIdle(index) {
+    const load = () => loadPropertyImages(index);
+    if ('requestIdleCallback' in window) {
+        requestIdleCallback(load, { timeout: 2000 });
+    } else {
+        setTimeout(load, 200);
+    }
+}
+
 /*=============== IMAGENS DINÂMICAS ===============*/
 // Função para atualizar as imagens ativas e detalhes
 function updateActiveImages(index) {
+    loadPropertyImages(index);
+    
     // Remove a classe active de todas as fotos
-    photos.forEach(photo => photo.classList.remove('activePhoto'));
+    juiceArray.forEach(photo => photo.classList.remove('activePhoto'));
     
     // Adiciona a classe active na foto clicada
-    photos[index].classList.add('activePhoto');
+    juiceArray[index].classList.add('activePhoto');
     
     // Atualiza o background
     document.querySelector(".main-landing-page-container").style.background = 
@@ -162,7 +185,7 @@ function updateActiveImages(index) {
 }
 
 // Adiciona evento de clique em cada foto
-photos.forEach((photo, index) => {
+juiceArray.forEach((photo, index) => {
     photo.addEventListener('click', () => {
         updateActiveImages(index);
     });
@@ -170,29 +193,55 @@ photos.forEach((photo, index) => {
 
 // Rotação automática das imagens
 let currentIndex = 0;
-const totalPhotos = photos.length;
+const totalPhotos = juiceArray.length;
 
 function rotateImages() {
     currentIndex = (currentIndex + 1) % totalPhotos;
     updateActiveImages(currentIndex);
+    // Deixa a próxima imagem pronta antes da próxima troca
+    preloadWhenIdle((currentIndex + 1) % totalPhotos);
+}
+
+// A rotação só roda com a landing na tela, a aba visível e sem o mouse sobre as fotos
+let rotationInterval = null;
+let isLandingInView = true;
+let isHoveringPhotos = false;
+
+function updateRotation() {
+    const shouldRotate = isLandingInView && !document.hidden && !isHoveringPhotos && totalPhotos > 1;
+    if (shouldRotate && !rotationInterval) {
+        preloadWhenIdle((currentIndex + 1) % totalPhotos);
+        rotationInterval = setInterval(rotateImages, 5000);
+    } else if (!shouldRotate && rotationInterval) {
+        clearInterval(rotationInterval);
+        rotationInterval = null;
+    }
 }
 
-// Inicia a rotação automática
-let rotationInterval = setInterval(rotateImages, 5000);
+if (landingContainer && 'IntersectionObserver' in window) {
+    new IntersectionObserver((entries) => {
+        isLandingInView = entries[entries.length - 1].isIntersecting;
+        updateRotation();
+    }).observe(landingContainer);
+}
+document.addEventListener('visibilitychange', updateRotation);
 
 // Para a rotação quando o mouse está sobre as imagens
 const photosContainer = document.getElementById('static-images-container');
 if (photosContainer) {
     photosContainer.addEventListener('mouseenter', () => {
-        clearInterval(rotationInterval);
+        isHoveringPhotos = true;
+        updateRotation();
     });
     
     photosContainer.addEventListener('mouseleave', () => {
-        rotationInterval = setInterval(rotateImages, 5000);
+        isHoveringPhotos = false;
+        updateRotation();
     });
 }
 
-// Atualiza as imagens quando a página carrega
+// Atualiza as imagens quando a página carrega e inicia a rotação
 window.addEventListener('load', () => {
     updateActiveImages(0);
+    updateRotation();
 });
\ No newline at end of file
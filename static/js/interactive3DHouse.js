@@ -17,6 +17,10 @@ class Interactive3DHouse {
         this.isHovering = false;
         this.autoRotate = true;
         this.animationId = null;
+        this.isBuilt = false;
+        this.isInView = false;
+        this.observer = null;
+        this.onVisibilityChange = () => this.updateRenderLoop();
         
         // Configurações
         this.config = {
@@ -33,10 +37,17 @@ class Interactive3DHouse {
     
     init() {
         console.log('🎯 Iniciando Interactive3DHouse.init()');
+        console.log('📦 Criando container...');
+        this.createContainer();
+        
+        // Cena, renderer e o modelo .glb só são carregados quando a seção
+        // do precificador entra na tela
+        this.observeVisibility();
+    }
+    
+    build() {
+        this.isBuilt = true;
         try {
-            console.log('📦 Criando container...');
-            this.createContainer();
-            
             console.log('🎬 Configurando cena...');
             this.setupScene();
             
@@ -58,15 +69,47 @@ class Interactive3DHouse {
             console.log('🎮 Configurando event listeners...');
             this.setupEventListeners();
             
-            console.log('🎥 Iniciando animação...');
-            this.animate();
-            
             console.log('✅ Interactive3DHouse inicializado com sucesso!');
         } catch (error) {
             console.error('❌ Erro durante inicialização:', error);
         }
     }
     
+    observeVisibility() {
+        // O container é fixo (fundo da página): a visibilidade útil é a da seção do precificador
+        const target = document.getElementById('precificador') || document.getElementById('house-3d-container');
+        
+        if (!('IntersectionObserver' in window)) {
+            this.isInView = true;
+            this.updateRenderLoop();
+        } else {
+            this.observer = new IntersectionObserver((entries) => {
+                this.isInView = entries[entries.length - 1].isIntersecting;
+                this.updateRenderLoop();
+            });
+            this.observer.observe(target);
+        }
+        
+        // Aba em segundo plano também pausa a renderização
+        document.addEventListener('visibilitychange', this.onVisibilityChange);
+    }
+    
+    updateRenderLoop() {
+        const shouldRender = this.isInView && !document.hidden;
+        
+        if (shouldRender && !this.isBuilt) {
+            this.build();
+        }
+        
+        if (shouldRender && !this.animationId) {
+            console.log('🎥 Iniciando animação...');
+            this.animate();
+        } else if (!shouldRender && this.animationId) {
+            cancelAnimationFrame(this.animationId);
+            this.animationId = null;
+        }
+    }
+    
     createContainer() {
         // Container para o modelo 3D como fundo da página inteira
         const container = document.createElement('div');
@@ -259,9 +302,6 @@ class Interactive3DHouse {
         
         // Resize
         window.addEventListener('resize', () => this.onWindowResize(), false);
-        
-        // Scroll para pausar/retomar animação
-        window.addEventListener('scroll', () => this.onScroll(), false);
     }
     
     onMouseMove(event) {
@@ -420,23 +460,6 @@ class Interactive3DHouse {
         }
     }
     
-    onScroll() {
-        const precificadorSection = document.getElementById('precificador');
-        if (!precificadorSection) return;
-        
-        const rect = precificadorSection.getBoundingClientRect();
-        const isVisible = rect.top < window.innerHeight && rect.bottom > 0;
-        
-        if (!isVisible && this.animationId) {
-            // Pausar animação quando não visível
-            cancelAnimationFrame(this.animationId);
-            this.animationId = null;
-        } else if (isVisible && !this.animationId) {
-            // Retomar animação quando visível
-            this.animate();
-        }
-    }
-    
     animate() {
         this.animationId = requestAnimationFrame(() => this.animate());
         
@@ -457,7 +480,13 @@ class Interactive3DHouse {
     destroy() {
         if (this.animationId) {
             cancelAnimationFrame(this.animationId);
+            this.animationId = null;
+        }
+        
+        if (this.observer) {
+            this.observer.disconnect();
         }
+        document.removeEventListener('visibilitychange', this.onVisibilityChange);
         
         const container = document.getElementById('house-3d-container');
         if (container) {
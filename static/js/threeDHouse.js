@@ -17,17 +17,69 @@ class ThreeDHouse {
         this.scrollY = 0;
         this.targetRotation = { x: 0, y: 0, z: 0 };
         this.currentRotation = { x: 0, y: 0, z: 0 };
+        this.isBuilt = false;
+        this.isInView = false;
+        this.observer = null;
+        this.onVisibilityChange = () => this.updateRenderLoop();
         
         this.init();
     }
     
     init() {
+        // Só o container é criado agora; a cena é montada quando ele entra na tela
         this.createContainer();
+        
+        // Responsividade - ocultar em telas pequenas (oculto não conta como visível)
+        this.checkScreenSize();
+        window.addEventListener('resize', () => {
+            this.checkScreenSize();
+        });
+        
+        this.observeVisibility();
+    }
+    
+    build() {
         this.setupScene();
         this.createHouse();
         this.setupLights();
         this.setupEventListeners();
-        this.animate();
+        this.isBuilt = true;
+        
+        // A página pode ter rolado antes da cena existir
+        this.scrollY = window.pageYOffset;
+        this.updateRotationFromScroll();
+    }
+    
+    observeVisibility() {
+        // Sem IntersectionObserver: comportamento antigo (sempre visível)
+        if (!('IntersectionObserver' in window)) {
+            this.isInView = true;
+            this.updateRenderLoop();
+        } else {
+            this.observer = new IntersectionObserver((entries) => {
+                this.isInView = entries[entries.length - 1].isIntersecting;
+                this.updateRenderLoop();
+            });
+            this.observer.observe(this.container);
+        }
+        
+        // Aba em segundo plano também pausa a renderização
+        document.addEventListener('visibilitychange', this.onVisibilityChange);
+    }
+    
+    updateRenderLoop() {
+        const shouldRender = this.isInView && !document.hidden;
+        
+        if (shouldRender && !this.isBuilt) {
+            this.build();
+        }
+        
+        if (shouldRender && !this.animationId) {
+            this.animate();
+        } else if (!shouldRender && this.animationId) {
+            cancelAnimationFrame(this.animationId);
+            this.animationId = null;
+        }
     }
     
     createContainer() {
@@ -238,12 +290,6 @@ class ThreeDHouse {
         this.container.addEventListener('mouseleave', () => {
             this.container.style.transform = 'scale(1)';
         });
-        
-        // Responsividade - ocultar em telas pequenas
-        this.checkScreenSize();
-        window.addEventListener('resize', () => {
-            this.checkScreenSize();
-        });
     }
     
     updateRotationFromScroll() {
@@ -303,7 +349,13 @@ class ThreeDHouse {
         // Cleanup
         if (this.animationId) {
             cancelAnimationFrame(this.animationId);
+            this.animationId = null;
+        }
+        
+        if (this.observer) {
+            this.observer.disconnect();
         }
+        document.removeEventListener('visibilitychange', this.onVisibilityChange);
         
         if (this.renderer) {
             this.renderer.dispose();
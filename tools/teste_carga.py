@@ -0,0 +1,328 @@
+"""
+TESTE DE CARGA LOCAL DOS ENDPOINTS FLASK
+
+Sobe o app em um processo separado com um banco SQLite descartável, cria e
+loga usuários de teste e dispara uma mistura de requisições (/api/precificar,
+/, /login, /api/status-ia) com payloads amostrados do dataset.
+
+Reporta throughput, latência p50/p95/p99 e taxa de erro para cada
+configuração de workers x threads, para comparar escalabilidade entre versões.
+
+Uso:
+    python tools/teste_carga.py --configs 1x1,1x8,2x4,4x4 --duracao 20 --concorrencia 16
+    python tools/teste_carga.py --configs 2x4 --taxa 50 --saida resultados.json
+
+As configurações usam gunicorn (--preload) se instalado. Sem gunicorn só a
+configuração 1x1 é executada (werkzeug sem threads): o modo threaded do
+werkzeug abre uma thread por conexão, sem limite, e não corresponderia ao
+rótulo workers x threads.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(RAIZ, 'dados', 'dataset_imoveis_jacarei.csv')
+
+MIX_PADRAO = 'precificar=70,index=15,status=10,login=5'
+
+
+def amostrar_payloads(arquivo, quantidade=500, seed=42):
+    """Amostragem reservatório de linhas do dataset (sem carregar o CSV inteiro)"""
+    rng = random.Random(seed)
+    amostra = []
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        for i, linha in enumerate(csv.DictReader(f)):
+            if i < quantidade:
+                amostra.append(linha)
+            else:
+                j = rng.randint(0, i)
+                if j < quantidade:
+                    amostra[j] = linha
+    return [{
+        'cidade': 'Jacareí',
+        'bairro': linha['bairro'],
+        'tipo_imovel': linha['tipo_imovel'],
+        'area_construida': float(linha['area_construida']),
+        'area_terreno': float(linha['area_terreno']),
+        'quartos': int(float(linha['quartos'])),
+        'banheiros': int(float(linha['banheiros']))
+    } for linha in amostra]
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return None
+    k = (len(valores_ordenados) - 1) * p / 100
+    inferior = int(k)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[inferior] + (valores_ordenados[superior] - valores_ordenados[inferior]) * (k - inferior)
+
+
+class Servidor:
+    """Processo do app Flask com banco descartável"""
+
+    def __init__(self, workers, threads, porta):
+        self.workers = workers
+        self.threads = threads
+        self.porta = porta
+        self.url = f"http://127.0.0.1:{porta}"
+        self.diretorio = tempfile.mkdtemp(prefix='jecet_carga_')
+        self.env = dict(os.environ, JECET_DATABASE_URI=f"sqlite:///{os.path.join(self.diretorio, 'carga.db')}")
+        # Mede o servidor, não o limite por usuário (que recusaria com 429); ajuste via env se quiser testá-lo
+        self.env.setdefault('JECET_ADMISSAO_TAXA', '1000000')
+        self.env.setdefault('JECET_ADMISSAO_RAJADA', '1000000')
+        self.processo = None
+
+    def iniciar(self):
+        if shutil.which('gunicorn'):
+            comando = ['gunicorn', '--preload', '-w', str(self.workers), '--threads', str(self.threads),
+                       '-b', f"127.0.0.1:{self.porta}", '--log-level', 'warning', 'app:app']
+        elif self.workers == 1 and self.threads == 1:
+            comando = [sys.executable, __file__, '--servidor', '--porta', str(self.porta)]
+        else:
+            self.parar()
+            raise RuntimeError("gunicorn não instalado: apenas a configuração 1x1 é suportada")
+
+        # Cria as tabelas antes de subir os workers
+        subprocess.run([sys.executable, __file__, '--criar-banco'], cwd=RAIZ, env=self.env, check=True)
+
+        self.processo = subprocess.Popen(comando, cwd=RAIZ, env=self.env,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        limite = time.time() + 60
+        while time.time() < limite:
+            try:
+                if requests.get(self.url + '/api/status-ia', timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            if self.processo.poll() is not None:
+                break
+            time.sleep(0.25)
+        self.parar()
+        raise RuntimeError(f"Servidor não respondeu em {self.url}")
+
+    def parar(self):
+        if self.processo and self.processo.poll() is None:
+            self.processo.terminate()
+            try:
+                self.processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.processo.kill()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+
+def criar_usuarios(url, quantidade):
+    """Registra e loga usuários de teste; retorna [(sessao, usuario, senha)]"""
+    usuarios = []
+    for i in range(quantidade):
+        usuario, senha = f"carga{i}", f"senha-carga-{i}"
+        sessao = requests.Session()
+        sessao.post(url + '/register', data={
+            'reg-username': usuario,
+            'reg-email': f"{usuario}@teste.local",
+            'reg-password': senha,
+            'reg-confirm-password': senha
+        }, allow_redirects=False, timeout=30)
+        sessao.post(url + '/login', data={'username': usuario, 'password': senha},
+                    allow_redirects=False, timeout=30)
+        if 'session' not in sessao.cookies:
+            raise RuntimeError(f"Falha ao logar usuário de teste {usuario}")
+        usuarios.append((sessao, usuario, senha))
+    return usuarios
+
+
+class GeradorCarga:
+    """Dispara a mistura de requisições e coleta latências por operação"""
+
+    def __init__(self, url, usuarios, payloads, mix, seed=0):
+        self.url = url
+        self.usuarios = usuarios
+        self.payloads = payloads
+        self.operacoes, self.pesos = zip(*mix.items())
+        self.rng = random.Random(seed)
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _executar(self, agendado_em=None):
+        with self._lock:
+            operacao = self.rng.choices(self.operacoes, self.pesos)[0]
+            sessao, usuario, senha = self.rng.choice(self.usuarios)
+            payload = self.rng.choice(self.payloads)
+
+        # Em modo taxa fixa a latência conta a partir do horário agendado
+        # (evita omissão coordenada quando o servidor atrasa)
+        inicio = agendado_em or time.perf_counter()
+        try:
+            if operacao == 'precificar':
+                resposta = sessao.post(self.url + '/api/precificar', json=payload, timeout=30)
+            elif operacao == 'index':
+                resposta = sessao.get(self.url + '/', timeout=30)
+            elif operacao == 'status':
+                resposta = sessao.get(self.url + '/api/status-ia', timeout=30)
+            else:
+                resposta = requests.post(self.url + '/login', data={'username': usuario, 'password': senha},
+                                         allow_redirects=False, timeout=30)
+            erro = resposta.status_code >= 400
+        except requests.RequestException:
+            erro = True
+        latencia = time.perf_counter() - inicio
+
+        with self._lock:
+            self.latencias[operacao].append(latencia)
+            if erro:
+                self.erros[operacao] += 1
+
+    def executar_concorrencia(self, concorrencia, duracao):
+        """Carga em malha fechada: `concorrencia` clientes em loop"""
+        fim = time.perf_counter() + duracao
+
+        def cliente():
+            while time.perf_counter() < fim:
+                self._executar()
+
+        threads = [threading.Thread(target=cliente) for _ in range(concorrencia)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def executar_taxa(self, taxa, duracao, concorrencia):
+        """Carga em malha aberta: `taxa` requisições/s independente das respostas"""
+        intervalo = 1.0 / taxa
+        total = int(taxa * duracao)
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            for i in range(total):
+                agendado = inicio + i * intervalo
+                espera = agendado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                executor.submit(self._executar, agendado)
+
+    def relatorio(self, duracao):
+        linhas = {}
+        todas = []
+        for operacao, latencias in sorted(self.latencias.items()):
+            todas.extend(latencias)
+            linhas[operacao] = self._resumo(latencias, self.erros[operacao], duracao)
+        linhas['total'] = self._resumo(todas, sum(self.erros.values()), duracao)
+        return linhas
+
+    @staticmethod
+    def _resumo(latencias, erros, duracao):
+        ordenadas = sorted(latencias)
+        ms = lambda v: round(v * 1000, 1) if v is not None else None
+        return {
+            'requisicoes': len(ordenadas),
+            'throughput_rps': round(len(ordenadas) / duracao, 1),
+            'p50_ms': ms(percentil(ordenadas, 50)),
+            'p95_ms': ms(percentil(ordenadas, 95)),
+            'p99_ms': ms(percentil(ordenadas, 99)),
+            'taxa_erro': round(erros / len(ordenadas), 4) if ordenadas else 0.0
+        }
+
+
+def executar_configuracao(workers, threads, args, payloads, mix):
+    servidor = Servidor(workers, threads, args.porta)
+    servidor.iniciar()
+    try:
+        usuarios = criar_usuarios(servidor.url, args.usuarios)
+        gerador = GeradorCarga(servidor.url, usuarios, payloads, mix, seed=args.seed)
+
+        # Aquecimento: carrega o bundle da IA em todos os workers
+        gerador.executar_concorrencia(args.concorrencia, args.aquecimento)
+        gerador.latencias.clear()
+        gerador.erros.clear()
+
+        inicio = time.perf_counter()
+        if args.taxa:
+            gerador.executar_taxa(args.taxa, args.duracao, args.concorrencia)
+        else:
+            gerador.executar_concorrencia(args.concorrencia, args.duracao)
+        return gerador.relatorio(time.perf_counter() - inicio)
+    finally:
+        servidor.parar()
+
+
+def imprimir_relatorio(resultados):
+    cabecalho = f"{'config':<8} {'operação':<11} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erro %':>7}"
+    print("\n" + cabecalho)
+    print("-" * len(cabecalho))
+    for config, linhas in resultados.items():
+        for operacao, r in linhas.items():
+            print(f"{config:<8} {operacao:<11} {r['requisicoes']:>7} {r['throughput_rps']:>8} "
+                  f"{r['p50_ms'] or '-':>8} {r['p95_ms'] or '-':>8} {r['p99_ms'] or '-':>8} {r['taxa_erro'] * 100:>6.2f}%")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga local dos endpoints Flask")
+    parser.add_argument('--configs', default='1x8', help="Lista workers x threads, ex.: 1x1,1x8,2x4")
+    parser.add_argument('--duracao', type=float, default=20, help="Segundos de medição por configuração")
+    parser.add_argument('--aquecimento', type=float, default=3, help="Segundos de aquecimento (descartados)")
+    parser.add_argument('--concorrencia', type=int, default=16, help="Clientes simultâneos")
+    parser.add_argument('--taxa', type=float, default=None, help="Requisições/s (malha aberta) em vez de concorrência fixa")
+    parser.add_argument('--usuarios', type=int, default=8, help="Usuários de teste registrados")
+    parser.add_argument('--mix', default=MIX_PADRAO, help="Pesos das operações, ex.: precificar=70,index=15")
+    parser.add_argument('--porta', type=int, default=5055)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--saida', default=None, help="Salva o relatório em JSON para comparar versões")
+    # Modos internos usados pelos subprocessos
+    parser.add_argument('--criar-banco', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--servidor', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.criar_banco or args.servidor:
+        sys.path.insert(0, RAIZ)
+        from app import app, db
+        if args.criar_banco:
+            with app.app_context():
+                db.create_all()
+        else:
+            app.run(host='127.0.0.1', port=args.porta, threaded=False, use_reloader=False)
+        return
+
+    mix = {}
+    for item in args.mix.split(','):
+        operacao, peso = item.split('=')
+        mix[operacao.strip()] = float(peso)
+
+    payloads = amostrar_payloads(DATASET)
+    resultados = {}
+    for config in args.configs.split(','):
+        workers, threads = (int(v) for v in config.lower().split('x'))
+        print(f"🚀 {workers} worker(s) x {threads} thread(s)...")
+        try:
+            resultados[config] = executar_configuracao(workers, threads, args, payloads, mix)
+        except RuntimeError as e:
+            print(f"⚠️ Configuração {config} ignorada: {e}")
+
+    imprimir_relatorio(resultados)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'parametros': {k: v for k, v in vars(args).items() if k not in ('criar_banco', 'servidor')},
+                'servidor': 'gunicorn' if shutil.which('gunicorn') else 'werkzeug',
+                'resultados': resultados
+            }, f, indent=2, ensure_ascii=False)
+        print(f"💾 Relatório salvo em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
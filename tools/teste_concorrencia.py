@@ -0,0 +1,85 @@
+"""
+TESTE DE CONCORRÊNCIA DO PRECIFICADOR COMPARTILHADO
+
+Uma única instância de PrecificadorIAAprimorado atende muitas threads ao
+mesmo tempo. O teste precifica uma amostra do dataset (mais bairros e tipos
+desconhecidos) sequencialmente e depois em paralelo, com as entradas
+embaralhadas para intercalar tipos diferentes, e exige resultados idênticos.
+
+Uso:
+    python tools/teste_concorrencia.py --amostra 300 --threads 32 --rodadas 5
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from precificador_ia_aprimorado import obter_precificador_compartilhado
+
+CAMPOS = ['bairro', 'tipo_imovel', 'area_construida', 'area_terreno', 'quartos', 'banheiros']
+
+
+def montar_entradas(arquivo_dataset, amostra, semente):
+    df = pd.read_csv(arquivo_dataset).dropna(subset=CAMPOS)
+    entradas = [tuple(linha) for linha in df[CAMPOS].sample(amostra, random_state=semente).itertuples(index=False)]
+    # Casos que passam pelos caminhos de correção (bairro similar, tipo padrão, fallback)
+    entradas += [
+        ('Bairro Inexistente', 'Casa', 120.0, 250.0, 3, 2),
+        ('centro', 'Apartamento', 70.0, 0.0, 2, 1),
+        ('Centro', 'Chácara', 300.0, 5000.0, 4, 3),
+        ('Centro', 'Terreno', 0.0, 300.0, 0, 0)
+    ]
+    return entradas
+
+
+def resultado_comparavel(resultado):
+    return {k: v for k, v in resultado.items() if k != 'tempos_ms'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida o precificador compartilhado sob concorrência")
+    parser.add_argument('--dataset', default='dados/dataset_imoveis_jacarei.csv')
+    parser.add_argument('--amostra', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rodadas', type=int, default=5)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    precificador = obter_precificador_compartilhado()
+    entradas = montar_entradas(args.dataset, args.amostra, args.semente)
+
+    # Os avisos de bairro não reconhecido poluiriam a saída
+    with contextlib.redirect_stdout(io.StringIO()):
+        esperados = {entrada: resultado_comparavel(precificador.precificar(*entrada)) for entrada in entradas}
+
+    rng = random.Random(args.semente)
+    divergencias = 0
+    total = 0
+    for rodada in range(1, args.rodadas + 1):
+        tarefas = entradas * 3
+        rng.shuffle(tarefas)
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.threads) as executor:
+            resultados = list(executor.map(lambda entrada: (entrada, precificador.precificar(*entrada)), tarefas))
+        falhas = [(e, r) for e, r in resultados if resultado_comparavel(r) != esperados[e]]
+        total += len(resultados)
+        divergencias += len(falhas)
+        print(f"🔁 Rodada {rodada}: {len(resultados)} predições, {len(falhas)} divergência(s)")
+        for entrada, resultado in falhas[:3]:
+            print(f"   ❌ {entrada}: esperado {esperados[entrada]['preco_estimado']}, obtido {resultado['preco_estimado']}")
+
+    if divergencias:
+        print(f"❌ {divergencias}/{total} resultados concorrentes diferem da execução sequencial")
+        sys.exit(1)
+    print(f"✅ {total} predições concorrentes idênticas à execução sequencial ({args.threads} threads)")
+
+
+if __name__ == "__main__":
+    main()
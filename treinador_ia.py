@@ -13,20 +13,41 @@ import joblib
 import os
 from datetime import datetime
 
+from agregados_mercado import calcular_agregados, salvar_agregados
+from monitor_drift import gerar_referencia, salvar_referencia
+from preprocessador_streaming import PreprocessadorStreaming, carregar_dataset_binario, criar_encoder
+
 class TreinadorIA:
-    def __init__(self):
+    def __init__(self, diretorio_modelos='models', arquivo_dataset='dados/dataset_imoveis_jacarei.csv',
+                 cidade=None, n_jobs=-1, callback_progresso=None):
+        self.diretorio_modelos = diretorio_modelos
+        self.arquivo_dataset = arquivo_dataset
+        self.cidade = cidade
+        self.n_jobs = n_jobs
+        self.callback_progresso = callback_progresso
+        self.etapa = None
+        self.metricas = None
         self.modelo = None
         self.encoder_bairro = LabelEncoder()
         self.encoder_tipo = LabelEncoder()
         self.features = ['bairro_encoded', 'tipo_encoded', 'area_construida', 'area_terreno', 'quartos', 'banheiros']
         
     def log_progress(self, msg):
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+        agora = datetime.now()
+        print(f"[{agora.strftime('%H:%M:%S')}] {msg}")
+        if self.callback_progresso is not None:
+            # Evento estruturado para quem acompanha o treino (ex.: jobs em background)
+            self.callback_progresso({
+                'ts': agora.isoformat(),
+                'etapa': self.etapa,
+                'mensagem': msg.strip()
+            })
         
-    def carregar_dataset(self, arquivo='dados/dataset_imoveis_jacarei.csv'):
+    def carregar_dataset(self, arquivo=None):
         """Carrega e processa o dataset"""
         self.log_progress("📊 Carregando dataset...")
         
+        arquivo = arquivo or self.arquivo_dataset
         if not os.path.exists(arquivo):
             raise FileNotFoundError(f"Dataset não encontrado: {arquivo}")
             
@@ -39,8 +60,8 @@ class TreinadorIA:
         """Preprocessa dados para treinamento"""
         self.log_progress("🔧 Preprocessando dados...")
         
-        # Remove registros com valores inválidos
-        df_limpo = df.dropna()
+        # Remove registros com valores inválidos (cópia explícita evita SettingWithCopy)
+        df_limpo = df.dropna().copy()
         
         # Converte tipos para numérico
         colunas_numericas = ['area_construida', 'area_terreno', 'quartos', 'banheiros', 'preco']
@@ -60,6 +81,36 @@ class TreinadorIA:
         
         return df_limpo
         
+    def preprocessar_em_chunks(self, arquivo=None, destino=None, chunksize=50000):
+        """Preprocessa o dataset em chunks e grava dataset binário pronto para treino"""
+        self.log_progress(f"🔧 Preprocessando dados em chunks de {chunksize:,} linhas...")
+        
+        arquivo = arquivo or self.arquivo_dataset
+        destino = destino or os.path.splitext(arquivo)[0] + '_treino.bin'
+        
+        preprocessador = PreprocessadorStreaming(chunksize=chunksize, log=self.log_progress)
+        metadados = preprocessador.processar(arquivo, destino)
+        
+        if metadados['linhas'] == 0:
+            raise ValueError("Nenhum registro válido após o preprocessamento")
+        
+        self.encoder_bairro = criar_encoder(metadados['bairros'])
+        self.encoder_tipo = criar_encoder(metadados['tipos'])
+        
+        estatisticas = metadados['estatisticas']
+        self.log_progress(f"   ✅ {estatisticas['linhas_gravadas']:,} de {estatisticas['linhas_lidas']:,} registros gravados em {destino}")
+        self.log_progress(f"   🧹 {estatisticas['linhas_invalidas']:,} inválidos, {estatisticas['linhas_duplicadas']:,} duplicados, "
+                          f"{estatisticas['linhas_fora_faixa_preco']:,} fora da faixa de preço")
+        self.log_progress(f"   📍 {len(metadados['bairros'])} bairros únicos")
+        self.log_progress(f"   🏠 {len(metadados['tipos'])} tipos de imóvel")
+        
+        return destino
+        
+    def carregar_dataset_treino(self, destino):
+        """Carrega o dataset binário como DataFrame de features + preço"""
+        dados, metadados = carregar_dataset_binario(destino)
+        return pd.DataFrame(np.asarray(dados), columns=metadados['colunas'])
+        
     def treinar_modelo(self, df):
         """Treina o modelo RandomForest"""
         self.log_progress("🤖 Iniciando treinamento da IA...")
@@ -83,7 +134,7 @@ class TreinadorIA:
             min_samples_split=5,
             min_samples_leaf=2,
             random_state=42,
-            n_jobs=-1
+            n_jobs=self.n_jobs
         )
         
         self.log_progress("   🚀 Treinando RandomForest...")
@@ -110,27 +161,56 @@ class TreinadorIA:
         """Salva modelo treinado"""
         self.log_progress("💾 Salvando modelo...")
         
-        os.makedirs('models', exist_ok=True)
+        os.makedirs(self.diretorio_modelos, exist_ok=True)
         
         # Salva modelo e encoders
-        joblib.dump(self.modelo, 'models/modelo_precificacao.pkl')
-        joblib.dump(self.encoder_bairro, 'models/encoder_bairro.pkl')
-        joblib.dump(self.encoder_tipo, 'models/encoder_tipo.pkl')
+        joblib.dump(self.modelo, os.path.join(self.diretorio_modelos, 'modelo_precificacao.pkl'))
+        joblib.dump(self.encoder_bairro, os.path.join(self.diretorio_modelos, 'encoder_bairro.pkl'))
+        joblib.dump(self.encoder_tipo, os.path.join(self.diretorio_modelos, 'encoder_tipo.pkl'))
         
         # Salva informações do modelo
+        agora = datetime.now()
         info_modelo = {
-            'data_treinamento': datetime.now().isoformat(),
+            'versao': agora.strftime('%Y%m%d%H%M%S'),
+            'data_treinamento': agora.isoformat(),
             'features': self.features,
             'total_registros': len(self.encoder_bairro.classes_),
             'bairros': list(self.encoder_bairro.classes_),
             'tipos': list(self.encoder_tipo.classes_)
         }
+        if self.metricas:
+            info_modelo['metricas'] = self.metricas
+        if self.cidade:
+            info_modelo['cidade'] = self.cidade
+            info_modelo['arquivo_dataset'] = self.arquivo_dataset
         
         import json
-        with open('models/info_modelo.json', 'w', encoding='utf-8') as f:
+        with open(os.path.join(self.diretorio_modelos, 'info_modelo.json'), 'w', encoding='utf-8') as f:
             json.dump(info_modelo, f, indent=2, ensure_ascii=False)
             
-        self.log_progress("   ✅ Modelo salvo em models/")
+        self.log_progress(f"   ✅ Modelo salvo em {self.diretorio_modelos}/")
+        
+    def decodificar_categoricas(self, df):
+        """Garante as colunas bairro/tipo_imovel (o dataset binário só tem os códigos)"""
+        if 'bairro' in df.columns:
+            return df
+        # Decodifica sem materializar strings por linha
+        return df.assign(
+            bairro=pd.Categorical.from_codes(df['bairro_encoded'].astype(int), self.encoder_bairro.classes_),
+            tipo_imovel=pd.Categorical.from_codes(df['tipo_encoded'].astype(int), self.encoder_tipo.classes_)
+        )
+        
+    def salvar_agregados_mercado(self, df):
+        """Pré-calcula os agregados de mercado servidos por /api/bairros e /api/mercado"""
+        self.log_progress("📈 Calculando agregados de mercado...")
+        caminho = salvar_agregados(calcular_agregados(self.decodificar_categoricas(df)), self.diretorio_modelos)
+        self.log_progress(f"   ✅ Agregados salvos em {caminho}")
+        
+    def salvar_referencia_drift(self, df):
+        """Distribuições do treino usadas pelo monitoramento de drift das requisições"""
+        self.log_progress("📐 Salvando referência de drift...")
+        caminho = salvar_referencia(gerar_referencia(self.decodificar_categoricas(df)), self.diretorio_modelos)
+        self.log_progress(f"   ✅ Referência salva em {caminho}")
         
     def testar_predicoes(self, df_sample):
         """Testa predições com exemplos"""
@@ -154,13 +234,15 @@ class TreinadorIA:
             preco_real = row['preco']
             erro_percentual = abs(preco_predito - preco_real) / preco_real * 100
             
-            self.log_progress(f"   🏠 {row['bairro']} - {row['tipo_imovel']}")
+            bairro = row['bairro'] if 'bairro' in row else self.encoder_bairro.classes_[int(row['bairro_encoded'])]
+            tipo_imovel = row['tipo_imovel'] if 'tipo_imovel' in row else self.encoder_tipo.classes_[int(row['tipo_encoded'])]
+            self.log_progress(f"   🏠 {bairro} - {tipo_imovel}")
             self.log_progress(f"      📏 {row['area_construida']}m² construída, {row['quartos']}Q, {row['banheiros']}B")
             self.log_progress(f"      💰 Real: R$ {preco_real:,.0f} | Predito: R$ {preco_predito:,.0f}")
             self.log_progress(f"      📊 Erro: {erro_percentual:.1f}%")
             
-    def executar_treinamento_completo(self):
-        """Execução completa do treinamento"""
+    def executar_treinamento_completo(self, chunksize=None):
+        """Execução completa do treinamento (chunksize ativa o preprocessamento em chunks)"""
         inicio = datetime.now()
         
         print("="*80)
@@ -170,20 +252,33 @@ class TreinadorIA:
         print("="*80)
         
         try:
-            # 1. Carrega dataset
-            df = self.carregar_dataset()
-            
-            # 2. Preprocessa dados
-            df_processado = self.preprocessar_dados(df)
+            self.etapa = 'preprocessamento'
+            if chunksize:
+                # 1+2. Preprocessa em chunks e carrega o dataset binário
+                destino = self.preprocessar_em_chunks(chunksize=chunksize)
+                df_processado = self.carregar_dataset_treino(destino)
+            else:
+                # 1. Carrega dataset
+                df = self.carregar_dataset()
+                
+                # 2. Preprocessa dados
+                df_processado = self.preprocessar_dados(df)
             
             # 3. Treina modelo
+            self.etapa = 'treinamento'
             mae, r2 = self.treinar_modelo(df_processado)
+            self.metricas = {'mae': float(mae), 'r2': float(r2)}
             
             # 4. Salva modelo
+            self.etapa = 'salvamento'
             self.salvar_modelo()
+            self.salvar_agregados_mercado(df_processado)
+            self.salvar_referencia_drift(df_processado)
             
             # 5. Testa predições
+            self.etapa = 'teste'
             self.testar_predicoes(df_processado)
+            self.etapa = 'concluido'
             
             tempo_total = datetime.now() - inicio
             
@@ -194,7 +289,7 @@ class TreinadorIA:
             print(f"📊 Precisão: {r2*100:.1f}%")
             print(f"💰 Erro médio: R$ {mae:,.0f}")
             print(f"🤖 Modelo salvo e pronto para uso!")
-            print(f"📁 Arquivos em: models/")
+            print(f"📁 Arquivos em: {self.diretorio_modelos}/")
             
             return True
             
@@ -202,10 +297,10 @@ class TreinadorIA:
             self.log_progress(f"❌ Erro no treinamento: {e}")
             return False
 
-def executar_treinamento():
+def executar_treinamento(chunksize=None):
     """Função principal"""
     treinador = TreinadorIA()
-    sucesso = treinador.executar_treinamento_completo()
+    sucesso = treinador.executar_treinamento_completo(chunksize=chunksize)
     
     if sucesso:
         print(f"\n🚀 IA TREINADA E PRONTA!")
@@ -216,6 +311,79 @@ def executar_treinamento():
     
     return sucesso
 
+def particionar_por_cidade(arquivo, coluna='cidade', destino='dados/cidades', chunksize=50000):
+    """
+    Divide um dataset multi-cidade em um CSV por cidade (em chunks).
+    Se `arquivo` já for um diretório de CSVs, cada arquivo é tratado como uma cidade.
+    Retorna {cidade: caminho_csv}
+    """
+    from registro_modelos import slug_cidade
+    
+    if os.path.isdir(arquivo):
+        return {os.path.splitext(nome)[0]: os.path.join(arquivo, nome)
+                for nome in sorted(os.listdir(arquivo)) if nome.endswith('.csv')}
+    
+    os.makedirs(destino, exist_ok=True)
+    particoes = {}
+    for chunk in pd.read_csv(arquivo, chunksize=chunksize):
+        if coluna not in chunk.columns:
+            raise ValueError(f"Coluna '{coluna}' ausente no dataset {arquivo}")
+        for cidade, grupo in chunk.groupby(coluna):
+            caminho = os.path.join(destino, f"{slug_cidade(cidade)}.csv")
+            novo = cidade not in particoes
+            # Primeiro chunk de cada cidade sobrescreve partições antigas
+            grupo.drop(columns=[coluna]).to_csv(caminho, mode='w' if novo else 'a', header=novo, index=False)
+            particoes[cidade] = caminho
+    return particoes
+
+def _treinar_cidade(cidade, arquivo, diretorio_modelos, n_jobs, chunksize):
+    """Worker de processo: treina o bundle de uma cidade"""
+    treinador = TreinadorIA(diretorio_modelos=diretorio_modelos, arquivo_dataset=arquivo,
+                            cidade=cidade, n_jobs=n_jobs)
+    return cidade, treinador.executar_treinamento_completo(chunksize=chunksize)
+
+def treinar_por_cidade(arquivo, coluna='cidade', diretorio_base='models/cidades',
+                       max_workers=None, chunksize=None):
+    """Treina um bundle (modelo + encoders + info) por cidade, em paralelo"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from registro_modelos import slug_cidade
+    
+    particoes = particionar_por_cidade(arquivo, coluna=coluna)
+    if not particoes:
+        print(f"⚠️ Nenhuma cidade encontrada em {arquivo}")
+        return {}
+    max_workers = max_workers or min(len(particoes), os.cpu_count() or 1)
+    # Divide os núcleos entre os workers para não sobrecarregar a máquina
+    n_jobs = max(1, (os.cpu_count() or 1) // max(max_workers, 1))
+    
+    resultados = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [
+            executor.submit(_treinar_cidade, cidade, caminho,
+                            os.path.join(diretorio_base, slug_cidade(cidade)), n_jobs, chunksize)
+            for cidade, caminho in particoes.items()
+        ]
+        for futuro in as_completed(futuros):
+            cidade, sucesso = futuro.result()
+            resultados[cidade] = sucesso
+            print(f"{'✅' if sucesso else '❌'} Bundle de {cidade}: {'treinado' if sucesso else 'falhou'}")
+    
+    return resultados
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Treina o modelo de precificação")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Preprocessa o CSV em chunks deste tamanho (memória limitada)")
+    parser.add_argument('--por-cidade', metavar='DATASET', default=None,
+                        help="Treina um bundle por cidade a partir de um CSV com coluna 'cidade' ou de um diretório de CSVs")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Número de cidades treinadas em paralelo")
+    args = parser.parse_args()
+    
     print("🤖 INICIANDO TREINAMENTO DA IA...")
-    executar_treinamento()
+    if args.por_cidade:
+        treinar_por_cidade(args.por_cidade, max_workers=args.workers, chunksize=args.chunksize)
+    else:
+        executar_treinamento(chunksize=args.chunksize)